@@ -0,0 +1,235 @@
+"""
+Benchmark suite of the game states and the solver.
+
+Measures on boards from 3x3 (3 to win) to 15x15 (5 to win):
+
+    make_move -- making a move in a mid-game position;
+    available_moves -- generating all available moves;
+    steps_in_direction -- walking a `BoxWalker` through the field;
+    win_check -- `is_winning_move` for all available moves;
+    search -- `minimax.run` from a mid-game position (nodes per second);
+    game -- a full AI vs AI game.
+
+Positions are generated by a seeded random generator, so runs are
+reproducible. Results are written as JSON, and a run can be compared with a
+previous one (the exit code is 1 if some benchmark became slower than
+allowed):
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+
+or `make bench`.
+"""
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import timeit
+
+import minimax
+from tttoe.aiplayer import AIPlayer
+from tttoe.boxwalker import BoxWalker
+from tttoe.game import Game
+from tttoe.gamestate import GameState
+from tttoe.bitboard_gamestate import BitboardGameState
+from tttoe.sparse_gamestate import SparseGameState
+from tttoe.minimax_strategy import MinimaxStrategy
+
+# (width, height, qty_to_win)
+BOARDS = [(3, 3, 3), (5, 5, 4), (7, 7, 5), (10, 10, 5), (15, 15, 5)]
+
+STATE_CLASSES = [GameState, BitboardGameState, SparseGameState]
+
+SEED = 2015
+
+def _handles():
+    while True:
+        yield "host"
+        yield "opponent"
+
+def make_position(state_class, width, height, qty_to_win, seed=SEED):
+    """Returns a mid-game position: about a third of the field (but not more
+    than 20 cells) is filled by random non-winning moves."""
+    generator = random.Random("%d:%d:%d:%d" % (seed, width, height, qty_to_win))
+    state = state_class(width, height, qty_to_win)
+    moves_count = min(20, width * height // 3)
+    handles = _handles()
+    while state.moves_count < moves_count:
+        handle = next(handles)
+        moves = list(state.all_available_moves())
+        generator.shuffle(moves)
+        for pos_x, pos_y in moves:
+            if not state.is_winning_move(pos_x, pos_y, handle):
+                state = state.make_move(pos_x, pos_y, handle)
+                break
+    return state
+
+def _next_handle(state):
+    return "host" if state.moves_count % 2 == 0 else "opponent"
+
+_MIN_MEASUREMENT_TIME = 0.2
+
+def time_per_call(func, repeat):
+    """returns the best time of one call (seconds)"""
+    timer = timeit.Timer(func)
+    number = 1
+    while timer.timeit(number) < _MIN_MEASUREMENT_TIME:
+        number *= 2
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def bench_make_move(state, repeat):
+    handle = _next_handle(state)
+    moves = list(state.all_available_moves())
+    def func():
+        for pos_x, pos_y in moves:
+            state.make_move(pos_x, pos_y, handle)
+    return dict(seconds=time_per_call(func, repeat) / len(moves))
+
+def bench_available_moves(state, repeat):
+    return dict(seconds=time_per_call( \
+            lambda: list(state.all_available_moves()), repeat))
+
+def bench_steps_in_direction(state, repeat):
+    cells = [(x, y) for x in range(state.width) for y in range(state.height)]
+    def func():
+        for pos_x, pos_y in cells:
+            walker = BoxWalker(state.width, state.height, pos_x, pos_y)
+            for _ in walker.steps_in_direction(1, 1):
+                pass
+    return dict(seconds=time_per_call(func, repeat) / len(cells))
+
+def bench_win_check(state, repeat):
+    handle = _next_handle(state)
+    moves = list(state.all_available_moves())
+    def func():
+        for pos_x, pos_y in moves:
+            state.is_winning_move(pos_x, pos_y, handle)
+    return dict(seconds=time_per_call(func, repeat) / len(moves))
+
+def _search_strategy(width, height):
+    if width * height <= 9:
+        return MinimaxStrategy(max_depth=9)
+    return MinimaxStrategy(max_depth=2, candidate_radius=1, order_moves=True, \
+            evaluate_patterns=True)
+
+def bench_search(state, repeat):
+    player = 1 if state.moves_count % 2 == 0 else -1
+    best = None
+    for _ in range(repeat):
+        stats = minimax.SearchStats()
+        minimax.run(state, player, _search_strategy(state.width, \
+                state.height), stats=stats)
+        if best is None or stats.elapsed < best.elapsed:
+            best = stats
+    return dict(seconds=best.elapsed, nodes=best.nodes, \
+            nodes_per_second=best.nodes_per_second)
+
+def bench_game(state_class, width, height, qty_to_win):
+    game = Game(width, height, qty_to_win, "host", "x", state_class=state_class)
+    reports = []
+    callback = lambda ai, stats: reports.append(stats)
+    ai_1 = AIPlayer(game, strategy=_search_strategy(width, height), \
+            stats_callback=callback)
+    AIPlayer(game, strategy=_search_strategy(width, height), \
+            stats_callback=callback)
+
+    started_at = time.time()
+    ai_1.make_move()
+    seconds = time.time() - started_at
+    return dict(seconds=seconds, moves=game.game_state.moves_count, \
+            nodes=sum(stats.nodes for stats in reports), \
+            result=game.game_state.last_move_result)
+
+_MICRO_BENCHMARKS = [
+    ("make_move", bench_make_move),
+    ("available_moves", bench_available_moves),
+    ("steps_in_direction", bench_steps_in_direction),
+    ("win_check", bench_win_check),
+    ("search", bench_search),
+]
+
+def run_benchmarks(boards, repeat, games):
+    results = []
+    for width, height, qty_to_win in boards:
+        board = "%dx%dx%d" % (width, height, qty_to_win)
+        for state_class in STATE_CLASSES:
+            state = make_position(state_class, width, height, qty_to_win)
+            benchmarks = list(_MICRO_BENCHMARKS)
+            if games:
+                benchmarks.append(("game", lambda _, __: bench_game( \
+                        state_class, width, height, qty_to_win)))
+            for name, func in benchmarks:
+                result = dict(name="%s/%s/%s" % (name, board, \
+                        state_class.__name__), benchmark=name, board=board, \
+                        state=state_class.__name__)
+                result.update(func(state, repeat))
+                results.append(result)
+                print("%-45s %12.3f us" % (result["name"], \
+                        result["seconds"] * 1e6))
+                sys.stdout.flush()
+    return results
+
+def _git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], \
+                stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, threshold):
+    """Prints the time ratio of every benchmark to the baseline, returns the
+    names of benchmarks slower than `threshold` times."""
+    baseline_seconds = dict((result["name"], result["seconds"]) \
+            for result in baseline["results"])
+    regressions = []
+    for result in results:
+        old_seconds = baseline_seconds.get(result["name"])
+        if not old_seconds:
+            continue
+        ratio = result["seconds"] / old_seconds
+        mark = ""
+        if ratio > threshold:
+            mark = " REGRESSION"
+            regressions.append(result["name"])
+        print("%-45s %6.2fx%s" % (result["name"], ratio, mark))
+    return regressions
+
+def main(args):
+    parser = argparse.ArgumentParser(description="Runs the benchmarks.")
+    parser.add_argument("--output", help="write JSON results to the file")
+    parser.add_argument("--compare", help="compare with JSON results of " \
+            "a previous run")
+    parser.add_argument("--threshold", type=float, default=1.25, \
+            help="max allowed slowdown (ratio) in the comparison")
+    parser.add_argument("--repeat", type=int, default=3, \
+            help="number of measurements (the best is taken)")
+    parser.add_argument("--max-cells", type=int, default=None, \
+            help="skip boards with more cells")
+    parser.add_argument("--no-games", dest="games", action="store_false", \
+            help="skip full AI vs AI games")
+    options = parser.parse_args(args)
+
+    boards = [board for board in BOARDS if options.max_cells is None or \
+            board[0] * board[1] <= options.max_cells]
+    results = run_benchmarks(boards, options.repeat, options.games)
+
+    report = dict(revision=_git_revision(), time=time.time(), \
+            python=platform.python_version(), machine=platform.machine(), \
+            results=results)
+    if options.output:
+        with open(options.output, "w") as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if options.compare:
+        with open(options.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        if compare(results, baseline, options.threshold):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
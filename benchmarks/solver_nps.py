@@ -0,0 +1,85 @@
+"""
+Compares the speed (searched nodes per second) of the recursive
+`minimax.run` and the non-recursive `minimax.run_negamax` (making new states
+by `all_substates`, and making and taking back moves on one state) on
+tictactoe positions.
+
+Run from the project root:
+
+    python -m benchmarks.solver_nps
+"""
+
+import sys
+import time
+
+import minimax
+from tttoe.gamestate import GameState
+from tttoe.bitboard_gamestate import BitboardGameState
+from tttoe.minimax_strategy import MinimaxStrategy
+
+# (width, height, qty_to_win, moves made before the search, max_depth)
+POSITIONS = [
+    (3, 3, 3, [], 9),
+    (4, 4, 3, [(1, 1), (2, 2)], 4),
+    (7, 7, 4, [(3, 3), (3, 4), (4, 4)], 3),
+]
+
+class CountingStrategy(MinimaxStrategy):
+    """Counts searched nodes (every node is checked by `is_state_terminal`
+    once, both by `run` and `run_negamax`)."""
+
+    def __init__(self, *args, **kwargs):
+        MinimaxStrategy.__init__(self, *args, **kwargs)
+        self.nodes = 0
+
+    def is_state_terminal(self, state):
+        self.nodes += 1
+        return MinimaxStrategy.is_state_terminal(self, state)
+
+class SubstatesStrategy(CountingStrategy):
+    """Makes `run_negamax` use `all_substates`."""
+    moves = None
+
+def make_position(state_class, width, height, qty_to_win, moves):
+    state = state_class(width, height, qty_to_win)
+    handles = ("host", "opponent")
+    for index, (pos_x, pos_y) in enumerate(moves):
+        state = state.make_move(pos_x, pos_y, handles[index % 2])
+    return state
+
+def measure(search, strategy_class, state, depth):
+    """returns (payload, nodes, seconds)"""
+    strategy = strategy_class(max_depth=depth)
+    player = 1 if state.moves_count % 2 == 0 else -1
+    started = time.perf_counter()
+    payload = search(state, player, strategy)
+    return payload, strategy.nodes, time.perf_counter() - started
+
+def main():
+    searches = [
+        ("run", minimax.run, CountingStrategy),
+        ("negamax", minimax.run_negamax, SubstatesStrategy),
+        ("negamax_mut", minimax.run_negamax, CountingStrategy),
+    ]
+    print("%-10s %-18s %-12s %10s %8s %12s" % \
+            ("position", "state", "search", "nodes", "seconds", "nodes/s"))
+    for width, height, qty_to_win, moves, depth in POSITIONS:
+        for state_class in (GameState, BitboardGameState):
+            payloads = set()
+            for name, search, strategy_class in searches:
+                state = make_position(state_class, width, height, \
+                        qty_to_win, moves)
+                payload, nodes, seconds = measure(search, strategy_class, state, \
+                        depth)
+                payloads.add(payload)
+                print("%-10s %-18s %-12s %10d %8.3f %12.0f" % \
+                        ("%dx%dx%d" % (width, height, qty_to_win), \
+                        state_class.__name__, name, nodes, seconds, \
+                        nodes / seconds))
+            if len(payloads) != 1:
+                print("searches returned different moves: %s" % payloads)
+                return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
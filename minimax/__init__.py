@@ -1 +1,9 @@
 from minimax.solver import run
+from minimax.transposition_table import TranspositionTable
+from minimax.solver import run_iterative
+from minimax.parallel import run_parallel, ParallelSearcher
+from minimax.negamax import run_negamax, negamax_steps
+from minimax.stats import SearchStats
+from minimax.proof_number import run_proof_number, proof_number_steps
+from minimax.mcts import run_mcts, MCTSearcher
+from minimax.cancellation import CancellationToken, SearchCancelled
@@ -0,0 +1,41 @@
+"""
+This module implements cancellation of searches: a `CancellationToken` is
+passed to the search, and the search checks it every few hundred nodes and
+stops by raising `SearchCancelled` when it's cancelled (e.g. the player who
+waited for the move left the game).
+
+See `CancellationToken` docs.
+"""
+
+class SearchCancelled(Exception):
+    """Exception raised by the search if its `CancellationToken` is
+    cancelled."""
+
+class CancellationToken:
+    """Flag of a cancelled search.
+
+    Example usage:
+
+    token = CancellationToken()
+    ... # the search is started with the token (in a thread, or by slices,
+        # see `minimax.negamax_steps`)
+    token.cancel() # the search raises `SearchCancelled` at the next check
+
+    One token can be passed to several searches, all of them are cancelled.
+    A cancelled token can't be reset.
+    """
+
+    def __init__(self):
+        self._cancelled = False
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    def cancel(self):
+        self._cancelled = True
+
+    def check(self):
+        """raises `SearchCancelled` if the token is cancelled"""
+        if self._cancelled:
+            raise SearchCancelled()
@@ -0,0 +1,286 @@
+"""
+This module implements Monte Carlo tree search with the UCT selection rule
+(http://en.wikipedia.org/wiki/Monte_Carlo_tree_search): instead of evaluating
+positions by a heuristic at a fixed depth, it plays many random games
+(rollouts) from the leaves of a growing tree and chooses the move which was
+tried most often. It needs no heuristic, and it plays better with more
+rollouts, so its strength grows with the number of processes and time.
+
+Rollouts run in batches: the leaves of a batch are selected one after
+another with a "virtual loss" (the visit is counted before the result is
+known, so the next selection prefers other leaves), then their rollouts run
+in a pool of worker processes at once, and the results go up the tree.
+
+`MCTSearcher` keeps the trees of recent searches: if the searched position
+is in the tree of a previous search (e.g. the previous move of the same
+game and the opponent's reply), the subtree is searched further instead of
+a new tree.
+
+See `MCTSearcher` and `run_mcts` docs.
+"""
+
+from collections import OrderedDict
+import math
+import multiprocessing
+import random
+import threading
+import time
+
+from minimax.solver import NoSubstatesReturned
+
+# Rewards of the player who made the move to the node.
+_WIN = 1.0
+_DRAW = 0.5
+
+class _Node:
+    """Node of the search tree, `player` is to move in the `state`."""
+
+    __slots__ = ("state", "player", "payload", "parent", "children", \
+            "untried", "visits", "reward", "outcome")
+
+    def __init__(self, state, player, payload=None, parent=None):
+        self.state = state
+        self.player = player
+        self.payload = payload
+        self.parent = parent
+        self.children = []
+        # substates which are not children yet, None until the node is
+        # expanded first
+        self.untried = None
+        self.visits = 0
+        # sum of rewards of the player who made the move to the node
+        self.reward = 0.0
+        # result of the terminal state (1, -1 or 0), or None
+        self.outcome = None
+
+def _reward(outcome, player):
+    if outcome == player:
+        return _WIN
+    if outcome == 0:
+        return _DRAW
+    return 0.0
+
+def _rollout(args):
+    """Plays one random game from the state. Returns the outcome (1, -1 or
+    0). It's a module level function, so it can be run in the pool."""
+    game_state, player, strategy, seed = args
+    rnd = random.Random(seed)
+
+    playout = getattr(strategy, "random_playout", None)
+    if playout is not None:
+        return playout(game_state, player, rnd)
+
+    while not strategy.is_state_terminal(game_state):
+        substates = list(strategy.all_substates(game_state, player))
+        if not substates:
+            raise NoSubstatesReturned(game_state, strategy)
+        game_state, _ = rnd.choice(substates)
+        player = -player
+    return strategy.outcome(game_state)
+
+def _validate_arguments(player, strategy):
+    for required_method in ("is_state_terminal", "all_substates", "outcome"):
+        if not callable(getattr(strategy, required_method, None)):
+            raise ValueError("strategy must implement all required " \
+                    "methods, \"%s\" is not implemented or not callable" % \
+                        required_method)
+
+    if player not in (-1, 1):
+        raise ValueError("Player can be only: -1, 1")
+
+class MCTSearcher:
+    """Monte Carlo tree search with rollouts in a pool of worker processes.
+
+    Example usage:
+
+    searcher = MCTSearcher(processes=8, time_budget=2)
+    searcher.run(game_state, 1, strategy) # payload of the chosen move
+    ...
+    searcher.run(next_game_state, 1, strategy) # the tree is reused
+    searcher.close()
+
+    Options:
+
+        processes -- number of worker processes (the number of CPUs by
+            default), 0 - rollouts run in the calling process.
+        iterations -- number of rollouts of one search.
+        time_budget -- search time limit in seconds. The search stops when
+            any of the budgets is exhausted, at least one batch is played.
+        batch_size -- number of rollouts played at once (4 per process by
+            default).
+        exploration -- the UCT exploration constant: the larger it is, the
+            more often rarely tried moves are tried.
+        max_trees -- number of trees of recent searches kept for reuse.
+        seed -- seed of the random rollouts (for reproducible searches).
+
+    The strategy should implement `is_state_terminal` and `all_substates`
+    methods of the `minimax.run` strategy protocol, and `outcome` of
+    `minimax.run_proof_number`. Trees are reused if it implements
+    `state_hash`. Rollouts are played by random `all_substates` by default,
+    the strategy can implement a faster one:
+
+    random_playout(game_state, player, rnd) -- plays random moves from the
+        game_state (`player` is to move) by `rnd` (`random.Random`) until the
+        game is over, returns its `outcome`. The game_state shouldn't be
+        changed.
+
+    Game states and the strategy should be picklable. Searches run one at a
+    time (concurrent `run` calls wait for each other).
+    """
+
+    def __init__(self, processes=None, iterations=1000, time_budget=None, \
+            batch_size=None, exploration=1.4, max_trees=16, seed=None):
+        if iterations is None and time_budget is None:
+            raise ValueError("iterations or time_budget should be provided")
+
+        if processes is None:
+            processes = multiprocessing.cpu_count()
+        self._processes = processes
+        self._pool = multiprocessing.Pool(processes) if processes > 0 else None
+        self._iterations = iterations
+        self._time_budget = time_budget
+        self._batch_size = batch_size or 4 * max(1, processes)
+        self._exploration = exploration
+        self._max_trees = max_trees
+        self._random = random.Random(seed)
+        # {id of the tree: {(state hash, player): node}} of nodes one and
+        # two moves below the roots of recent searches
+        self._trees = OrderedDict()
+        self._lock = threading.Lock()
+
+    def run(self, game_state, player, strategy, stats=None):
+        """Runs the search, returns the payload of the move tried most often,
+        or None if the game_state is terminal. `stats` (`minimax.SearchStats`)
+        gets the number of rollouts (`nodes`) and the elapsed time."""
+        _validate_arguments(player, strategy)
+
+        with self._lock:
+            return self._run(game_state, player, strategy, stats)
+
+    def close(self):
+        """stops worker processes"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+    def _run(self, game_state, player, strategy, stats):
+        if strategy.is_state_terminal(game_state):
+            return None
+
+        started_at = time.time()
+        deadline = None
+        if self._time_budget is not None:
+            deadline = started_at + self._time_budget
+
+        root = self._reused_root(game_state, player, strategy)
+        rollouts = 0
+        while True:
+            rollouts += self._play_batch(root, strategy)
+            if self._iterations is not None and rollouts >= self._iterations:
+                break
+            if deadline is not None and time.time() >= deadline:
+                break
+
+        if stats is not None:
+            stats.nodes = rollouts
+            stats.elapsed = time.time() - started_at
+
+        self._keep_tree(root, strategy)
+        best = max(root.children, key=lambda child: child.visits)
+        return best.payload
+
+    def _reused_root(self, game_state, player, strategy):
+        state_hash = getattr(strategy, "state_hash", None)
+        if state_hash is not None:
+            key = (state_hash(game_state), player)
+            for tree_id, nodes in self._trees.items():
+                node = nodes.get(key)
+                if node is not None:
+                    del self._trees[tree_id]
+                    node.parent = None
+                    return node
+        return _Node(game_state, player)
+
+    def _keep_tree(self, root, strategy):
+        state_hash = getattr(strategy, "state_hash", None)
+        if state_hash is None:
+            return
+
+        nodes = dict()
+        for child in root.children:
+            for node in [child] + child.children:
+                nodes[(state_hash(node.state), node.player)] = node
+        self._trees[id(root)] = nodes
+        while len(self._trees) > self._max_trees:
+            self._trees.popitem(last=False)
+
+    def _select(self, root, strategy):
+        """Goes down the tree by UCT and expands a leaf. Counts the visit
+        of all nodes on the way (the virtual loss). Returns the leaf."""
+        node = root
+        node.visits += 1
+        while node.outcome is None:
+            if node.untried is None:
+                node.untried = list(strategy.all_substates(node.state, \
+                        node.player))
+                if not node.untried:
+                    raise NoSubstatesReturned(node.state, strategy)
+                self._random.shuffle(node.untried)
+
+            if node.untried:
+                state, payload = node.untried.pop()
+                child = _Node(state, -node.player, payload, node)
+                if strategy.is_state_terminal(state):
+                    child.outcome = strategy.outcome(state)
+                node.children.append(child)
+                child.visits += 1
+                return child
+
+            log_visits = math.log(node.visits)
+            exploration = self._exploration
+            node = max(node.children, key=lambda child: \
+                    child.reward / child.visits + exploration * \
+                    math.sqrt(log_visits / child.visits))
+            node.visits += 1
+        return node
+
+    def _play_batch(self, root, strategy):
+        """Plays a batch of rollouts, returns their number."""
+        leaves = [self._select(root, strategy) \
+                for _ in range(self._batch_size)]
+
+        tasks = [(leaf.state, leaf.player, strategy, \
+                self._random.getrandbits(32)) \
+                for leaf in leaves if leaf.outcome is None]
+        if self._pool is not None and len(tasks) > 1:
+            chunksize = max(1, len(tasks) // self._processes)
+            outcomes = iter(self._pool.map(_rollout, tasks, chunksize))
+        else:
+            outcomes = iter([_rollout(task) for task in tasks])
+
+        for leaf in leaves:
+            outcome = leaf.outcome
+            if outcome is None:
+                outcome = next(outcomes)
+            node = leaf
+            while node.parent is not None:
+                node.reward += _reward(outcome, node.parent.player)
+                node = node.parent
+        return len(leaves)
+
+def run_mcts(game_state, player, strategy, iterations=1000, time_budget=None, \
+        processes=0, seed=None, stats=None):
+    """Runs Monte Carlo tree search (see `MCTSearcher` for the arguments and
+    the strategy methods). Returns the payload of the chosen move, or None
+    if the game_state is terminal.
+
+    Rollouts run in the calling process by default. Starting the workers
+    takes time, and the tree is reused only by the same searcher, so for
+    many searches use one `MCTSearcher` instance.
+    """
+    searcher = MCTSearcher(processes, iterations=iterations, \
+            time_budget=time_budget, seed=seed)
+    try:
+        return searcher.run(game_state, player, strategy, stats)
+    finally:
+        searcher.close()
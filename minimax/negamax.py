@@ -0,0 +1,234 @@
+"""
+This module implements the Minimax method with Alpha-beta pruning in the
+negamax form (http://en.wikipedia.org/wiki/Negamax): the value of a state is
+always taken from the point of view of the player to move, so the "max" and
+"min" players are handled by the same code with a sign flip.
+
+Unlike `minimax.run`, the search is not recursive: it keeps its own stack of
+frames, so the search depth is not limited by the Python recursion limit, and
+there are no function calls and no `KeeperOfMinOrMax` instances per node.
+
+Since the whole search is kept in the stack, it can be suspended and resumed:
+`negamax_steps` is a generator which runs the search by slices of a fixed
+number of nodes, so the caller can do other work between them (e.g. serve
+other players in the same IOLoop) and cancel the search.
+
+See `run_negamax` and `negamax_steps` docs.
+"""
+
+import time
+
+from minimax.cancellation import SearchCancelled
+from minimax.solver import NoSubstatesReturned, _validate_arguments
+
+# Indexes of frame fields. A frame is a list, not an object, to keep the
+# hot loop cheap.
+_STATE = 0
+_MOVES = 1
+_ALPHA = 2
+_BETA = 3
+_BEST_VALUE = 4
+_BEST_PAYLOAD = 5
+_SIGN = 6
+_PAYLOAD = 7
+
+# Nodes between cancellation checks of `run_negamax`.
+_CHECK_INTERVAL = 256
+
+def _uses_make_unmake(strategy):
+    return all(callable(getattr(strategy, method, None)) \
+            for method in ("moves", "apply_move", "undo_move"))
+
+def run_negamax(game_state, player, strategy, cancellation_token=None):
+    """Runs the Minimax algorithm. Arguments and the result are the same as
+    for `minimax.run` (the same payload is returned).
+
+    If `cancellation_token` (`minimax.CancellationToken`) is provided, it's
+    checked every few hundred nodes, and `minimax.SearchCancelled` is raised
+    if it's cancelled (e.g. from another thread).
+
+    Besides the `minimax.run` strategy protocol, the strategy can implement
+    these methods to search on a single mutable state (make/unmake), without
+    building a new state for every move:
+
+    moves(game_state, player) -- should return an iterable (e.g. a
+        generator) of payloads of all moves of the player. Every move is
+        taken back before the next payload is requested, so the game_state is
+        the same at every step of the iteration. Payloads can't be None.
+
+    apply_move(game_state, payload, player) -- should make the move in place.
+
+    undo_move(game_state, payload) -- should revert the last applied move.
+
+    If all three methods are implemented, `all_substates` is not used. The
+    game_state is changed during the search and restored at the end (even if
+    an exception is raised).
+    """
+
+    steps = negamax_steps(game_state, player, strategy, \
+            slice_nodes=_CHECK_INTERVAL, cancellation_token=cancellation_token)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+def negamax_steps(game_state, player, strategy, max_depth=None, \
+        slice_nodes=1000, cancellation_token=None, stats=None):
+    """Generator which runs the search of `run_negamax` by slices: it yields
+    None after every `slice_nodes` visited nodes, and returns the payload
+    (`StopIteration.value`, or the value of `yield from`) when the search is
+    finished.
+
+    Example usage:
+
+    steps = negamax_steps(game_state, 1, strategy, cancellation_token=token)
+    try:
+        next(steps) # visits 1000 nodes, call it again later to resume
+    except StopIteration as stop:
+        payload = stop.value # the search is finished
+
+    Arguments:
+
+        game_state, player, strategy -- see `run_negamax`. The game_state is
+            changed between the slices if the strategy implements
+            make/unmake methods, so it shouldn't be shared.
+        max_depth -- the search depth, `strategy.max_depth()` by default.
+        slice_nodes -- number of nodes visited between yields.
+        cancellation_token -- optional `minimax.CancellationToken`, it's
+            checked when the search starts and resumes, and
+            `minimax.SearchCancelled` is raised if it's cancelled.
+        stats -- optional `minimax.SearchStats` instance, visited nodes and
+            leaves are added to it, `elapsed` is the time of the slices
+            (without the time between them).
+
+    If the generator is closed before the search is finished, the game_state
+    is restored as well.
+    """
+
+    _validate_arguments(player, strategy, None)
+    if slice_nodes < 1:
+        raise ValueError("slice_nodes should be positive, %d provided" % \
+                slice_nodes)
+    if cancellation_token is not None and cancellation_token.cancelled:
+        raise SearchCancelled()
+
+    make_unmake = _uses_make_unmake(strategy)
+    is_state_terminal = strategy.is_state_terminal
+    heuristic = strategy.heuristic
+    if max_depth is None:
+        max_depth = strategy.max_depth()
+    record_cutoff = getattr(strategy, "record_cutoff", None)
+
+    if make_unmake:
+        moves_of = lambda state, sign: iter(strategy.moves(state, sign))
+        apply_move = strategy.apply_move
+        undo_move = strategy.undo_move
+    else:
+        moves_of = lambda state, sign: iter(strategy.all_substates(state, sign))
+
+    if is_state_terminal(game_state) or max_depth < 0:
+        return None
+
+    below = strategy.below_heuristic()
+    above = strategy.above_heuristic()
+    if player == 1:
+        alpha, beta = below, above
+    else:
+        alpha, beta = -above, -below
+
+    stack = [[game_state, moves_of(game_state, player), alpha, beta, \
+            None, None, player, None]]
+    nodes = 0
+    next_slice = slice_nodes
+    slice_started_at = time.time()
+
+    try:
+        while True:
+            frame = stack[-1]
+            sign = frame[_SIGN]
+
+            try:
+                if make_unmake:
+                    payload = next(frame[_MOVES])
+                    state = frame[_STATE]
+                    apply_move(state, payload, sign)
+                    frame[_PAYLOAD] = payload
+                else:
+                    state, payload = next(frame[_MOVES])
+            except StopIteration:
+                if frame[_BEST_VALUE] is None:
+                    raise NoSubstatesReturned(frame[_STATE], strategy)
+                # The frame is finished, its value goes to the parent frame.
+                value = frame[_BEST_VALUE]
+                stack.pop()
+                if not stack:
+                    return frame[_BEST_PAYLOAD]
+                frame = stack[-1]
+                payload = frame[_PAYLOAD]
+                if make_unmake:
+                    undo_move(frame[_STATE], payload)
+                    frame[_PAYLOAD] = None
+                value = -value
+            else:
+                nodes += 1
+                if nodes >= next_slice:
+                    if stats is not None:
+                        stats.elapsed += time.time() - slice_started_at
+                    slice_started_at = None
+                    yield
+                    slice_started_at = time.time()
+                    if cancellation_token is not None and \
+                            cancellation_token.cancelled:
+                        raise SearchCancelled()
+                    next_slice = nodes + slice_nodes
+
+                if is_state_terminal(state) or len(stack) > max_depth:
+                    if stats is not None:
+                        stats.record_leaf(len(stack))
+                    value = sign * heuristic(state)
+                    if make_unmake:
+                        undo_move(state, payload)
+                        frame[_PAYLOAD] = None
+                else:
+                    frame[_PAYLOAD] = payload
+                    stack.append([state, moves_of(state, -sign), \
+                            -frame[_BETA], -frame[_ALPHA], None, None, \
+                            -sign, None])
+                    continue
+
+            # `value` of the move with `payload` from the `frame` state is
+            # known, update the frame (and its parents if there is a cutoff).
+            while True:
+                best_value = frame[_BEST_VALUE]
+                if best_value is None or value > best_value:
+                    frame[_BEST_VALUE] = value
+                    frame[_BEST_PAYLOAD] = payload
+
+                if value < frame[_BETA]:
+                    if value > frame[_ALPHA]:
+                        frame[_ALPHA] = value
+                    break
+
+                if record_cutoff is not None:
+                    record_cutoff(frame[_STATE], frame[_SIGN], payload, \
+                            max_depth - len(stack) + 1)
+                stack.pop()
+                if not stack:
+                    return payload
+                frame = stack[-1]
+                payload = frame[_PAYLOAD]
+                if make_unmake:
+                    undo_move(frame[_STATE], payload)
+                    frame[_PAYLOAD] = None
+                value = -value
+    finally:
+        if stats is not None:
+            stats.nodes += nodes
+            if slice_started_at is not None:
+                stats.elapsed += time.time() - slice_started_at
+        if make_unmake:
+            # Restore the state if the search is interrupted by an exception.
+            for frame in reversed(stack):
+                if frame[_PAYLOAD] is not None:
+                    undo_move(frame[_STATE], frame[_PAYLOAD])
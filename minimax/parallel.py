@@ -0,0 +1,141 @@
+"""
+This module implements parallel Minimax search: the moves from the root state
+are split between worker processes.
+
+The first root move is searched in the calling process, its value becomes the
+alpha (for the "max" player, or beta for the "min" player) bound of the other
+moves (Young Brothers Wait Concept: the eldest brother is searched first). The
+other moves are searched by workers; when a worker finds a better move, it
+shares the improved bound with all workers through shared memory, so the
+moves which start later are searched with a narrower window.
+
+The result is the same as the result of `minimax.run`: the first root move
+with the best value. The moves which failed low with a bound equal to the best
+value (so it's unknown if they are as good as the best one) and go before the
+best move are searched again with the full window.
+
+See `ParallelSearcher` and `run_parallel` docs.
+"""
+
+import multiprocessing
+import threading
+
+from minimax.solver import _Search, _PLAYER2FUNC, _validate_arguments
+
+_shared_bound = None
+
+def _init_worker(shared_bound):
+    global _shared_bound
+    _shared_bound = shared_bound
+
+def _search_root_move(args):
+    """Searches one root move in the worker. Returns (value, is_exact)."""
+    game_state, player, strategy, alpha, beta = args
+
+    with _shared_bound.get_lock():
+        if player == 1:
+            alpha = max(alpha, _shared_bound.value)
+        else:
+            beta = min(beta, _shared_bound.value)
+
+    value = _search_move(game_state, player, strategy, alpha, beta)
+    is_exact = alpha < value < beta
+
+    if is_exact:
+        with _shared_bound.get_lock():
+            if (player == 1 and value > _shared_bound.value) or \
+                    (player == -1 and value < _shared_bound.value):
+                _shared_bound.value = value
+
+    return value, is_exact
+
+def _search_move(game_state, player, strategy, alpha, beta):
+    """Searches the state after the root move of the player (it's the
+    opponent's turn)."""
+    search = _Search(strategy)
+    value, _ = _PLAYER2FUNC[-player](search, game_state, alpha, beta, 1)
+    return value
+
+class ParallelSearcher:
+    """Keeps a pool of worker processes for parallel searches.
+
+    Example usage:
+
+    searcher = ParallelSearcher(processes=8)
+    searcher.run(game_state, 1, strategy) # the same as minimax.run
+    searcher.close()
+
+    Game states, payloads and the strategy should be picklable. Searches run
+    one at a time (concurrent `run` calls wait for each other).
+    """
+
+    def __init__(self, processes=None):
+        self._shared_bound = multiprocessing.Value("d", 0.0)
+        self._pool = multiprocessing.Pool(processes, \
+                initializer=_init_worker, initargs=(self._shared_bound,))
+        self._lock = threading.Lock()
+
+    def run(self, game_state, player, strategy):
+        """Runs the search, returns the payload (see `minimax.run`)."""
+        _validate_arguments(player, strategy, None)
+
+        with self._lock:
+            return self._run(game_state, player, strategy)
+
+    def _run(self, game_state, player, strategy):
+        below = strategy.below_heuristic()
+        above = strategy.above_heuristic()
+
+        if strategy.is_state_terminal(game_state) or strategy.max_depth() < 0:
+            return None
+
+        substates = list(strategy.all_substates(game_state, player))
+        if not substates:
+            return None
+
+        first_state, first_payload = substates[0]
+        first_value = _search_move(first_state, player, strategy, below, above)
+        if len(substates) == 1:
+            return first_payload
+
+        if player == 1:
+            alpha, beta = first_value, above
+        else:
+            alpha, beta = below, first_value
+        self._shared_bound.value = first_value
+
+        tasks = [(state, player, strategy, alpha, beta) \
+                for state, _ in substates[1:]]
+        results = [(first_value, True)] + \
+                self._pool.map(_search_root_move, tasks, chunksize=1)
+
+        sign = player
+        best_value = max(sign * value for value, is_exact in results \
+                if is_exact) * sign
+        for index, (value, is_exact) in enumerate(results):
+            if value == best_value and not is_exact:
+                # The real value is less or equal (for "max") to the bound,
+                # so the move can be as good as the best one.
+                value = _search_move(substates[index][0], player, strategy, \
+                        below, above)
+            if value == best_value:
+                return substates[index][1]
+
+    def close(self):
+        """stops worker processes"""
+        self._pool.close()
+        self._pool.join()
+
+def run_parallel(game_state, player, strategy, processes=None):
+    """Runs the Minimax algorithm with root moves searched by `processes`
+    worker processes (the number of CPUs by default). Returns the same payload
+    as `minimax.run` with the same arguments.
+
+    Starting the workers takes time, so for many searches use one
+    `ParallelSearcher` instance.
+    """
+    searcher = ParallelSearcher(processes)
+    try:
+        return searcher.run(game_state, player, strategy)
+    finally:
+        searcher.close()
@@ -0,0 +1,313 @@
+"""
+This module implements depth-first proof-number search (df-pn,
+http://en.wikipedia.org/wiki/Proof-number_search): it solves the position
+(finds the result of the game with the best play of both players) instead of
+evaluating it to a fixed depth.
+
+The search grows the tree towards the positions which are the cheapest to
+prove or disprove: the proof number of a position is the least number of
+unsolved positions which should be proved to prove it, the disproof number
+is the same for a disproof. In k-in-a-row games most moves are refuted
+fast, so it solves positions far beyond the depth of `minimax.run`.
+
+Proof and disproof numbers are kept in a table of at most `max_entries`
+positions (the least recently used ones are evicted and searched again if
+needed), so the memory is bounded however long the search is.
+
+Every visited position is expanded: all moves are made to find the keys of
+the substates and the terminal ones. If the strategy implements the
+make/unmake methods of `minimax.run_negamax`, the moves are made and taken
+back on one state, the substates are not built.
+
+The search can run by slices (see `proof_number_steps`), like
+`minimax.negamax_steps`.
+
+See `run_proof_number` and `proof_number_steps` docs.
+"""
+
+from collections import OrderedDict
+import time
+
+from minimax.cancellation import SearchCancelled
+from minimax.negamax import _uses_make_unmake
+from minimax.solver import NoSubstatesReturned
+
+# Proof or disproof number of a solved position.
+_INFINITY = 10 ** 9
+
+# Nodes between cancellation checks of `run_proof_number`.
+_CHECK_INTERVAL = 256
+
+class _OutOfNodes(Exception):
+    pass
+
+class _ProofTable:
+    """{key: (phi, delta)} with LRU eviction."""
+
+    def __init__(self, max_entries):
+        if max_entries < 1:
+            raise ValueError("max_entries should be positive, %d provided" % \
+                    max_entries)
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key, phi, delta):
+        if key not in self._entries and \
+                len(self._entries) >= self._max_entries:
+            self._entries.popitem(last=False)
+        self._entries[key] = (phi, delta)
+        self._entries.move_to_end(key)
+
+class _Search:
+    """One proof of the goal of the `attacker`: a win (`draw_is_goal` is
+    False) or a draw or a win."""
+
+    def __init__(self, strategy, attacker, draw_is_goal, table, max_nodes, \
+            slice_nodes=None, cancellation_token=None):
+        self.strategy = strategy
+        self.attacker = attacker
+        self.draw_is_goal = draw_is_goal
+        self.table = table
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.slice_nodes = slice_nodes
+        self.next_slice = slice_nodes or float("inf")
+        self.cancellation_token = cancellation_token
+        self.make_unmake = _uses_make_unmake(strategy)
+
+    def terminal_numbers(self, game_state, player):
+        """(phi, delta) of the terminal state, `player` is to move"""
+        outcome = self.strategy.outcome(game_state)
+        reached = outcome == self.attacker or \
+                (self.draw_is_goal and outcome == 0)
+        # phi is the proof number of the player to move, delta is the
+        # disproof one: the goal of the attacker is the defender's failure.
+        if reached == (player == self.attacker):
+            return 0, _INFINITY
+        return _INFINITY, 0
+
+    def child(self, state, player):
+        """returns (key, (phi, delta) if the state is terminal or None) of
+        the substate, the `player` has moved"""
+        strategy = self.strategy
+        numbers = None
+        if strategy.is_state_terminal(state):
+            numbers = self.terminal_numbers(state, -player)
+        return (strategy.state_hash(state), -player), numbers
+
+    def children(self, game_state, player):
+        """Returns list of (state or None if the strategy makes moves in
+        place, payload, key, (phi, delta) if the state is terminal) of the
+        substates."""
+        strategy = self.strategy
+        children = []
+        if self.make_unmake:
+            for payload in strategy.moves(game_state, player):
+                strategy.apply_move(game_state, payload, player)
+                try:
+                    key, numbers = self.child(game_state, player)
+                finally:
+                    strategy.undo_move(game_state, payload)
+                children.append((None, payload, key, numbers))
+        else:
+            for state, payload in strategy.all_substates(game_state, player):
+                key, numbers = self.child(state, player)
+                children.append((state, payload, key, numbers))
+        if not children:
+            raise NoSubstatesReturned(game_state, strategy)
+        return children
+
+    def mid(self, game_state, player, key, phi_limit, delta_limit):
+        """Generator which searches until phi >= `phi_limit` or delta >=
+        `delta_limit`, yields between slices. Returns the payload of the best
+        move found (None if the state is terminal)."""
+        self.nodes += 1
+        if self.nodes > self.max_nodes:
+            raise _OutOfNodes()
+        if self.nodes >= self.next_slice:
+            yield
+            if self.cancellation_token is not None and \
+                    self.cancellation_token.cancelled:
+                raise SearchCancelled()
+            self.next_slice = self.nodes + self.slice_nodes
+
+        children = self.children(game_state, player)
+
+        while True:
+            # phi of the state is the least delta of its children, delta is
+            # the sum of phi of the children.
+            phi = _INFINITY
+            delta = 0
+            best = 0
+            second_delta = _INFINITY
+            for index, (_, _, child_key, numbers) in enumerate(children):
+                child_phi, child_delta = numbers or \
+                        self.table.get(child_key) or (1, 1)
+                delta = min(_INFINITY, delta + child_phi)
+                if child_delta < phi:
+                    second_delta = phi
+                    phi = child_delta
+                    best = index
+                elif child_delta < second_delta:
+                    second_delta = child_delta
+
+            if phi >= phi_limit or delta >= delta_limit:
+                self.table.store(key, phi, delta)
+                return children[best][1]
+
+            # The child is searched until its delta is a quarter over the
+            # second best one (the 1 + epsilon trick), not just over it, so
+            # the search doesn't switch between two children too often.
+            state, payload, child_key, _ = children[best]
+            child_phi = (self.table.get(child_key) or (1, 1))[0]
+            child_phi_limit = min(_INFINITY, delta_limit - delta + child_phi)
+            child_delta_limit = min(phi_limit, \
+                    second_delta + second_delta // 4 + 1)
+            if state is not None:
+                yield from self.mid(state, -player, child_key, \
+                        child_phi_limit, child_delta_limit)
+                continue
+
+            self.strategy.apply_move(game_state, payload, player)
+            try:
+                yield from self.mid(game_state, -player, child_key, \
+                        child_phi_limit, child_delta_limit)
+            finally:
+                self.strategy.undo_move(game_state, payload)
+
+def _validate_arguments(player, strategy, max_nodes):
+    for required_method in ("is_state_terminal", "all_substates", \
+            "state_hash", "outcome"):
+        if not callable(getattr(strategy, required_method, None)):
+            raise ValueError("strategy must implement all required " \
+                    "methods, \"%s\" is not implemented or not callable" % \
+                        required_method)
+
+    if player not in (-1, 1):
+        raise ValueError("Player can be only: -1, 1")
+
+    if max_nodes < 1:
+        raise ValueError("max_nodes should be positive, %d provided" % \
+                max_nodes)
+
+def _prove(game_state, player, strategy, draw_is_goal, table, max_nodes, \
+        slice_nodes, cancellation_token):
+    """Generator which returns ((True if the goal is proved, payload),
+    number of visited nodes). The first tuple is (None, None) if `max_nodes`
+    are exhausted."""
+    search = _Search(strategy, player, draw_is_goal, table, max_nodes, \
+            slice_nodes, cancellation_token)
+    key = (strategy.state_hash(game_state), player)
+    try:
+        payload = yield from search.mid(game_state, player, key, _INFINITY, \
+                _INFINITY)
+    except _OutOfNodes:
+        return (None, None), search.nodes
+    phi, _ = table.get(key)
+    return (phi == 0, payload), search.nodes
+
+def run_proof_number(game_state, player, strategy, max_nodes=1000000, \
+        max_entries=1000000, stats=None, cancellation_token=None):
+    """Solves the game_state by depth-first proof-number search. Returns
+    (result, payload) tuple: `result` is 1 or -1 if this player wins with
+    the best play of both players, 0 if it's a draw, or None if the search
+    didn't solve the position within `max_nodes` visited positions.
+    `payload` is the move of the `player` which reaches the result (a
+    winning move, a move which keeps the draw, or some move if the player
+    loses), or None if the result is unknown or the game_state is terminal.
+
+    Arguments:
+
+        game_state, player -- see `minimax.run`.
+        strategy -- object which implements `is_state_terminal`,
+            `all_substates` and `state_hash` methods of the `minimax.run`
+            strategy protocol (`max_depth` and heuristics are not used), and
+            `outcome` method (see below).
+        max_nodes -- the search gives up after visiting this many positions.
+        max_entries -- max number of positions in the table of proof and
+            disproof numbers.
+        stats -- optional `minimax.SearchStats` instance (only `nodes` and
+            `elapsed` are filled).
+        cancellation_token -- optional `minimax.CancellationToken`, see
+            `minimax.run`.
+
+    outcome(game_state) -- accepts a terminal game_state, should return 1 or
+        -1 if this player won, or 0 if it's a draw.
+
+    The result is exact for the moves the strategy generates: if
+    `all_substates` skips some moves (e.g. far from other stones), the
+    position is solved for the game without them. Positions repeated on one
+    path (cycles) are not detected, so the game shouldn't have them.
+
+    Positions are solved in two steps: a win of the `player` is proved
+    first, if there is none, a draw or a win of the `player` is proved.
+
+    If the strategy implements the make/unmake methods of
+    `minimax.run_negamax`, the game_state is changed during the search and
+    restored at the end (even if an exception is raised).
+
+    Every visited position costs all its moves, so the search is slow on
+    large fields: use it for small fields or late positions.
+    """
+
+    steps = proof_number_steps(game_state, player, strategy, max_nodes, \
+            max_entries, stats, slice_nodes=_CHECK_INTERVAL, \
+            cancellation_token=cancellation_token)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+def proof_number_steps(game_state, player, strategy, max_nodes=1000000, \
+        max_entries=1000000, stats=None, slice_nodes=1000, \
+        cancellation_token=None):
+    """Generator which runs `run_proof_number` by slices: it yields None
+    after every `slice_nodes` visited positions, and returns the (result,
+    payload) tuple of `run_proof_number`. `cancellation_token` is checked
+    when the search resumes (see `minimax.negamax_steps`)."""
+
+    _validate_arguments(player, strategy, max_nodes)
+    if slice_nodes < 1:
+        raise ValueError("slice_nodes should be positive, %d provided" % \
+                slice_nodes)
+    if cancellation_token is not None and cancellation_token.cancelled:
+        raise SearchCancelled()
+
+    if strategy.is_state_terminal(game_state):
+        return strategy.outcome(game_state), None
+
+    started_at = time.time()
+    table = _ProofTable(max_entries)
+    nodes = 0
+    try:
+        (proved, payload), used = yield from _prove(game_state, player, \
+                strategy, False, table, max_nodes, slice_nodes, \
+                cancellation_token)
+        nodes += used
+        if proved is None:
+            return None, None
+        if proved:
+            return player, payload
+
+        if nodes >= max_nodes:
+            return None, None
+        # The table keeps numbers of the win proof, the goal has changed.
+        table = _ProofTable(max_entries)
+        (proved, payload), used = yield from _prove(game_state, player, \
+                strategy, True, table, max_nodes - nodes, slice_nodes, \
+                cancellation_token)
+        nodes += used
+        if proved is None:
+            return None, None
+        return (0 if proved else -player), payload
+    finally:
+        if stats is not None:
+            stats.nodes = nodes
+            stats.elapsed = time.time() - started_at
@@ -7,10 +7,14 @@ such as chess, checkers, tic-tac-toe etc.
 This implementation implements Alpha–beta pruning
 http://en.wikipedia.org/wiki/Alpha%E2%80%93beta_pruning
 
-See `run` method docs.
+See `run` and `run_iterative` methods docs.
 """
 
+import time
+from minimax.cancellation import SearchCancelled
 from minimax.keeper_of_min_or_max import KeeperOfMinOrMax
+from minimax.transposition_table import TranspositionTable, EXACT, \
+        LOWER_BOUND, UPPER_BOUND, SOLVED_DEPTH
 
 class NoSubstatesReturned(Exception):
     """Exception raised if no substates returned from the specific game_state.
@@ -25,47 +29,234 @@ class NoSubstatesReturned(Exception):
         self.game_state = game_state
         self.strategy = strategy
 
-def _max(game_state, strategy, alpha, beta, depth):
+class _BudgetExceeded(Exception):
+    """Raised inside the search when the time or node budget of
+    `run_iterative` is exhausted."""
 
-    if strategy.is_state_terminal(game_state) or depth > strategy.max_depth():
+_BUDGET_CHECK_INTERVAL = 256
+
+class _Search:
+    """Keeps everything `_max` and `_min` need during one `run` call."""
+
+    def __init__(self, strategy, transposition_table=None, stats=None, \
+            cancellation_token=None):
+        self.strategy = strategy
+        self.stats = stats
+        self.max_depth = strategy.max_depth()
+        self.table = transposition_table
+        self.record_cutoff = getattr(strategy, "record_cutoff", None)
+        self.root_first_payload = None
+        self.depth_limit_reached = False
+        self.nodes = 0
+        self.next_budget_check = float("inf")
+        self.deadline = None
+        self.node_budget = None
+        self.cancellation_token = cancellation_token
+        if cancellation_token is not None:
+            self.next_budget_check = 0
+
+    def visit_node(self):
+        """counts the node, raises `_BudgetExceeded` if the budget is
+        exhausted, or `SearchCancelled` if the search is cancelled"""
+        self.nodes += 1
+        if self.nodes < self.next_budget_check:
+            return
+
+        self.next_budget_check = self.nodes + _BUDGET_CHECK_INTERVAL
+        if self.cancellation_token is not None and \
+                self.cancellation_token.cancelled:
+            raise SearchCancelled()
+        if self.node_budget is not None and self.nodes >= self.node_budget:
+            raise _BudgetExceeded()
+        if self.deadline is not None and time.time() >= self.deadline:
+            raise _BudgetExceeded()
+
+    def is_leaf(self, game_state, depth):
+        """returns True if the search shouldn't go deeper"""
+        if self.strategy.is_state_terminal(game_state):
+            return True
+        if depth > self.max_depth:
+            self.depth_limit_reached = True
+            return True
+        return False
+
+def _probe(search, game_state, player, alpha, beta, depth):
+    """Looks the position up in the transposition table. Returns the key of
+    the position, (value, payload) tuple if the stored result is enough to
+    skip the search (or None), and the payload of the best move found by the
+    previous search of the position (or None)."""
+    key = (search.strategy.state_hash(game_state), player)
+    entry = search.table.get(key)
+    if entry is None:
+        return key, None, None
+
+    if entry.depth >= search.max_depth - depth and (entry.bound == EXACT or \
+            (entry.bound == LOWER_BOUND and entry.value >= beta) or \
+            (entry.bound == UPPER_BOUND and entry.value <= alpha)):
+        if search.stats is not None:
+            search.stats.table_hits += 1
+        if entry.depth != SOLVED_DEPTH:
+            # The stored result is as limited by the depth as the search of
+            # the position would be, a deeper iteration can change it.
+            search.depth_limit_reached = True
+        return key, (entry.value, entry.payload), entry.payload
+
+    return key, None, entry.payload
+
+def _store(search, key, value, depth, bound, payload, limit_reached):
+    """Stores the result of the position searched at `depth` (if the table
+    is used, `key` is None otherwise). Results of
+    subtrees which reached only terminal states don't depend on the depth.
+    `limit_reached` is `depth_limit_reached` of the search before the
+    position, it's restored (the depth limit is reached by the search if
+    it's reached by any subtree)."""
+    subtree_limited = search.depth_limit_reached
+    if key is not None:
+        search.table.store(key, value, search.max_depth - depth \
+                if subtree_limited else SOLVED_DEPTH, bound, payload)
+    search.depth_limit_reached = limit_reached or subtree_limited
+
+def _substates(search, game_state, player, first_payload):
+    """Returns substates of the game_state. If `first_payload` is provided,
+    the substate with this payload goes first (the best move found by the
+    previous search is the most probable best move, so searching it first
+    gives more cutoffs)."""
+    substates = search.strategy.all_substates(game_state, player)
+    if first_payload is None:
+        return substates
+
+    substates = list(substates)
+    for index, (_, payload) in enumerate(substates):
+        if payload == first_payload:
+            substates.insert(0, substates.pop(index))
+            break
+    return substates
+
+def _max(search, game_state, alpha, beta, depth):
+
+    search.visit_node()
+    strategy = search.strategy
+    if search.is_leaf(game_state, depth):
+        if search.stats is not None:
+            search.stats.record_leaf(depth)
         value = strategy.heuristic(game_state)
         return (value, None)
 
+    first_payload = search.root_first_payload if depth == 0 else None
+    key = None
+    if search.table is not None:
+        key, result, table_payload = _probe(search, game_state, 1, alpha, \
+                beta, depth)
+        if result is not None:
+            return result
+        if first_payload is None:
+            first_payload = table_payload
+    original_alpha = alpha
+    limit_reached = search.depth_limit_reached
+    search.depth_limit_reached = False
+
     max_keeper = KeeperOfMinOrMax.max()
 
-    for new_game_state, payload in strategy.all_substates(game_state, 1):
-        value, _ = _min(new_game_state, strategy, alpha, beta, depth + 1)
+    for new_game_state, payload in _substates(search, game_state, 1, \
+            first_payload):
+        value, _ = _min(search, new_game_state, alpha, beta, depth + 1)
         if value >= beta:
+            _store(search, key, value, depth, LOWER_BOUND, payload, \
+                    limit_reached)
+            if search.record_cutoff is not None:
+                search.record_cutoff(game_state, 1, payload, \
+                        search.max_depth - depth)
+            if search.stats is not None:
+                search.stats.record_cutoff(depth)
             return value, payload
         max_keeper.check_keep_or_reject(value, payload=payload)
-        alpha = max_keeper.value()
+        alpha = max(alpha, max_keeper.value())
 
     if max_keeper.value() == None:
         raise NoSubstatesReturned(game_state, strategy)
 
+    bound = UPPER_BOUND if max_keeper.value() <= original_alpha else EXACT
+    _store(search, key, max_keeper.value(), depth, bound, \
+            max_keeper.payload(), limit_reached)
+
     return max_keeper.value(), max_keeper.payload()
 
-def _min(game_state, strategy, alpha, beta, depth):
+def _min(search, game_state, alpha, beta, depth):
 
-    if strategy.is_state_terminal(game_state) or depth > strategy.max_depth():
+    search.visit_node()
+    strategy = search.strategy
+    if search.is_leaf(game_state, depth):
+        if search.stats is not None:
+            search.stats.record_leaf(depth)
         value = strategy.heuristic(game_state)
         return (value, None)
 
+    first_payload = search.root_first_payload if depth == 0 else None
+    key = None
+    if search.table is not None:
+        key, result, table_payload = _probe(search, game_state, -1, alpha, \
+                beta, depth)
+        if result is not None:
+            return result
+        if first_payload is None:
+            first_payload = table_payload
+    original_beta = beta
+    limit_reached = search.depth_limit_reached
+    search.depth_limit_reached = False
+
     min_keeper = KeeperOfMinOrMax.min()
 
-    for new_game_state, payload in strategy.all_substates(game_state, -1):
-        value, _ = _max(new_game_state, strategy, alpha, beta, depth + 1)
+    for new_game_state, payload in _substates(search, game_state, -1, \
+            first_payload):
+        value, _ = _max(search, new_game_state, alpha, beta, depth + 1)
         if value <= alpha:
+            _store(search, key, value, depth, UPPER_BOUND, payload, \
+                    limit_reached)
+            if search.record_cutoff is not None:
+                search.record_cutoff(game_state, -1, payload, \
+                        search.max_depth - depth)
+            if search.stats is not None:
+                search.stats.record_cutoff(depth)
             return value, payload
         min_keeper.check_keep_or_reject(value, payload=payload)
-        beta = min_keeper.value()
+        beta = min(beta, min_keeper.value())
 
     if min_keeper.value() == None:
         raise NoSubstatesReturned(game_state, strategy)
 
+    bound = LOWER_BOUND if min_keeper.value() >= original_beta else EXACT
+    _store(search, key, min_keeper.value(), depth, bound, \
+            min_keeper.payload(), limit_reached)
+
     return min_keeper.value(), min_keeper.payload()
 
-def run(game_state, player, strategy):
+def _validate_arguments(player, strategy, transposition_table):
+    all_strategy_attribs = dir(strategy)
+    for required_method in ("below_heuristic", "above_heuristic", "max_depth", \
+            "heuristic", "is_state_terminal", "all_substates"):
+        if (required_method not in all_strategy_attribs) or \
+            (not callable(getattr(strategy, required_method))):
+            raise ValueError("strategy must implement all required " \
+                    "methods, \"%s\" is not implemented or not callable" % \
+                        required_method)
+
+    if strategy.below_heuristic() >= strategy.above_heuristic():
+        raise ValueError("strategy's below_heuristic should be less that" \
+                "above_heuristic (now below=%d, above=%d)" % \
+                (strategy.below_heuristic(), strategy.above_heuristic()))
+
+    if player not in (-1, 1):
+        raise ValueError("Player can be only: -1, 1")
+
+    if transposition_table is not None and \
+            not callable(getattr(strategy, "state_hash", None)):
+        raise ValueError("strategy must implement \"state_hash\" method " \
+                "to be used with a transposition table")
+
+_PLAYER2FUNC = {-1: _min, 1: _max}
+
+def run(game_state, player, strategy, transposition_table=None, stats=None, \
+        cancellation_token=None):
     """Runs the Minimax algorithm. Returns the payload for the optimal possible
     state if this state exists, or None (it means that the passed game_state is
     terminal.
@@ -75,6 +266,16 @@ def run(game_state, player, strategy):
         game_state -- any object which will be passed to the strategy
         player - number -1 or 1. Indicates "min" or "max" player.
         strategy - object which implements the required methods (see below).
+        transposition_table - optional `minimax.TranspositionTable` instance.
+            If it's provided, results of searched positions are stored there
+            and positions reached through different move orders are not
+            searched again. The strategy should implement `state_hash` method
+            in this case.
+        stats - optional `minimax.SearchStats` instance, it's filled with
+            statistics of the search (visited nodes, cutoffs, time etc.).
+        cancellation_token - optional `minimax.CancellationToken`. It's
+            checked every few hundred visited nodes, `minimax.SearchCancelled`
+            is raised if it's cancelled (e.g. from another thread).
 
     The strategy object should implement thsese methods:
 
@@ -103,6 +304,19 @@ def run(game_state, player, strategy):
         will be returned by the `run` method at the end of execution (or None
         if the optimal state can't be found).
 
+    The strategy object can implement these methods:
+
+    state_hash(game_state) -- required only if `transposition_table` is
+        used. Should return a hashable value which is equal for equal
+        positions (e.g. Zobrist hash of the game field) and different for
+        different positions. The player to move is added to the table key by
+        `run`, so the hash doesn't need to include it.
+
+    record_cutoff(game_state, player, payload, depth) -- called when the move with the payload, made by the player from the
+        game_state, caused an alpha-beta cutoff. `depth` is the remaining
+        depth of the search. The strategy can use it to search such moves
+        first (e.g. killer moves and history heuristics).
+
     Strategy implementation example:
 
     class TicTacToeSimpleStrategy:
@@ -137,25 +351,94 @@ def run(game_state, player, strategy):
     # a draw.
     """
 
-    all_strategy_attribs = dir(strategy)
-    for required_method in ("below_heuristic", "above_heuristic", "max_depth", \
-            "heuristic", "is_state_terminal", "all_substates"):
-        if (required_method not in all_strategy_attribs) or \
-            (not callable(getattr(strategy, required_method))):
-            raise ValueError("strategy must implement all required " \
-                    "methods, \"%s\" is not implemented or not callable" % \
-                        required_method)
+    _validate_arguments(player, strategy, transposition_table)
+
+    started_at = time.time()
+    search = _Search(strategy, transposition_table, stats, cancellation_token)
+    try:
+        _, payload = _PLAYER2FUNC[player](search, game_state, \
+                strategy.below_heuristic(), strategy.above_heuristic(), 0)
+    finally:
+        _finish_stats(search, started_at)
+    if stats is not None:
+        stats.completed_depth = search.max_depth
+    return payload
 
-    if strategy.below_heuristic() >= strategy.above_heuristic():
-        raise ValueError("strategy's below_heuristic should be less that" \
-                "above_heuristic (now below=%d, above=%d)" % \
-                (strategy.below_heuristic(), strategy.above_heuristic()))
+def _finish_stats(search, started_at):
+    if search.stats is not None:
+        search.stats.nodes = search.nodes
+        search.stats.elapsed = time.time() - started_at
+
+def run_iterative(game_state, player, strategy, time_budget=None, \
+        node_budget=None, max_depth=None, transposition_table=None, \
+        stats=None, cancellation_token=None):
+    """Runs the Minimax algorithm with iterative deepening
+    (http://en.wikipedia.org/wiki/Iterative_deepening_depth-first_search):
+    searches with max depth 0, 1, 2... until the budget is exhausted, and
+    returns the payload found by the deepest finished iteration.
+
+    Each iteration searches the best move of the previous one first. If the
+    transposition table is used (it's created for the call if the strategy
+    implements `state_hash` and no table is provided), the best moves of all
+    positions of the previous iteration (its principal variation) are
+    searched first too, so deeper iterations get more cutoffs and the
+    shallow iterations cost a little.
 
-    player2func = {-1: _min, 1: _max}
-    if player not in player2func.keys():
-        raise ValueError("Player can be only: %s" % ", ".join(player2func.keys()))
+    Arguments:
 
-    func = player2func[player]
-    _, payload = func(game_state, strategy, \
-            strategy.below_heuristic(), strategy.above_heuristic(), 0)
-    return payload
+        game_state, player, strategy -- see `run`. The `max_depth` method of
+            the strategy is not used.
+        time_budget -- search time limit in seconds (float), or None.
+        node_budget -- limit of visited nodes, or None.
+        max_depth -- the depth of the last iteration, or None. The search
+            stops anyway when an iteration reaches only terminal states.
+        transposition_table, stats -- see `run`. `stats.completed_depth` is
+            the depth of the deepest finished iteration, nodes of all
+            iterations are counted.
+        cancellation_token -- see `run`, the first iteration is cancelled
+            too.
+
+    The first iteration (the depth is 0, so only the moves from game_state are
+    evaluated) is always finished, so a payload is returned even if the
+    budget is too small.
+    """
+
+    _validate_arguments(player, strategy, transposition_table)
+
+    if transposition_table is None and \
+            callable(getattr(strategy, "state_hash", None)):
+        transposition_table = TranspositionTable()
+
+    started_at = time.time()
+    search = _Search(strategy, transposition_table, stats, cancellation_token)
+    func = _PLAYER2FUNC[player]
+    payload = None
+    depth = 0
+
+    while max_depth is None or depth <= max_depth:
+        search.max_depth = depth
+        search.depth_limit_reached = False
+        search.root_first_payload = payload
+
+        try:
+            _, payload = func(search, game_state, \
+                    strategy.below_heuristic(), strategy.above_heuristic(), 0)
+        except _BudgetExceeded:
+            break
+        finally:
+            _finish_stats(search, started_at)
+
+        if stats is not None:
+            stats.completed_depth = depth
+        if not search.depth_limit_reached:
+            break
+
+        if depth == 0:
+            if time_budget is not None:
+                search.deadline = started_at + time_budget
+            search.node_budget = node_budget
+            search.next_budget_check = 0
+
+        depth += 1
+
+    return payload
\ No newline at end of file
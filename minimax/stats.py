@@ -0,0 +1,72 @@
+"""
+This module implements statistics of Minimax searches: how many nodes were
+visited and evaluated, where cutoffs happened, how deep the search went and
+how long it took. See `SearchStats` docs.
+"""
+
+class SearchStats:
+    """Statistics of one search. Pass an instance to `minimax.run` or
+    `minimax.run_iterative` (the `stats` argument), it's filled during the
+    search.
+
+    Attributes:
+
+        nodes -- number of visited states (including leaves).
+        leaves -- number of states evaluated by the strategy's `heuristic`.
+        cutoffs -- dict {depth: number of alpha-beta cutoffs at this depth}
+            (depth 0 is the root state).
+        table_hits -- number of states whose results were taken from the
+            transposition table (without searching them).
+        max_depth -- the deepest visited depth.
+        completed_depth -- the search depth of the last finished iteration
+            (`run_iterative`), or the strategy's max depth (`run`).
+        elapsed -- wall time of the search in seconds.
+
+    Example usage:
+
+    stats = SearchStats()
+    minimax.run(game_state, 1, strategy, stats=stats)
+    logging.info("search: %s", stats)
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = dict()
+        self.table_hits = 0
+        self.max_depth = 0
+        self.completed_depth = None
+        self.elapsed = 0.0
+
+    def record_leaf(self, depth):
+        self.leaves += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def record_cutoff(self, depth):
+        self.cutoffs[depth] = self.cutoffs.get(depth, 0) + 1
+
+    @property
+    def total_cutoffs(self):
+        return sum(self.cutoffs.values())
+
+    @property
+    def nodes_per_second(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return self.nodes / self.elapsed
+
+    def as_dict(self):
+        """Returns the statistics as a dict (e.g. to send them to a metrics
+        system or to serialize to JSON)."""
+        return dict(nodes=self.nodes, leaves=self.leaves, \
+                cutoffs=dict(self.cutoffs), table_hits=self.table_hits, \
+                max_depth=self.max_depth, \
+                completed_depth=self.completed_depth, elapsed=self.elapsed)
+
+    def __str__(self):
+        return "nodes: %d, leaves: %d, cutoffs: %d, table hits: %d, " \
+                "max depth: %d, completed depth: %s, elapsed: %.3fs " \
+                "(%.0f nodes/s)" % (self.nodes, self.leaves, \
+                self.total_cutoffs, self.table_hits, self.max_depth, \
+                self.completed_depth, self.elapsed, self.nodes_per_second)
@@ -0,0 +1,51 @@
+class NimStrategy:
+    """Take 1-3 sticks from the pile, the player who takes the last stick
+    wins. State is a tuple (pile, result)."""
+
+    def __init__(self, max_depth=20):
+        self.searched_states = 0
+        self._max_depth = max_depth
+
+    def below_heuristic(self): return -2
+    def above_heuristic(self): return 2
+    def max_depth(self): return self._max_depth
+
+    def heuristic(self, state):
+        return state[1]
+
+    def is_state_terminal(self, state):
+        return state[0] == 0
+
+    def outcome(self, state):
+        return state[1]
+
+    def state_hash(self, state):
+        return state
+
+    def all_substates(self, state, player):
+        self.searched_states += 1
+        for take in (1, 2, 3):
+            if take <= state[0]:
+                pile = state[0] - take
+                yield (pile, player if pile == 0 else 0), take
+
+class MutableNimStrategy(NimStrategy):
+    """The same game with make/unmake methods. State is a list
+    [pile, result], it's changed in place."""
+
+    def __init__(self, max_depth=20):
+        NimStrategy.__init__(self, max_depth)
+        self.applied_moves = 0
+
+    def moves(self, state, player):
+        self.searched_states += 1
+        return [take for take in (1, 2, 3) if take <= state[0]]
+
+    def apply_move(self, state, payload, player):
+        self.applied_moves += 1
+        state[0] -= payload
+        state[1] = player if state[0] == 0 else 0
+
+    def undo_move(self, state, payload):
+        state[0] += payload
+        state[1] = 0
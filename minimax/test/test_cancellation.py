@@ -0,0 +1,52 @@
+import pytest
+import minimax
+from minimax.test.nim_strategy import NimStrategy
+
+class CancellingNimStrategy(NimStrategy):
+    """Cancels the token after `cancel_after` searched states."""
+
+    def __init__(self, token, cancel_after):
+        NimStrategy.__init__(self)
+        self._token = token
+        self._cancel_after = cancel_after
+
+    def all_substates(self, state, player):
+        if self.searched_states == self._cancel_after:
+            self._token.cancel()
+        return NimStrategy.all_substates(self, state, player)
+
+def test_token():
+    token = minimax.CancellationToken()
+    assert not token.cancelled
+    token.check()
+
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(minimax.SearchCancelled):
+        token.check()
+
+def test_not_cancelled_search():
+    token = minimax.CancellationToken()
+    assert minimax.run((15, 0), 1, NimStrategy(), \
+            cancellation_token=token) == 3
+    assert minimax.run_iterative((15, 0), 1, NimStrategy(), \
+            cancellation_token=token) == 3
+    assert minimax.run_negamax((15, 0), 1, NimStrategy(), \
+            cancellation_token=token) == 3
+
+def test_cancelled_search():
+    for search in (minimax.run, minimax.run_iterative, minimax.run_negamax):
+        token = minimax.CancellationToken()
+        strategy = CancellingNimStrategy(token, 300)
+        with pytest.raises(minimax.SearchCancelled):
+            search((21, 0), 1, strategy, cancellation_token=token)
+        # the search stops within the check interval
+        assert strategy.searched_states < 300 + 300
+
+def test_cancelled_before_start():
+    token = minimax.CancellationToken()
+    token.cancel()
+    strategy = NimStrategy()
+    with pytest.raises(minimax.SearchCancelled):
+        minimax.run((21, 0), 1, strategy, cancellation_token=token)
+    assert strategy.searched_states == 0
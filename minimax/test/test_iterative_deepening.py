@@ -0,0 +1,82 @@
+import time
+import pytest
+import minimax
+from minimax.test.nim_strategy import NimStrategy
+
+class SlowNimStrategy(NimStrategy):
+    def all_substates(self, state, player):
+        time.sleep(0.001)
+        return NimStrategy.all_substates(self, state, player)
+
+class NoHashNimStrategy(NimStrategy):
+    state_hash = None
+
+def test_finds_winning_moves():
+    for strategy_class in (NimStrategy, NoHashNimStrategy):
+        for pile in range(1, 16):
+            if pile % 4:
+                assert minimax.run_iterative((pile, 0), 1, \
+                        strategy_class()) == pile % 4
+
+def test_stops_when_all_states_are_terminal():
+    strategy = NimStrategy()
+    minimax.run_iterative((6, 0), -1, strategy, max_depth=100)
+
+    # The deepest iteration which reaches all the terminal states
+    # is depth 5 (six moves by one stick).
+    plain_strategy = NimStrategy(max_depth=5)
+    minimax.run((6, 0), -1, plain_strategy)
+    assert strategy.searched_states < plain_strategy.searched_states * 6
+
+def test_max_depth():
+    strategy = NimStrategy()
+    minimax.run_iterative((30, 0), 1, strategy, max_depth=2)
+
+    plain_strategy = NimStrategy(max_depth=2)
+    minimax.run((30, 0), 1, plain_strategy)
+    assert strategy.searched_states < plain_strategy.searched_states * 3
+
+def test_node_budget():
+    strategy = NoHashNimStrategy()
+    payload = minimax.run_iterative((40, 0), 1, strategy, node_budget=1000)
+
+    assert payload in (1, 2, 3)
+    assert strategy.searched_states < 1000 + 256
+
+def test_time_budget():
+    strategy = SlowNimStrategy()
+    started_at = time.time()
+    payload = minimax.run_iterative((40, 0), 1, strategy, time_budget=0.1)
+
+    assert payload in (1, 2, 3)
+    assert time.time() - started_at < 0.5
+
+def test_first_iteration_is_always_finished():
+    strategy = SlowNimStrategy()
+    assert minimax.run_iterative((3, 0), 1, strategy, time_budget=0) == 3
+
+def test_validates_player():
+    with pytest.raises(ValueError) as excinfo:
+        minimax.run_iterative((3, 0), 0, NimStrategy())
+    assert str(excinfo.value) == "Player can be only: -1, 1"
+
+def test_table_reused_for_next_moves():
+    # Results of the previous move's search are limited by its depth, they
+    # don't stop deepening of the next one.
+    table = minimax.TranspositionTable()
+    for pile in (40, 38):
+        stats = minimax.SearchStats()
+        minimax.run_iterative((pile, 0), 1, NimStrategy(), \
+                node_budget=3000, transposition_table=table, stats=stats)
+        assert stats.completed_depth > 0
+        assert stats.nodes > 1000
+
+def test_solved_results_stop_deepening():
+    table = minimax.TranspositionTable()
+    minimax.run_iterative((6, 0), 1, NimStrategy(), transposition_table=table)
+    stats = minimax.SearchStats()
+    minimax.run_iterative((6, 0), 1, NimStrategy(), transposition_table=table, \
+            stats=stats)
+    # the root result is proven, the first iteration takes it
+    assert stats.completed_depth == 0
+    assert stats.nodes == 1
@@ -0,0 +1,69 @@
+import pytest
+import minimax
+from minimax.test.nim_strategy import NimStrategy
+
+class PlayoutNimStrategy(NimStrategy):
+    """Rollouts always take one stick."""
+    def __init__(self):
+        NimStrategy.__init__(self)
+        self.playouts = 0
+
+    def random_playout(self, state, player, rnd):
+        self.playouts += 1
+        return player if state[0] % 2 == 1 else -player
+
+def test_finds_winning_moves():
+    for pile in (5, 6, 7, 9):
+        for player in (1, -1):
+            assert minimax.run_mcts((pile, 0), player, NimStrategy(), \
+                    iterations=2000, seed=1) == pile % 4
+
+def test_terminal_state():
+    assert minimax.run_mcts((0, 1), -1, NimStrategy()) is None
+
+def test_stats():
+    stats = minimax.SearchStats()
+    minimax.run_mcts((10, 0), 1, NimStrategy(), iterations=100, stats=stats)
+    assert stats.nodes == 100
+    assert stats.elapsed > 0
+
+def test_time_budget():
+    stats = minimax.SearchStats()
+    minimax.run_mcts((30, 0), 1, NimStrategy(), iterations=None, \
+            time_budget=0.1, stats=stats)
+    assert 0.1 <= stats.elapsed < 1
+    assert stats.nodes > 0
+
+def test_random_playout_of_strategy():
+    strategy = PlayoutNimStrategy()
+    # taking one stick, the player to move wins odd piles
+    assert minimax.run_mcts((3, 0), 1, strategy, iterations=200, \
+            seed=1) == 3
+    assert strategy.playouts > 0
+
+def test_parallel_rollouts():
+    searcher = minimax.MCTSearcher(processes=2, iterations=1000, seed=1)
+    try:
+        assert searcher.run((9, 0), 1, NimStrategy()) == 1
+    finally:
+        searcher.close()
+
+def test_tree_reuse():
+    searcher = minimax.MCTSearcher(processes=0, iterations=2000, seed=1)
+    strategy = NimStrategy()
+    assert searcher.run((9, 0), 1, strategy) == 1
+    assert len(searcher._trees) == 1
+    # the opponent took 2 sticks, the position is in the tree
+    assert searcher.run((6, 0), 1, strategy) == 2
+    assert len(searcher._trees) == 1
+    # a new game
+    searcher.run((30, 0), -1, strategy)
+    assert len(searcher._trees) == 2
+
+def test_validates_arguments():
+    with pytest.raises(ValueError) as excinfo:
+        minimax.run_mcts((5, 0), 2, NimStrategy())
+    assert str(excinfo.value) == "Player can be only: -1, 1"
+
+    with pytest.raises(ValueError):
+        minimax.MCTSearcher(processes=0, iterations=None)
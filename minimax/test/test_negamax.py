@@ -0,0 +1,123 @@
+import sys
+import pytest
+import minimax
+from minimax.test.nim_strategy import NimStrategy, MutableNimStrategy
+
+class TiedNimStrategy(NimStrategy):
+    def __init__(self):
+        NimStrategy.__init__(self, max_depth=3)
+
+class FailingNimStrategy(MutableNimStrategy):
+    def heuristic(self, state):
+        if self.applied_moves > 5:
+            raise RuntimeError("heuristic failed")
+        return MutableNimStrategy.heuristic(self, state)
+
+class TakeOneStrategy(NimStrategy):
+    """Only one stick can be taken, so the search depth is the pile size."""
+    def all_substates(self, state, player):
+        pile = state[0] - 1
+        yield (pile, player if pile == 0 else 0), 1
+
+def test_same_moves_as_recursive_search():
+    for strategy_class in (NimStrategy, TiedNimStrategy):
+        for pile in range(1, 12):
+            for player in (1, -1):
+                expected = minimax.run((pile, 0), player, strategy_class())
+                assert minimax.run_negamax((pile, 0), player, \
+                        strategy_class()) == expected
+
+def test_make_unmake_moves():
+    for pile in range(1, 12):
+        for player in (1, -1):
+            expected = minimax.run((pile, 0), player, NimStrategy())
+            state = [pile, 0]
+            strategy = MutableNimStrategy()
+            assert minimax.run_negamax(state, player, strategy) == expected
+            assert state == [pile, 0]
+            assert strategy.applied_moves > 0
+
+def test_same_number_of_searched_states():
+    recursive = NimStrategy()
+    minimax.run((15, 0), 1, recursive)
+    mutable = MutableNimStrategy()
+    minimax.run_negamax([15, 0], 1, mutable)
+    assert mutable.searched_states == recursive.searched_states
+
+def test_state_restored_after_exception():
+    state = [10, 0]
+    with pytest.raises(RuntimeError):
+        minimax.run_negamax(state, 1, FailingNimStrategy())
+    assert state == [10, 0]
+
+def test_terminal_state():
+    assert minimax.run_negamax((0, 1), 1, NimStrategy()) == None
+
+def test_deeper_than_recursion_limit():
+    pile = sys.getrecursionlimit() * 2
+    strategy = TakeOneStrategy(max_depth=pile)
+    assert minimax.run_negamax((pile, 0), 1, strategy) == 1
+
+def test_validates_arguments():
+    with pytest.raises(ValueError):
+        minimax.run_negamax((3, 0), 1, object())
+    with pytest.raises(ValueError):
+        minimax.run_negamax((3, 0), 0, NimStrategy())
+
+def run_steps(steps):
+    """returns (payload, number of yields)"""
+    yields = 0
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            return stop.value, yields
+        yields += 1
+
+def test_steps_same_moves():
+    for pile in range(1, 12):
+        for player in (1, -1):
+            expected = minimax.run_negamax((pile, 0), player, NimStrategy())
+            payload, _ = run_steps(minimax.negamax_steps((pile, 0), player, \
+                    NimStrategy(), slice_nodes=3))
+            assert payload == expected
+
+def test_steps_slices():
+    stats = minimax.SearchStats()
+    payload, yields = run_steps(minimax.negamax_steps((15, 0), 1, \
+            NimStrategy(), slice_nodes=100, stats=stats))
+    assert payload == 3
+    assert yields == stats.nodes // 100
+    assert stats.leaves > 0
+    assert stats.max_depth == 15
+
+def test_steps_max_depth():
+    stats = minimax.SearchStats()
+    run_steps(minimax.negamax_steps((15, 0), 1, NimStrategy(), max_depth=2, \
+            stats=stats))
+    assert stats.max_depth == 3
+
+def test_steps_cancelled():
+    state = [15, 0]
+    token = minimax.CancellationToken()
+    steps = minimax.negamax_steps(state, 1, MutableNimStrategy(), \
+            slice_nodes=10, cancellation_token=token)
+    next(steps)
+    next(steps)
+    token.cancel()
+    with pytest.raises(minimax.SearchCancelled):
+        next(steps)
+    assert state == [15, 0]
+
+def test_steps_closed():
+    state = [15, 0]
+    steps = minimax.negamax_steps(state, 1, MutableNimStrategy(), \
+            slice_nodes=10)
+    next(steps)
+    assert state != [15, 0]
+    steps.close()
+    assert state == [15, 0]
+
+def test_steps_invalid_slice():
+    with pytest.raises(ValueError):
+        next(minimax.negamax_steps((15, 0), 1, NimStrategy(), slice_nodes=0))
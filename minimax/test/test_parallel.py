@@ -0,0 +1,36 @@
+import pytest
+import minimax
+from minimax.parallel import ParallelSearcher
+from minimax.test.nim_strategy import NimStrategy
+
+class TiedNimStrategy(NimStrategy):
+    """Nim where every move from a big pile has the same value: the
+    heuristic is 0 for all non-terminal states, so the result depends on
+    ties resolution."""
+
+    def __init__(self):
+        NimStrategy.__init__(self, max_depth=3)
+
+@pytest.fixture(scope="module")
+def searcher(request):
+    result = ParallelSearcher(processes=2)
+    request.addfinalizer(result.close)
+    return result
+
+def test_same_moves_as_sequential_search(searcher):
+    for strategy_class in (NimStrategy, TiedNimStrategy):
+        for pile in range(1, 12):
+            for player in (1, -1):
+                expected = minimax.run((pile, 0), player, strategy_class())
+                assert searcher.run((pile, 0), player, strategy_class()) == \
+                        expected
+
+def test_terminal_state(searcher):
+    assert searcher.run((0, 1), 1, NimStrategy()) == None
+
+def test_validates_strategy(searcher):
+    with pytest.raises(ValueError):
+        searcher.run((3, 0), 1, object())
+
+def test_run_parallel():
+    assert minimax.run_parallel((7, 0), 1, NimStrategy(), processes=2) == 3
@@ -0,0 +1,111 @@
+import pytest
+import minimax
+from minimax.solver import NoSubstatesReturned
+from minimax.test.nim_strategy import NimStrategy, MutableNimStrategy
+
+class NoMovesNimStrategy(NimStrategy):
+    def all_substates(self, state, player):
+        return iter(())
+
+class DrawNimStrategy(NimStrategy):
+    """The player who takes the last stick gets a draw only."""
+    def outcome(self, state):
+        return 0
+
+class HashableMutableNimStrategy(MutableNimStrategy):
+    def state_hash(self, state):
+        return tuple(state)
+
+def test_solves_nim():
+    for pile in range(1, 30):
+        for player in (1, -1):
+            result, take = minimax.run_proof_number((pile, 0), player, \
+                    NimStrategy())
+            if pile % 4 == 0:
+                assert result == -player
+                assert take in (1, 2, 3)
+            else:
+                assert result == player
+                assert take == pile % 4
+
+def test_draw():
+    result, take = minimax.run_proof_number((5, 0), 1, DrawNimStrategy())
+    assert result == 0
+    assert take in (1, 2, 3)
+
+def test_terminal_state():
+    assert minimax.run_proof_number((0, -1), 1, NimStrategy()) == (-1, None)
+
+def test_max_nodes():
+    stats = minimax.SearchStats()
+    assert minimax.run_proof_number((21, 0), 1, NimStrategy(), \
+            max_nodes=10, stats=stats) == (None, None)
+    assert stats.nodes == 11
+
+    assert minimax.run_proof_number((21, 0), 1, NimStrategy(), \
+            max_nodes=1000, stats=stats) == (1, 1)
+    assert 10 < stats.nodes <= 1000
+
+def test_small_table():
+    # evicted positions are searched again
+    stats = minimax.SearchStats()
+    assert minimax.run_proof_number((21, 0), -1, NimStrategy(), \
+            max_entries=15, stats=stats) == (-1, 1)
+    evicting_nodes = stats.nodes
+    minimax.run_proof_number((21, 0), -1, NimStrategy(), stats=stats)
+    assert evicting_nodes > stats.nodes
+
+def test_validates_arguments():
+    with pytest.raises(ValueError) as excinfo:
+        minimax.run_proof_number((5, 0), 0, NimStrategy())
+    assert str(excinfo.value) == "Player can be only: -1, 1"
+
+    class NoOutcomeStrategy:
+        def is_state_terminal(self, state): return False
+        def all_substates(self, state, player): return iter(())
+        def state_hash(self, state): return state
+
+    with pytest.raises(ValueError) as excinfo:
+        minimax.run_proof_number((5, 0), 1, NoOutcomeStrategy())
+    assert "\"outcome\" is not implemented" in str(excinfo.value)
+
+    with pytest.raises(ValueError):
+        minimax.run_proof_number((5, 0), 1, NimStrategy(), max_nodes=0)
+
+def test_no_substates():
+    with pytest.raises(NoSubstatesReturned):
+        minimax.run_proof_number((5, 0), 1, NoMovesNimStrategy())
+
+def test_make_unmake_moves():
+    for pile in range(1, 20):
+        state = [pile, 0]
+        strategy = HashableMutableNimStrategy()
+        assert minimax.run_proof_number(state, 1, strategy) == \
+                minimax.run_proof_number((pile, 0), 1, NimStrategy())
+        assert state == [pile, 0]
+        assert strategy.applied_moves > 0
+
+def test_steps():
+    steps = minimax.proof_number_steps((29, 0), 1, NimStrategy(), \
+            slice_nodes=5)
+    yields = 0
+    while True:
+        try:
+            next(steps)
+        except StopIteration as stop:
+            assert stop.value == (1, 1)
+            break
+        yields += 1
+    assert yields > 1
+
+def test_steps_cancelled():
+    state = [29, 0]
+    token = minimax.CancellationToken()
+    steps = minimax.proof_number_steps(state, 1, \
+            HashableMutableNimStrategy(), slice_nodes=5, \
+            cancellation_token=token)
+    next(steps)
+    token.cancel()
+    with pytest.raises(minimax.SearchCancelled):
+        next(steps)
+    assert state == [29, 0]
@@ -0,0 +1,44 @@
+import minimax
+from minimax.test.nim_strategy import NimStrategy
+
+def test_counts_nodes_and_leaves():
+    strategy = NimStrategy(max_depth=2)
+    stats = minimax.SearchStats()
+    assert minimax.run((10, 0), 1, strategy, stats=stats) == \
+            minimax.run((10, 0), 1, NimStrategy(max_depth=2))
+
+    # Every searched state is a node, and so is every leaf.
+    assert stats.nodes == strategy.searched_states + stats.leaves
+    assert stats.leaves > 0
+    assert stats.max_depth == 3
+    assert stats.completed_depth == 2
+    assert stats.elapsed >= 0
+    assert stats.table_hits == 0
+
+def test_counts_cutoffs_by_depth():
+    stats = minimax.SearchStats()
+    minimax.run((12, 0), 1, NimStrategy(max_depth=6), stats=stats)
+    assert stats.total_cutoffs > 0
+    assert all(0 <= depth <= 6 for depth in stats.cutoffs)
+    assert stats.total_cutoffs == sum(stats.as_dict()["cutoffs"].values())
+
+def test_counts_transposition_table_hits():
+    stats = minimax.SearchStats()
+    minimax.run((12, 0), 1, NimStrategy(max_depth=8), \
+            transposition_table=minimax.TranspositionTable(), stats=stats)
+    assert stats.table_hits > 0
+
+def test_iterative_search_stats():
+    stats = minimax.SearchStats()
+    minimax.run_iterative((6, 0), -1, NimStrategy(), max_depth=3, stats=stats)
+    assert stats.completed_depth == 3
+    assert stats.nodes > 0
+
+def test_as_dict_and_str():
+    stats = minimax.SearchStats()
+    stats.record_leaf(4)
+    stats.record_cutoff(1)
+    stats.record_cutoff(1)
+    assert stats.as_dict() == dict(nodes=0, leaves=1, cutoffs={1: 2}, \
+            table_hits=0, max_depth=4, completed_depth=None, elapsed=0.0)
+    assert "cutoffs: 2" in str(stats)
@@ -0,0 +1,81 @@
+import pytest
+import minimax
+from minimax.test.nim_strategy import NimStrategy
+from minimax.transposition_table import TranspositionTable, EXACT, \
+        LOWER_BOUND, UPPER_BOUND
+
+def test_validates_max_entries():
+    with pytest.raises(ValueError) as excinfo:
+        TranspositionTable(0)
+    assert str(excinfo.value) == "max_entries should be positive, 0 provided"
+
+def test_store_and_get():
+    table = TranspositionTable(10)
+    assert table.get("a") == None
+
+    table.store("a", 5, 3, EXACT, "payload")
+    entry = table.get("a")
+    assert entry.value == 5
+    assert entry.depth == 3
+    assert entry.bound == EXACT
+    assert entry.payload == "payload"
+
+def test_deeper_exact_entry_is_not_replaced():
+    table = TranspositionTable(10)
+    table.store("a", 5, 3, EXACT)
+    table.store("a", 1, 2, LOWER_BOUND)
+    assert table.get("a").value == 5
+
+    table.store("a", 7, 3, UPPER_BOUND)
+    assert table.get("a").value == 7
+
+def test_least_recently_used_entry_is_evicted():
+    table = TranspositionTable(2)
+    table.store("a", 1, 1, EXACT)
+    table.store("b", 2, 1, EXACT)
+    table.get("a")
+    table.store("c", 3, 1, EXACT)
+
+    assert len(table) == 2
+    assert table.get("b") == None
+    assert table.get("a").value == 1
+    assert table.get("c").value == 3
+
+def test_run_requires_state_hash():
+    strategy = NimStrategy()
+    strategy.state_hash = None
+    with pytest.raises(ValueError) as excinfo:
+        minimax.run((5, 0), 1, strategy, TranspositionTable())
+    assert str(excinfo.value) == "strategy must implement \"state_hash\" " \
+            "method to be used with a transposition table"
+
+def test_run_with_table_finds_the_same_moves():
+    for pile in range(1, 14):
+        for player in (1, -1):
+            plain_strategy = NimStrategy()
+            expected = minimax.run((pile, 0), player, plain_strategy)
+
+            table_strategy = NimStrategy()
+            table = TranspositionTable(1000)
+            result = minimax.run((pile, 0), player, table_strategy, \
+                    transposition_table=table)
+
+            if pile % 4:
+                assert result == expected == pile % 4
+            assert table_strategy.searched_states <= \
+                    plain_strategy.searched_states
+
+def test_run_with_table_searches_less():
+    plain_strategy = NimStrategy()
+    minimax.run((15, 0), 1, plain_strategy)
+
+    table_strategy = NimStrategy()
+    minimax.run((15, 0), 1, table_strategy, TranspositionTable(1000))
+
+    assert table_strategy.searched_states * 5 < plain_strategy.searched_states
+
+def test_run_with_small_table():
+    strategy = NimStrategy()
+    table = TranspositionTable(3)
+    assert minimax.run((14, 0), 1, strategy, table) == 2
+    assert len(table) == 3
@@ -0,0 +1,87 @@
+"""
+This module defines `TranspositionTable` class. See its documentation.
+"""
+
+from collections import namedtuple, OrderedDict
+
+EXACT = "exact"
+LOWER_BOUND = "lower"
+UPPER_BOUND = "upper"
+
+# Depth of results of searches which reached only terminal states, they are
+# exact for any depth.
+SOLVED_DEPTH = float("inf")
+
+TableEntry = namedtuple("TableEntry", ["value", "depth", "bound", "payload"])
+TableEntry.__doc__ = """Result of the search of one position.
+
+    value -- value found by the search
+    depth -- remaining depth of the search (how many plies were searched
+        below the position), or SOLVED_DEPTH if the search reached only
+        terminal states
+    bound -- EXACT if `value` is the exact value of the position, LOWER_BOUND
+        if the real value is greater or equal (beta cutoff), UPPER_BOUND if the
+        real value is less or equal (no move raised alpha)
+    payload -- the payload of the best move found
+"""
+
+class TranspositionTable:
+    """Stores results of already searched positions, so `minimax.run` doesn't
+    search the same position again if it's reached through a different move
+    order (http://en.wikipedia.org/wiki/Transposition_table).
+
+    The table keeps at most `max_entries` entries. When the table is full, the
+    least recently used entry is evicted. A new result for the position which
+    is already stored replaces the old one, unless the old one is an exact
+    value of a deeper search.
+
+    The table can be reused between `minimax.run` calls (e.g. for all moves of
+    a game, or for all games of a server process) as long as the same strategy
+    heuristic is used.
+
+    Example usage:
+
+    table = TranspositionTable(max_entries=100000)
+    minimax.run(game_state, 1, strategy, transposition_table=table)
+    """
+
+    def __init__(self, max_entries=100000):
+        if max_entries < 1:
+            raise ValueError("max_entries should be positive, %d provided" % \
+                    max_entries)
+
+        self._max_entries = max_entries
+        self._entries = OrderedDict()
+
+    @property
+    def max_entries(self):
+        """max_entries getter"""
+        return self._max_entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """returns `TableEntry` stored for the key or None"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def store(self, key, value, depth, bound, payload=None):
+        """stores the search result, evicts the least recently used entry if
+        the table is full"""
+        old_entry = self._entries.get(key)
+        if old_entry is not None:
+            if old_entry.bound == EXACT and old_entry.depth > depth:
+                self._entries.move_to_end(key)
+                return
+        elif len(self._entries) >= self._max_entries:
+            self._entries.popitem(last=False)
+
+        self._entries[key] = TableEntry(value, depth, bound, payload)
+        self._entries.move_to_end(key)
+
+    def clear(self):
+        """removes all entries"""
+        self._entries.clear()
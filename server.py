@@ -1,26 +1,230 @@
+import logging
+import os
 import os.path
+from concurrent.futures import ProcessPoolExecutor
 from tornado.options import define, options, parse_command_line
 from tornado.web import RequestHandler, Application, url
 from tornado.websocket import WebSocketHandler
-from tornado.ioloop import IOLoop
-from tornado.escape import json_decode
+from tornado.ioloop import IOLoop, PeriodicCallback
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+from tornado.process import fork_processes
+
+from minimax import TranspositionTable, ParallelSearcher, MCTSearcher
 
 from tttoe.aiplayer import AIPlayer
+from tttoe.minimax_strategy import MinimaxStrategy
+from tttoe.tablebase import Tablebase
+from tttoe.move_cache import MoveCache, SharedMoveCache
 from tttoe.game import Game
+from tttoe.registry import GameRegistry, RegistryFull
+from tttoe.backend import LocalBackend, Hub, HubBackend, PublishedGame, \
+        RemoteGame, RemotePlayer
+from tttoe import protocol
+from tttoe.gamestate import GameState
+from tttoe.bitboard_gamestate import BitboardGameState
+from tttoe.sparse_gamestate import SparseGameState
+from tttoe.threat_search import ThreatSearch
 
 define("port", default=8888, help="run on the given port", type=int)
 define("debug", default=False, help="run in debug mode")
+define("bitboard", default=True, help="keep game fields as bitmasks " \
+        "(faster AI), use list of lists otherwise")
+define("sparse", default=False, help="keep game fields as dicts of " \
+        "occupied cells, the cost of a move depends on the number of stones, " \
+        "not on the field size (for large fields, overrides --bitboard)")
+define("ai_tt_entries", default=200000, type=int, help="max number of " \
+        "positions kept in the AI transposition table (0 disables it, the " \
+        "search by --ai_slice_nodes doesn't use the table)")
+define("ai_depth", default=5, type=int, help="AI search depth (used if " \
+        "--ai_move_time is not set)")
+define("ai_move_time", default=0.0, type=float, help="AI move time budget " \
+        "in seconds, the search depth is chosen by iterative deepening " \
+        "(0 - search with fixed --ai_depth)")
+define("ai_candidate_radius", default=0, type=int, help="AI considers only " \
+        "moves within this distance from occupied cells (0 - all moves)")
+define("ai_order_moves", default=False, help="AI searches wins, blocks, " \
+        "killer and history moves first")
+define("ai_patterns", default=False, help="AI evaluates non-terminal " \
+        "positions by open and half-open runs of stones")
+define("ai_skip_symmetric", default=True, help="AI doesn't search moves " \
+        "symmetric to already searched ones")
+define("ai_tablebases", default=[], type=str, multiple=True, \
+        help="comma separated paths of tablebase files (built by " \
+        "`make tablebases`), AI looks the moves up there before the search")
+define("ai_threat_depth", default=10, type=int, help="max number of " \
+        "attacker moves of the forced wins by threats AI looks for before " \
+        "the search (0 - don't look)")
+define("ai_threat_nodes", default=5000, type=int, help="max number of " \
+        "positions visited by one look for a forced win by threats")
+define("ai_threat_threes", default=False, help="AI's forced wins by " \
+        "threats include threes, not only fours (finds more wins, slower)")
+define("ai_solve_nodes", default=20000, type=int, help="max number of " \
+        "positions visited by the proof-number search of the \"solve\" AI " \
+        "level, the AI plays proven wins and draws, the normal search runs " \
+        "otherwise (the level ignores --ai_candidate_radius, every position " \
+        "costs all its moves, so it's for small fields only)")
+define("ai_parallel_processes", default=0, type=int, help="number of " \
+        "processes one AI move search is split between (used if " \
+        "--ai_workers is 0)")
+define("ai_mcts", default=False, help="AI chooses moves by Monte Carlo " \
+        "tree search (random games) instead of the minimax search, within " \
+        "--ai_move_time or --ai_mcts_iterations games, played in " \
+        "--ai_parallel_processes processes (0 - in the server process)")
+define("ai_mcts_iterations", default=5000, type=int, help="number of " \
+        "random games of one AI move of --ai_mcts (used if --ai_move_time " \
+        "is not set)")
+define("ai_slice_nodes", default=2000, type=int, help="AI searching in the " \
+        "server process yields to other players after this many nodes, its " \
+        "search is cancelled when the player leaves (0 - the search blocks " \
+        "the process until it's finished). The search by slices doesn't use " \
+        "the transposition table (--ai_tt_entries). The threat search " \
+        "(--ai_threat_nodes), --ai_mcts and --ai_parallel_processes still " \
+        "block the process")
+define("ai_log_stats", default=False, help="log statistics of every AI " \
+        "search (nodes, cutoffs, depth, time)")
+define("ai_move_cache_entries", default=100000, type=int, help="max number " \
+        "of AI moves cached by position for all games (0 - no cache)")
+define("ai_move_cache_mb", default=64, type=int, help="memory limit of the " \
+        "AI move cache in megabytes")
+define("ai_move_cache_file", default="", help="SQLite file of the AI move " \
+        "cache shared by server processes (the cache is kept in memory if " \
+        "it's not provided)")
+define("max_games", default=1000, type=int, help="max number of games, " \
+        "new games are rejected when it's reached (0 - no limit)")
+define("max_games_memory_mb", default=256, type=int, help="max estimated " \
+        "memory of all games in megabytes (0 - no limit)")
+define("game_idle_timeout", default=1800, type=int, help="games without " \
+        "moves and joined or left players for this time (seconds) are " \
+        "closed (0 - never)")
+define("games_sweep_interval", default=60, type=int, help="how often " \
+        "(seconds) idle games are looked for")
+define("max_send_queue", default=64, type=int, help="max number of " \
+        "messages queued for a slow player, its board updates are replaced " \
+        "by one snapshot of the game when it's exceeded")
+define("send_flush_interval", default=100, type=int, help="how often " \
+        "(milliseconds) messages queued for slow players are sent")
+define("processes", default=1, type=int, help="number of forked server " \
+        "processes sharing the port (0 - one per CPU), players of one game " \
+        "can be connected to different processes")
+define("hub_address", default="", help="host:port of the hub which routes " \
+        "games between server processes (a hub is started by the parent " \
+        "process if it's not provided and --processes is not 1)")
+define("hub_authkey", default="", help="authentication key of the hub, " \
+        "required with --hub_address (the hub started by the parent process " \
+        "gets a random key if it's not provided)")
+define("ai_workers", default=0, type=int, help="number of worker processes " \
+        "for AI moves search (0 - search in the server process)")
+
+global_game_registry = GameRegistry()
+global_transposition_table = None
+global_ai_executor = None
+global_tablebases = dict()
+global_parallel_searcher = None
+global_move_cache = None
+global_backend = LocalBackend()
+global_published_games = dict()
+
+def publish_game(game):
+    global_published_games[game.game_id] = PublishedGame(global_backend, game)
+
+def unpublish_game(game_id):
+    published = global_published_games.pop(game_id, None)
+    if published is not None:
+        published.close()
+
+def remove_game(game_id):
+    global_game_registry.remove(game_id)
+    unpublish_game(game_id)
+
+def close_game_connections(game):
+    unpublish_game(game.game_id)
+    for player in game.players.values():
+        if isinstance(player, (GameWebSocket, RemotePlayer)):
+            player.close()
+
+def sweep_games():
+    expired = global_game_registry.sweep()
+    if expired:
+        logging.info("%d idle games closed, games: %s", len(expired), \
+                global_game_registry.stats())
+    for game in global_game_registry.games():
+        if game.fanout_stats.dropped:
+            logging.info("game %s messages: %s", game.game_id, \
+                    game.fanout_stats)
+
+def flush_game_messages():
+    for game in global_game_registry.games():
+        game.flush_messages()
 
-global_games_hash = dict()
+def log_search_stats(ai_player, stats):
+    logging.info("AI %s search: %s", ai_player.player_handle, stats)
+
+def make_ai_player(game, level="normal"):
+    tablebase = global_tablebases.get((game.game_state.width, \
+            game.game_state.height, game.game_state.qty_to_win))
+    solve_nodes = options.ai_solve_nodes if level == "solve" else None
+    # Proofs need all moves.
+    candidate_radius = None if solve_nodes else \
+            options.ai_candidate_radius or None
+    strategy = MinimaxStrategy(max_depth=options.ai_depth, \
+            candidate_radius=candidate_radius, \
+            order_moves=options.ai_order_moves, \
+            evaluate_patterns=options.ai_patterns, \
+            skip_symmetric=options.ai_skip_symmetric)
+    time_budget = options.ai_move_time or None
+    stats_callback = log_search_stats if options.ai_log_stats else None
+    threat_search = None
+    if options.ai_threat_depth > 0:
+        threat_search = ThreatSearch(max_depth=options.ai_threat_depth, \
+                max_nodes=options.ai_threat_nodes, \
+                threes=options.ai_threat_threes)
+
+    if global_ai_executor is None:
+        if global_parallel_searcher is None and options.ai_slice_nodes > 0:
+            return AIPlayer(game, io_loop=IOLoop.current(), \
+                    slice_nodes=options.ai_slice_nodes, strategy=strategy, \
+                    time_budget=time_budget, tablebase=tablebase, \
+                    stats_callback=stats_callback, \
+                    move_cache=global_move_cache, threat_search=threat_search, \
+                    solve_nodes=solve_nodes)
+        # Moves of Monte Carlo search are random, they are not cached.
+        move_cache = None if options.ai_mcts else global_move_cache
+        return AIPlayer(game, global_transposition_table, strategy=strategy, \
+                time_budget=time_budget, tablebase=tablebase, \
+                parallel_searcher=global_parallel_searcher, \
+                stats_callback=stats_callback, move_cache=move_cache, \
+                threat_search=threat_search, solve_nodes=solve_nodes)
+    return AIPlayer(game, executor=global_ai_executor, io_loop=IOLoop.current(), \
+            worker_transposition_table_entries=options.ai_tt_entries, \
+            strategy=strategy, time_budget=time_budget, tablebase=tablebase, \
+            stats_callback=stats_callback, move_cache=global_move_cache, \
+            threat_search=threat_search, solve_nodes=solve_nodes)
 
 class GameWebSocket(WebSocketHandler):
     def open(self):
         self._connection_game_id = None
+        self._game = None
+        self._game_created = False
+        self._player_handle = None
+        self._closed = False
+        self._protocol = int(self.get_argument("protocol", "1"))
+        if self._protocol not in protocol.VERSIONS:
+            self._protocol = 1
+            self._reject("Unsupported protocol version.")
+            return
 
         game_id = self.get_argument("game_id", None)
         if game_id:
-            self._game = global_games_hash[game_id]
-            self._setup_current_player()
+            game = global_game_registry.get(game_id)
+            if game is not None:
+                self._game = game
+                self._setup_current_player()
+            else:
+                # The game can be owned by another server process, the hub
+                # is asked without blocking the io_loop.
+                IOLoop.current().add_future(global_backend.has_game(game_id), \
+                        lambda future: self._join_remote_game(game_id, future))
 
         else:
             field_width         = int(self.get_argument("field_width"))
@@ -29,61 +233,172 @@ class GameWebSocket(WebSocketHandler):
             host_char           =     self.get_argument("host_char")
             start_player_handle =     self.get_argument("start_player_handle")
             game_type           =     self.get_argument("game_type")
+            ai_level            =     self.get_argument("ai_level", "normal")
 
-            self._game = Game(field_width, field_height, qty_to_win, \
-                    start_player_handle, host_char)
+            if game_type not in ("vs_ai", "vs_hum", "ai_vs_ai"):
+                raise ValueError("Unknow game type provided: \"%s\"" % game_type)
+            if ai_level not in ("normal", "solve"):
+                raise ValueError("Unknown AI level provided: \"%s\"" % ai_level)
+
+            if options.sparse:
+                state_class = SparseGameState
+            elif options.bitboard:
+                state_class = BitboardGameState
+            else:
+                state_class = GameState
+            game = Game(field_width, field_height, qty_to_win, \
+                    start_player_handle, host_char, state_class=state_class, \
+                    max_send_queue=options.max_send_queue)
+            try:
+                global_game_registry.add(game, joinable=game_type == "vs_hum")
+            except RegistryFull as error:
+                self._reject(error.message)
+                return
+            self._game = game
+            self._game_created = True
 
             if game_type == "vs_ai":
                 self._setup_current_player()
-                ai = AIPlayer(self._game)
+                ai = make_ai_player(self._game, ai_level)
                 if ai.player_handle == self._game.start_player_handle:
                     ai.make_move()
 
             elif game_type == "vs_hum":
-                global_games_hash[self._game.game_id] = self._game
                 self._connection_game_id = self._game.game_id
+                publish_game(self._game)
                 self._setup_current_player()
 
             elif game_type == "ai_vs_ai":
-                ai_1 = AIPlayer(self._game)
-                AIPlayer(self._game)
+                ai_1 = make_ai_player(self._game, ai_level)
+                make_ai_player(self._game, ai_level)
                 self._setup_current_player()
                 ai_1.make_move()
 
-            else:
-                raise ValueError("Unknow game type provided: \"%s\"" % game_type)
+    def _join_remote_game(self, game_id, future):
+        if self._closed:
+            return
+        try:
+            found = future.result()
+        except (EOFError, OSError):
+            self._reject("The game can't be looked up now, try again later.")
+            return
+        if not found:
+            self._reject("The game is not found, create a new game.")
+            return
+        # The setup message comes from the owner process.
+        self._game = RemoteGame(global_backend, game_id)
+        self._game.append_player(self)
+
+    def _reject(self, message):
+        self.write_message(protocol.Message("error", message=message))
+        self.close()
+
+    def write_message(self, message, binary=False):
+        if isinstance(message, protocol.Message):
+            if message["event"] == "setup":
+                # Players of remote games learn their handles here.
+                self._player_handle = message["data"]["player_handle"]
+            message = message.encode(self._protocol)
+        return WebSocketHandler.write_message(self, message, binary)
+
+    def is_write_busy(self):
+        """True while the socket didn't send previous messages (the client
+        or its network is slow), see `tttoe.broadcast`"""
+        connection = self.ws_connection
+        return connection is not None and connection.stream.writing()
 
     def _setup_current_player(self):
-        self._player_handle = self._game.append_player(self)
-        data = dict(event="setup", data=dict(
-            connection_game_id=self._connection_game_id,
-            player_handle=self._player_handle,
-            signs_map=dict(host=self._game.host_char, opponent=dict(x="o", o="x")[self._game.host_char]),
-            start_player_handle=self._game.start_player_handle,
-            field=self._game.game_state.field
-            ))
-        self.write_message(data)
+        player_handle = self._game.append_player(self)
+        self.write_message(self._game.setup_message(player_handle, \
+                self._connection_game_id))
 
     def on_message(self, message):
-        msg = json_decode(message)
-        event = msg["event"]
+        if self._game is None:
+            # The game is being looked up.
+            return
+        event, data = protocol.decode(message, self._protocol)
         if event == "move":
-            data = msg["data"]
             self._game.perform_move(self._player_handle, data["x"], data["y"])
+        elif event == "resync":
+            self._game.send_snapshot(self._player_handle)
         else:
             raise ValueError("Unknown event: %s" % event)
 
     def on_close(self):
+        self._closed = True
+        if self._game is None:
+            return
         self._game.player_left(self._player_handle)
-        if self._player_handle == "host" and self._game.game_id in global_games_hash:
-            del global_games_hash[self._game.game_id]
+        if self._player_handle == "host" or self._game_created:
+            remove_game(self._game.game_id)
 
 class RootHttpHandler(RequestHandler):
     def get(self):
         self.render("client.html")
 
+def parse_address(address):
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
 def main():
+    global global_transposition_table, global_ai_executor, \
+            global_parallel_searcher, global_move_cache, \
+            global_game_registry, global_backend
+
     parse_command_line()
+    authkey = options.hub_authkey.encode("utf-8")
+    hub_address = parse_address(options.hub_address) \
+            if options.hub_address else None
+    if hub_address is not None and not authkey:
+        # The hub unpickles what it receives, a known key would let anyone
+        # who reaches its port run code there.
+        raise SystemExit("--hub_authkey is required with --hub_address")
+    if options.processes != 1 and hub_address is None:
+        # The hub serves in a thread of the parent process, which waits for
+        # the forked processes (they inherit the key).
+        authkey = authkey or os.urandom(32)
+        hub = Hub(authkey)
+        hub.start()
+        hub_address = hub.address
+
+    sockets = bind_sockets(options.port)
+    if options.processes != 1:
+        fork_processes(options.processes)
+    if hub_address is not None:
+        global_backend = HubBackend(hub_address, authkey, \
+                io_loop=IOLoop.current())
+
+    global_game_registry = GameRegistry(max_games=options.max_games or None, \
+            idle_timeout=options.game_idle_timeout or None, \
+            max_memory=options.max_games_memory_mb * 1024 * 1024 or None, \
+            on_expire=close_game_connections)
+
+    for path in options.ai_tablebases:
+        tablebase = Tablebase(path)
+        global_tablebases[(tablebase.width, tablebase.height, \
+                tablebase.qty_to_win)] = tablebase
+
+    if options.ai_move_cache_entries > 0:
+        if options.ai_move_cache_file:
+            global_move_cache = SharedMoveCache(options.ai_move_cache_file, \
+                    options.ai_move_cache_entries)
+        else:
+            global_move_cache = MoveCache(options.ai_move_cache_entries, \
+                    options.ai_move_cache_mb * 1024 * 1024)
+
+    if options.ai_mcts:
+        global_parallel_searcher = MCTSearcher(options.ai_parallel_processes, \
+                iterations=None if options.ai_move_time else \
+                options.ai_mcts_iterations, \
+                time_budget=options.ai_move_time or None)
+    elif options.ai_workers > 0:
+        global_ai_executor = ProcessPoolExecutor(options.ai_workers)
+    elif options.ai_parallel_processes > 0:
+        global_parallel_searcher = ParallelSearcher( \
+                options.ai_parallel_processes)
+    elif options.ai_tt_entries > 0:
+        global_transposition_table = TranspositionTable(options.ai_tt_entries)
+
     app = Application([
             url(r"/", RootHttpHandler),
             url(r"/ws", GameWebSocket)
@@ -92,7 +407,10 @@ def main():
         static_path=os.path.join(os.path.dirname(__file__), "static"),
         debug=options.debug
     )
-    app.listen(options.port)
+    server = HTTPServer(app)
+    server.add_sockets(sockets)
+    PeriodicCallback(sweep_games, options.games_sweep_interval * 1000).start()
+    PeriodicCallback(flush_game_messages, options.send_flush_interval).start()
     IOLoop.current().start()
 
 if __name__ == "__main__":
@@ -9,6 +9,61 @@
     Backbone.history.start();
   });
 
+  // Version 2 of the websocket protocol, see tttoe/protocol.py.
+  var PROTOCOL_VERSION = 2,
+    LONG_HANDLES = {h: "host", o: "opponent", d: "draw", n: "nothing"};
+
+  function longHandle(handle) {
+    return LONG_HANDLES.hasOwnProperty(handle) ? LONG_HANDLES[handle] : handle;
+  }
+
+  function unpackField(board, width, height) {
+    var x, y, char, field = [];
+    for (x = 0; x < width; x++) {
+      field.push([]);
+      for (y = 0; y < height; y++) {
+        char = board.charAt(x * height + y);
+        field[x].push(char === "." ? null : longHandle(char));
+      }
+    }
+    return field;
+  }
+
+  // Returns {event: ..., seq: ..., data: {...}} message of version 1 form.
+  function decodeMessage(msg) {
+    switch (msg.e) {
+      case "s":
+        return {event: "setup", seq: msg.q, data: {
+          connection_game_id: msg.g,
+          player_handle: longHandle(msg.p),
+          signs_map: msg.sm,
+          start_player_handle: longHandle(msg.sp),
+          field: unpackField(msg.b, msg.w, msg.h)
+        }};
+      case "m":
+        return {event: "move", seq: msg.q, data: {
+          player_handle: longHandle(msg.p), x: msg.x, y: msg.y
+        }};
+      case "g":
+        return {event: "gameover", seq: msg.q, data: {
+          result_of_move: longHandle(msg.r)
+        }};
+      case "j":
+        return {event: "playerjoined", data: {player_handle: longHandle(msg.p)}};
+      case "l":
+        return {event: "playerleft", data: {player_handle: longHandle(msg.p)}};
+      case "b":
+        return {event: "sync", seq: msg.q, data: {
+          field: unpackField(msg.b, msg.w, msg.h),
+          result: longHandle(msg.r)
+        }};
+      case "x":
+        return {event: "error", data: {message: msg.m}};
+      default:
+        throw Error("unknown event: " + String(msg.e));
+    }
+  }
+
   var Router = Backbone.Router.extend({
     routes: {
       "": "root",
@@ -90,6 +145,11 @@
         startPlayerSelect = new RadioSelectView({items: [
           {label: "You"     , value: "host"},
           {label: "Opponent", value: "opponent"}
+        ]}),
+
+        aiLevelSelect = new RadioSelectView({items: [
+          {label: "Normal", value: "normal"},
+          {label: "Solve" , value: "solve"}
         ]});
 
       var btnView = new ButtonView({title: "new game"});
@@ -103,6 +163,7 @@
       this._appendView(gameModeSel, {label: "Game mode: "});
       this._appendView(playerSignSelect, {label: "Your sign: "});
       this._appendView(startPlayerSelect, {label: "Who first:"});
+      this._appendView(aiLevelSelect, {label: "AI level: "});
 
       this._appendView(btnView);
 
@@ -120,6 +181,11 @@
         } else {
           _.invoke(dependentViews, "enable");
         }
+        if (mode === "vs_hum") {
+          aiLevelSelect.disable();
+        } else {
+          aiLevelSelect.enable();
+        }
       });
 
       btnView.on("clicked", function() {
@@ -130,6 +196,7 @@
           game_type          : gameModeSel.getValue(),
           host_char          : playerSignSelect.getValue(),
           start_player_handle: startPlayerSelect.getValue(),
+          ai_level           : aiLevelSelect.getValue(),
         });
       }, this);
     },
@@ -321,14 +388,17 @@
     initialize: function(options) {
 
       this._gameIsOver = false;
+      // The number of moves made in the game, see tttoe/protocol.py.
+      this._lastSeq = 0;
 
       if (options.hasOwnProperty("gameId")) {
         var params = {game_id: options.gameId};
       } else if (options.hasOwnProperty("gameParams")) {
-        var params = options.gameParams;
+        var params = _.clone(options.gameParams);
       } else {
         throw new Error("gameParams or gameId should be provided.");
       };
+      params.protocol = PROTOCOL_VERSION;
 
       var wsConnectionUrl = "ws://" + location.host + "/ws?" + $.param(params);
       this._socket = new WebSocket(wsConnectionUrl);
@@ -339,9 +409,18 @@
       this._infoLogView.log("Connecting to the server.");
 
       this._socket.onmessage = _.bind(function(e) {
-        var msg = JSON.parse(e.data),
+        var msg = decodeMessage(JSON.parse(e.data)),
           data = msg.data;
 
+        // A missed move: ask the server for the whole board. The gameover
+        // message has the seq of the last move (the move message follows it,
+        // except for the player who made the move).
+        if ((msg.event === "move" && msg.seq !== this._lastSeq + 1) ||
+            (msg.event === "gameover" && msg.seq > this._lastSeq + 1)) {
+          this._socket.send(JSON.stringify({e: "r"}));
+          return;
+        }
+
         switch (msg.event) {
 
           case "setup":
@@ -351,12 +430,11 @@
               signsMap: data.signs_map
             });
             this.$el.prepend(this._gameFieldView.el);
+            this._lastSeq = msg.seq;
 
             this._gameFieldView.on("movemade", function(x, y) {
-              this._socket.send(JSON.stringify({
-                event: "move",
-                data: {x: x, y: y}
-              }));
+              this._lastSeq++;
+              this._socket.send(JSON.stringify({e: "m", x: x, y: y}));
             }, this);
 
             this._infoLogView.log("Connection established.");
@@ -396,6 +474,7 @@
             }
 
             this._gameFieldView.movePerformed(data.x, data.y, data.player_handle);
+            this._lastSeq = msg.seq;
 
             // last move "move" event can arrive after the game is over.
             // Let's not unlock is this case.
@@ -436,22 +515,34 @@
               throw new Error("\"setup\" event should be received first.");
             }
 
-            this._gameIsOver = true;
+            this._gameOver(data.result_of_move);
+            break;
 
-            if (data.result_of_move === this._playerHandle) {
-              this._infoLogView.log("You won! Congratulations!", {color: "red"});
-            } else if (data.result_of_move === "draw") {
-              this._infoLogView.log("Nobody won. This is a draw.", {color: "red"});
-            } else {
-              if (this._thisIsSpectator) {
-                var template = _.template("Player \"<%= sign %>\" won.");
-                var sign = this._signsMap[data.result_of_move];
-                this._infoLogView.log(template({sign: sign}), {color: "red"});
+          case "sync":
+            if (!this._gameFieldView) {
+              throw new Error("\"setup\" event should be received first.");
+            }
+
+            this._lastSeq = msg.seq;
+            this._gameFieldView.setField(data.field);
+
+            if (data.result !== "nothing") {
+              if (!this._gameIsOver) {
+                this._gameOver(data.result);
+              }
+            } else if (!this._thisIsSpectator) {
+              // The start player moves when the number of moves is even.
+              if ((msg.seq % 2 === 0) === (this._startPlayerHandle === this._playerHandle)) {
+                this._gameFieldView.unlock();
               } else {
-                this._infoLogView.log("You lost.", {color: "red"});
+                this._gameFieldView.lock();
               }
             }
-            this._gameFieldView.lock();
+            break;
+
+          case "error":
+            this._infoLogView.log(data.message, {color: "red"});
+            this._socket.close();
             break;
 
           default:
@@ -460,6 +551,25 @@
       }, this);
     },
 
+    _gameOver: function(result) {
+      this._gameIsOver = true;
+
+      if (result === this._playerHandle) {
+        this._infoLogView.log("You won! Congratulations!", {color: "red"});
+      } else if (result === "draw") {
+        this._infoLogView.log("Nobody won. This is a draw.", {color: "red"});
+      } else {
+        if (this._thisIsSpectator) {
+          var template = _.template("Player \"<%= sign %>\" won.");
+          var sign = this._signsMap[result];
+          this._infoLogView.log(template({sign: sign}), {color: "red"});
+        } else {
+          this._infoLogView.log("You lost.", {color: "red"});
+        }
+      }
+      this._gameFieldView.lock();
+    },
+
     remove: function() {
       this._socket.close();
       this._infoLogView.remove();
@@ -550,6 +660,11 @@
     movePerformed: function(x, y, playerHandle) {
       this._field[x][y] = playerHandle;
       this.render();
+    },
+
+    setField: function(field) {
+      this._field = field;
+      this.render();
     }
   });
 
@@ -1,9 +1,195 @@
+import copy
+import time
+
 import minimax
 from tttoe.minimax_strategy import MinimaxStrategy
+from tttoe.bitboard_gamestate import BitboardGameState
+
+_worker_transposition_table = None
+
+def _solve(game_state, player, strategy, solve_nodes, stats=None):
+    """Returns the move of a proven win or draw of the `player`, or None."""
+    result, move = minimax.run_proof_number(game_state, player, strategy, \
+            max_nodes=solve_nodes, stats=stats)
+    if result is None or result == -player:
+        return None
+    return move
+
+def _run_search(game_state, player, strategy, transposition_table, \
+        time_budget, stats=None, solve_nodes=None):
+    if solve_nodes is not None:
+        move = _solve(game_state, player, strategy, solve_nodes, stats)
+        if move is not None:
+            return move
+    if time_budget is None:
+        return minimax.run(game_state, player, strategy, \
+                transposition_table=transposition_table, stats=stats)
+    return minimax.run_iterative(game_state, player, strategy, \
+            time_budget=time_budget, transposition_table=transposition_table, \
+            stats=stats)
+
+def _sliced_search(game_state, player, strategy, time_budget, slice_nodes, \
+        cancellation_token, stats, solve_nodes=None):
+    """Generator of the search by slices of `slice_nodes` nodes (see
+    `minimax.negamax_steps`), returns (x, y) of the move. If `time_budget` is
+    provided, the depth is chosen by iterative deepening: the move of the
+    deepest iteration finished within the time is returned. If `solve_nodes`
+    is provided, the position is solved first (by slices too)."""
+    if solve_nodes is not None:
+        result, move = yield from minimax.proof_number_steps(game_state, \
+                player, strategy, max_nodes=solve_nodes, \
+                slice_nodes=slice_nodes, cancellation_token=cancellation_token)
+        if result is not None and result != -player:
+            return move
+
+    if time_budget is None:
+        move = yield from minimax.negamax_steps(game_state, player, \
+                strategy, slice_nodes=slice_nodes, \
+                cancellation_token=cancellation_token, stats=stats)
+        stats.completed_depth = strategy.max_depth()
+        return move
+
+    deadline = time.time() + time_budget
+    move = None
+    depth = 0
+    while True:
+        steps = minimax.negamax_steps(game_state, player, strategy, \
+                max_depth=depth, slice_nodes=slice_nodes, \
+                cancellation_token=cancellation_token, stats=stats)
+        try:
+            while True:
+                next(steps)
+                # The first iteration is always finished.
+                if depth > 0 and time.time() >= deadline:
+                    steps.close()
+                    return move
+                yield
+        except StopIteration as stop:
+            move = stop.value
+        stats.completed_depth = depth
+        # The search didn't reach the depth limit, deeper ones are the same.
+        if stats.max_depth <= depth or time.time() >= deadline:
+            return move
+        depth += 1
+
+def search_move(game_state, player, strategy, transposition_table_entries=0, \
+        time_budget=None, collect_stats=False, solve_nodes=None):
+    """Runs the AI search for the `player` (1 or -1) and returns (x, y) of
+    the move. It's a module level function, so it can be submitted to a
+    `ProcessPoolExecutor`. Each worker process keeps its own transposition
+    table of `transposition_table_entries` positions (0 - no table).
+    If `time_budget` (seconds) is provided, iterative deepening search is
+    used (see `minimax.run_iterative`). If `collect_stats` is True, returns
+    ((x, y), `minimax.SearchStats`) tuple. If `solve_nodes` is provided, the
+    position is solved first (see `AIPlayer`)."""
+    global _worker_transposition_table
+
+    table = None
+    if transposition_table_entries > 0:
+        if _worker_transposition_table is None or \
+                _worker_transposition_table.max_entries != \
+                transposition_table_entries:
+            _worker_transposition_table = minimax.TranspositionTable( \
+                    transposition_table_entries)
+        table = _worker_transposition_table
+
+    stats = minimax.SearchStats() if collect_stats else None
+    move = _run_search(game_state, player, strategy, table, time_budget, \
+            stats, solve_nodes)
+    if collect_stats:
+        return move, stats
+    return move
 
 class AIPlayer:
-    def __init__(self, game):
+    """AI player of the `Game`. Behaves like a socket of a human player: the
+    game sends it messages through `write_message`, and it responds with
+    `Game.perform_move` when it's its turn.
+
+    By default the move is searched synchronously. If `executor` (e.g.
+    `concurrent.futures.ProcessPoolExecutor`) and `io_loop` are provided, the
+    search runs in the executor and the move is performed by the io_loop
+    callback when the search is finished, so the io_loop is not blocked.
+
+    If `slice_nodes` and `io_loop` (without `executor`) are provided, the
+    search runs in the io_loop callbacks by slices of `slice_nodes` nodes
+    (see `minimax.negamax_steps`), so other players are served between them.
+    It searches a copy of the game state (made by `searched_copy` of the
+    strategy if it has one) without the transposition table. The tablebase,
+    the move cache and the threat search still run synchronously, as well as
+    the parallel search (which is used instead of the sliced one if it's
+    provided).
+
+    The search is cancelled when a player leaves the game or the game is
+    over: the sliced search stops at the next slice, the search in the
+    executor is cancelled only if it hasn't started yet (its move is dropped
+    anyway).
+
+    If `time_budget` (seconds) is provided, the move is searched by iterative
+    deepening within this time, otherwise the search depth is fixed by the
+    strategy (`MinimaxStrategy()` by default).
+
+    If `tablebase` (`tttoe.tablebase.Tablebase`) is provided, the move is
+    looked up there first, the search runs only if the position is missing.
+
+    If `parallel_searcher` (`minimax.ParallelSearcher`) is provided, the
+    synchronous search splits the moves between its worker processes. It can
+    be a `minimax.MCTSearcher` too: the move is chosen by Monte Carlo tree
+    search, its tree is reused on the next move of the game.
+
+    If `stats_callback` is provided, it's called with the AI player and
+    `minimax.SearchStats` of every searched move (e.g. to log them or send
+    them to a metrics system). The parallel search reports only the elapsed
+    time. Moves found in the tablebase are not reported.
+
+    If `move_cache` (`tttoe.move_cache.MoveCache` or `SharedMoveCache`) is
+    provided, found moves are stored there, and the search runs only if the
+    position is missing (the strategy should implement `cache_key`). Moves
+    searched with `time_budget` depend on the machine load, so they are not
+    cached.
+
+    If `threat_search` (`tttoe.threat_search.ThreatSearch`) is provided, it
+    looks for a forced win by threats before the search (after the tablebase
+    and the move cache), the search runs only if there is none.
+
+    If `solve_nodes` is provided, the position is solved by
+    `minimax.run_proof_number` with the strategy (visiting at most this many
+    positions) before the search. A proven win or draw is played, the search
+    runs if the position isn't solved or it's lost (the search plays the
+    longest resistance). Proofs are exact only if the strategy generates all
+    moves (no `candidate_radius`). The parallel search doesn't solve. The
+    proof-number search is slow on large fields, use it for small ones.
+    """
+
+    def __init__(self, game, transposition_table=None, executor=None, \
+            io_loop=None, worker_transposition_table_entries=0, strategy=None, \
+            time_budget=None, tablebase=None, parallel_searcher=None, \
+            stats_callback=None, move_cache=None, threat_search=None, \
+            solve_nodes=None, slice_nodes=None):
+        if slice_nodes is not None:
+            if io_loop is None or executor is not None:
+                raise ValueError("slice_nodes should be provided with " \
+                        "io_loop and without executor")
+        elif (executor is None) != (io_loop is None):
+            raise ValueError("executor and io_loop should be provided together")
+
         self._game = game
+        self._strategy = strategy if strategy is not None else MinimaxStrategy()
+        self._time_budget = time_budget
+        self._tablebase = tablebase
+        self._parallel_searcher = parallel_searcher
+        self._stats_callback = stats_callback
+        self._move_cache = move_cache if time_budget is None else None
+        self._threat_search = threat_search
+        self._solve_nodes = solve_nodes
+        self._slice_nodes = slice_nodes
+        self._transposition_table = transposition_table
+        self._executor = executor
+        self._io_loop = io_loop
+        self._worker_transposition_table_entries = \
+                worker_transposition_table_entries
+        self._searched_state = None
+        self._future = None
+        self._cancellation_token = None
         self._player_handle = self._game.append_player(self)
 
     @property
@@ -19,9 +205,11 @@ class AIPlayer:
             self.make_move()
 
         elif event == "playerleft":
-            pass
+            # Spectators leaving don't stop the game.
+            if msg["data"]["player_handle"] in ("host", "opponent"):
+                self.cancel_search()
         elif event == "gameover":
-            pass
+            self.cancel_search()
         elif event == "playerjoined":
             pass
         else:
@@ -35,6 +223,130 @@ class AIPlayer:
         if res != "nothing":
             raise Exception("Game terminal state already reached \"%s\"" % res)
 
+        if self._tablebase is not None:
+            move = self._tablebase.lookup(self._game.game_state, \
+                    self._player_handle)
+            if move is not None:
+                self._game.perform_move(self._player_handle, move[0], move[1])
+                return
+
+        if self._move_cache is not None:
+            move = self._move_cache.get(self._game.game_state, \
+                    self._player_handle, self._cache_key())
+            if move is not None:
+                self._game.perform_move(self._player_handle, move[0], move[1])
+                return
+
+        if self._threat_search is not None:
+            move = self._threat_search.find_win(self._game.game_state, \
+                    self._player_handle)
+            if move is not None:
+                self._game.perform_move(self._player_handle, move[0], move[1])
+                return
+
         pl = dict(host=1, opponent=-1)[self._player_handle]
-        x, y = minimax.run(self._game.game_state, pl, MinimaxStrategy())
-        self._game.perform_move(self._player_handle, x, y)
+
+        collect_stats = self._stats_callback is not None
+        stats = minimax.SearchStats() if collect_stats else None
+
+        if self._parallel_searcher is not None:
+            started_at = time.time()
+            x, y = self._parallel_searcher.run(self._game.game_state, pl, \
+                    self._strategy)
+            if collect_stats:
+                stats.elapsed = time.time() - started_at
+                self._stats_callback(self, stats)
+            self._perform_found_move(x, y)
+            return
+
+        if self._slice_nodes is not None:
+            self._start_sliced_search(pl, stats)
+            return
+
+        if self._executor is None:
+            x, y = _run_search(self._game.game_state, pl, self._strategy, \
+                    self._transposition_table, self._time_budget, stats, \
+                    self._solve_nodes)
+            if collect_stats:
+                self._stats_callback(self, stats)
+            self._perform_found_move(x, y)
+            return
+
+        self._searched_state = self._game.game_state
+        future = self._executor.submit(search_move, \
+                BitboardGameState.from_state(self._searched_state), pl, \
+                self._strategy, self._worker_transposition_table_entries, \
+                self._time_budget, collect_stats, self._solve_nodes)
+        self._future = future
+        self._io_loop.add_future(future, self._on_move_found)
+
+    def cancel_search(self):
+        """Cancels the search of the move (if it runs), the move is not
+        performed."""
+        self._searched_state = None
+        if self._cancellation_token is not None:
+            self._cancellation_token.cancel()
+            self._cancellation_token = None
+        if self._future is not None:
+            self._future.cancel()
+            self._future = None
+
+    def _is_stale(self, searched_state):
+        # The game could be finished or changed while the move was searched
+        # (e.g. the host left the game), the move is stale in this case.
+        return self._game.is_over or searched_state is None or \
+                self._game.game_state is not searched_state
+
+    def _on_move_found(self, future):
+        if future.cancelled() or self._is_stale(self._searched_state):
+            return
+
+        self._searched_state = None
+        self._future = None
+        if self._stats_callback is not None:
+            (x, y), stats = future.result()
+            self._stats_callback(self, stats)
+        else:
+            x, y = future.result()
+        self._perform_found_move(x, y)
+
+    def _start_sliced_search(self, player, stats):
+        self._searched_state = self._game.game_state
+        self._cancellation_token = minimax.CancellationToken()
+        # The search changes the state between the slices, the game's one is
+        # read by other players then.
+        searched_copy = getattr(self._strategy, "searched_copy", copy.deepcopy)
+        steps = _sliced_search(searched_copy(self._searched_state), player, \
+                self._strategy, self._time_budget, self._slice_nodes, \
+                self._cancellation_token, stats or minimax.SearchStats(), \
+                self._solve_nodes)
+        self._io_loop.add_callback(self._search_slice, steps, stats)
+
+    def _search_slice(self, steps, stats):
+        try:
+            next(steps)
+        except minimax.SearchCancelled:
+            return
+        except StopIteration as stop:
+            if self._is_stale(self._searched_state):
+                return
+            self._searched_state = None
+            self._cancellation_token = None
+            if stats is not None:
+                self._stats_callback(self, stats)
+            self._perform_found_move(stop.value[0], stop.value[1])
+        else:
+            self._io_loop.add_callback(self._search_slice, steps, stats)
+
+    def _cache_key(self):
+        key = self._strategy.cache_key()
+        if self._solve_nodes is not None:
+            # Solved moves differ from the searched ones.
+            key += ("solve", self._solve_nodes)
+        return key
+
+    def _perform_found_move(self, pos_x, pos_y):
+        if self._move_cache is not None:
+            self._move_cache.put(self._game.game_state, self._player_handle, \
+                    self._cache_key(), (pos_x, pos_y))
+        self._game.perform_move(self._player_handle, pos_x, pos_y)
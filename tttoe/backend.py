@@ -0,0 +1,439 @@
+"""
+This module implements the publish/subscribe layer which lets players of one
+game connect to different server processes.
+
+A game is owned by the process which created it (the `Game` instance lives
+there). `PublishedGame` registers it in the backend's directory of games and
+executes commands (join, move, resync, leave) published by other processes.
+A socket connected to another process plays through `RemoteGame`: it
+publishes the commands, and the owner sends the game messages back through
+`RemotePlayer`, which takes the place of the socket in the `Game`.
+
+Backends:
+
+    LocalBackend -- all subscribers are in one process (one server process,
+        tests).
+    HubBackend -- processes connect to a `Hub` (a thread of another process,
+        e.g. the parent of forked server processes) through a local socket
+        (`multiprocessing.connection`), the hub forwards published messages
+        to subscribed processes and keeps the directory of games.
+
+A backend has methods:
+
+    subscribe(channel, callback) -- the callback is called with every message
+        published to the channel;
+    unsubscribe(channel, callback);
+    publish(channel, message) -- the message is a dict (it should be
+        picklable);
+    register_game(game_id), unregister_game(game_id) -- the directory of
+        joinable games;
+    has_game(game_id) -- returns `concurrent.futures.Future` of True if the
+        game is in the directory (e.g. passed to `IOLoop.add_future`, so
+        the io_loop doesn't wait for the hub);
+    close().
+"""
+
+import itertools
+import threading
+import uuid
+from concurrent.futures import Future
+from multiprocessing.connection import Listener, Client
+
+from tttoe.protocol import Message
+
+def _game_channel(game_id):
+    return "game:%s" % game_id
+
+def _player_channel(player_key):
+    return "player:%s" % player_key
+
+def _message_data(message):
+    return dict(event=message["event"], seq=message.seq, \
+            data=message["data"])
+
+def _to_message(data):
+    return Message(data["event"], seq=data["seq"], **data["data"])
+
+def _done_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+class _Subscriptions:
+    """Callbacks by channel, the common part of backends."""
+
+    def __init__(self):
+        self._callbacks = dict()
+
+    def _add_callback(self, channel, callback):
+        """returns True if it's the first callback of the channel"""
+        callbacks = self._callbacks.setdefault(channel, [])
+        callbacks.append(callback)
+        return len(callbacks) == 1
+
+    def _remove_callback(self, channel, callback):
+        """returns True if it was the last callback of the channel"""
+        callbacks = self._callbacks.get(channel)
+        if not callbacks or callback not in callbacks:
+            return False
+        callbacks.remove(callback)
+        if callbacks:
+            return False
+        del self._callbacks[channel]
+        return True
+
+    def _dispatch(self, channel, message):
+        for callback in list(self._callbacks.get(channel, ())):
+            callback(message)
+
+class LocalBackend(_Subscriptions):
+    """Backend of one process: messages are delivered synchronously by
+    `publish`."""
+
+    def __init__(self):
+        _Subscriptions.__init__(self)
+        self._games = set()
+
+    def subscribe(self, channel, callback):
+        self._add_callback(channel, callback)
+
+    def unsubscribe(self, channel, callback):
+        self._remove_callback(channel, callback)
+
+    def publish(self, channel, message):
+        self._dispatch(channel, message)
+
+    def register_game(self, game_id):
+        self._games.add(game_id)
+
+    def unregister_game(self, game_id):
+        self._games.discard(game_id)
+
+    def has_game(self, game_id):
+        return _done_future(game_id in self._games)
+
+    def close(self):
+        pass
+
+class Hub:
+    """Forwards messages between `HubBackend` instances of many processes.
+
+    Example usage:
+
+    hub = Hub(os.urandom(32)) # listens a free port of 127.0.0.1
+    hub.start()               # serves in a daemon thread
+    # in other processes (e.g. forked ones, which know the key):
+    backend = HubBackend(hub.address, authkey, io_loop=IOLoop.current())
+
+    Connections are authenticated by `authkey`, there is no default: the hub
+    and the backends unpickle what they receive, so anyone who knows the key
+    and reaches the address can run code in their processes.
+
+    Games registered by a process are unregistered when it disconnects.
+    """
+
+    def __init__(self, authkey, address=("127.0.0.1", 0)):
+        self._listener = Listener(address, authkey=authkey)
+        self._lock = threading.Lock()
+        # {channel: set of connections}
+        self._subscribers = dict()
+        # {game_id: connection}
+        self._games = dict()
+        # {connection: lock}, connections are written by many threads
+        self._send_locks = dict()
+        self._closed = False
+
+    @property
+    def address(self):
+        return self._listener.address
+
+    def start(self):
+        """starts serving in a daemon thread"""
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                connection = self._listener.accept()
+            except Exception:
+                # e.g. a client with a wrong authkey, or the hub is closed
+                continue
+            with self._lock:
+                self._send_locks[connection] = threading.Lock()
+            thread = threading.Thread(target=self._serve, args=(connection,))
+            thread.daemon = True
+            thread.start()
+
+    def close(self):
+        self._closed = True
+        self._listener.close()
+
+    def _serve(self, connection):
+        try:
+            while True:
+                request = connection.recv()
+                if request[0] == "close":
+                    break
+                self._handle(connection, request)
+        except (EOFError, OSError):
+            pass
+        finally:
+            with self._lock:
+                for subscribers in self._subscribers.values():
+                    subscribers.discard(connection)
+                for game_id, owner in list(self._games.items()):
+                    if owner is connection:
+                        del self._games[game_id]
+                del self._send_locks[connection]
+            connection.close()
+
+    def _send(self, connection, item):
+        with self._lock:
+            send_lock = self._send_locks.get(connection)
+        if send_lock is None:
+            return
+        try:
+            with send_lock:
+                connection.send(item)
+        except (EOFError, OSError):
+            # The process disconnected, its thread cleans up.
+            pass
+
+    def _handle(self, connection, request):
+        kind = request[0]
+        if kind == "publish":
+            _, channel, message = request
+            with self._lock:
+                subscribers = list(self._subscribers.get(channel, ()))
+            for subscriber in subscribers:
+                self._send(subscriber, ("message", channel, message))
+            return
+
+        with self._lock:
+            if kind == "subscribe":
+                self._subscribers.setdefault(request[1], set()).add(connection)
+            elif kind == "unsubscribe":
+                subscribers = self._subscribers.get(request[1], set())
+                subscribers.discard(connection)
+                if not subscribers:
+                    self._subscribers.pop(request[1], None)
+            elif kind == "register":
+                self._games[request[1]] = connection
+            elif kind == "unregister":
+                self._games.pop(request[1], None)
+            elif kind == "has_game":
+                reply = request[2] in self._games
+            else:
+                raise ValueError("Unknown hub request: %s" % kind)
+        if kind == "has_game":
+            self._send(connection, ("reply", request[1], reply))
+
+class HubBackend(_Subscriptions):
+    """Backend connected to a `Hub` (see its docs).
+
+    Messages are received by a daemon thread. If `io_loop` is provided,
+    callbacks are called by the io_loop (`add_callback`), otherwise they're
+    called by the receiving thread. Futures of `has_game` are resolved by
+    the receiving thread, replies are matched to the requests by ids.
+    """
+
+    def __init__(self, address, authkey, io_loop=None):
+        _Subscriptions.__init__(self)
+        self._connection = Client(address, authkey=authkey)
+        self._send_lock = threading.Lock()
+        # {request id: future of the reply}
+        self._pending = dict()
+        self._request_ids = itertools.count()
+        self._pending_lock = threading.Lock()
+        self._io_loop = io_loop
+        self._closed = False
+
+        thread = threading.Thread(target=self._receive)
+        thread.daemon = True
+        thread.start()
+
+    def _send(self, *request):
+        with self._send_lock:
+            self._connection.send(request)
+
+    def _receive(self):
+        while True:
+            try:
+                item = self._connection.recv()
+            except (EOFError, OSError):
+                self._connection.close()
+                self._fail_pending()
+                return
+            if item[0] == "reply":
+                with self._pending_lock:
+                    future = self._pending.pop(item[1], None)
+                # A request failed by a lost connection has no future.
+                if future is not None:
+                    future.set_result(item[2])
+            elif self._io_loop is not None:
+                self._io_loop.add_callback(self._dispatch, item[1], item[2])
+            else:
+                self._dispatch(item[1], item[2])
+
+    def subscribe(self, channel, callback):
+        if self._add_callback(channel, callback):
+            self._send("subscribe", channel)
+
+    def unsubscribe(self, channel, callback):
+        if self._remove_callback(channel, callback):
+            self._send("unsubscribe", channel)
+
+    def publish(self, channel, message):
+        self._send("publish", channel, message)
+
+    def register_game(self, game_id):
+        self._send("register", game_id)
+
+    def unregister_game(self, game_id):
+        self._send("unregister", game_id)
+
+    def has_game(self, game_id):
+        """Asks the hub, returns the future of its reply. The future fails
+        (with `EOFError` or `OSError`) if the connection to the hub is
+        lost."""
+        future = Future()
+        with self._pending_lock:
+            request_id = next(self._request_ids)
+            self._pending[request_id] = future
+        try:
+            self._send("has_game", request_id, game_id)
+        except (EOFError, OSError) as error:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+            future.set_exception(error)
+        return future
+
+    def _fail_pending(self):
+        with self._pending_lock:
+            futures = list(self._pending.values())
+            self._pending.clear()
+        for future in futures:
+            future.set_exception(EOFError("The hub connection is closed"))
+
+    def close(self):
+        """Disconnects from the hub. The connection is closed by the
+        receiving thread when the hub closes its end."""
+        if not self._closed:
+            self._closed = True
+            self._send("close")
+
+class PublishedGame:
+    """Makes the game joinable by sockets of other processes (see
+    `RemoteGame`) until `close` is called.
+
+    Example usage:
+
+    published = PublishedGame(backend, game)
+    ...
+    published.close() # the game is over or removed
+    """
+
+    def __init__(self, backend, game):
+        self._backend = backend
+        self._game = game
+        # {player key: player handle}
+        self._handles = dict()
+        self._channel = _game_channel(game.game_id)
+        backend.subscribe(self._channel, self._on_command)
+        backend.register_game(game.game_id)
+
+    def close(self):
+        self._backend.unsubscribe(self._channel, self._on_command)
+        self._backend.unregister_game(self._game.game_id)
+
+    def _on_command(self, command):
+        kind = command["command"]
+        key = command["player"]
+
+        if kind == "join":
+            player = RemotePlayer(self._backend, key)
+            handle = self._game.append_player(player)
+            self._handles[key] = handle
+            player.write_message(self._game.setup_message(handle))
+            return
+
+        handle = self._handles.get(key)
+        if handle is None:
+            # The player has left already.
+            return
+        if kind == "move":
+            self._game.perform_move(handle, command["x"], command["y"])
+        elif kind == "resync":
+            self._game.send_snapshot(handle)
+        elif kind == "leave":
+            del self._handles[key]
+            self._game.player_left(handle)
+        else:
+            raise ValueError("Unknown command: %s" % kind)
+
+class RemotePlayer:
+    """Player of the owner's `Game` which forwards messages to a socket of
+    another process."""
+
+    def __init__(self, backend, player_key):
+        self._backend = backend
+        self._channel = _player_channel(player_key)
+
+    def write_message(self, message):
+        self._backend.publish(self._channel, _message_data(message))
+
+    def close(self):
+        """closes the socket of the player"""
+        self._backend.publish(self._channel, dict(close=True))
+
+class RemoteGame:
+    """Game owned by another process, joined by a socket of this process.
+    Has the methods of `Game` the socket calls. The player handle is chosen
+    by the owner: the socket gets it in the "setup" message, handles passed
+    to methods are ignored.
+
+    Example usage:
+
+    if backend.has_game(game_id).result(): # or by `IOLoop.add_future`
+        game = RemoteGame(backend, game_id)
+        game.append_player(socket) # the setup message comes later
+    """
+
+    def __init__(self, backend, game_id):
+        self._backend = backend
+        self._game_id = game_id
+        self._key = uuid.uuid4().hex
+        self._channel = _game_channel(game_id)
+        self._player = None
+
+    @property
+    def game_id(self):
+        return self._game_id
+
+    def append_player(self, socket_or_ai):
+        self._player = socket_or_ai
+        self._backend.subscribe(_player_channel(self._key), self._on_message)
+        self._publish("join")
+
+    def perform_move(self, player_handle, x, y):
+        self._publish("move", x=x, y=y)
+
+    def send_snapshot(self, player_handle):
+        self._publish("resync")
+
+    def player_left(self, player_handle):
+        self._backend.unsubscribe(_player_channel(self._key), \
+                self._on_message)
+        self._publish("leave")
+
+    def _publish(self, command, **data):
+        data.update(command=command, player=self._key)
+        self._backend.publish(self._channel, data)
+
+    def _on_message(self, data):
+        if data.get("close"):
+            self._player.close()
+        else:
+            self._player.write_message(_to_message(data))
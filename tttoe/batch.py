@@ -0,0 +1,154 @@
+"""
+This module implements evaluation of many tictactoe fields at once with NumPy
+(it's an optional dependency, only this module needs it).
+
+Fields of the same geometry are stacked into one int8 array of shape
+(count, width, height): 0 is an empty cell, 1 is a cell of the "host" player
+(the "max" player of `MinimaxStrategy`) and -1 is a cell of the "opponent".
+
+Every window of `qty_to_win` adjacent cells (see `tttoe.patterns`) is
+counted for all fields at once: the sum of `qty_to_win` shifted views of the
+array gives the number of stones in every window of one direction, so the
+whole batch costs O(qty_to_win) array operations per direction instead of a
+Python loop per cell.
+
+Example usage:
+
+    boards = batch.to_array(states)            # list of GameState
+    results = batch.results(boards, qty_to_win) # HOST_WIN, OPPONENT_WIN, DRAW
+                                               # or NOTHING for every field
+    scores = batch.heuristic(boards, qty_to_win)
+"""
+
+import numpy
+
+from tttoe.patterns import DIRECTIONS
+
+NOTHING = 0
+HOST_WIN = 1
+OPPONENT_WIN = -1
+DRAW = 2
+
+_RESULT_NAMES = {NOTHING: "nothing", HOST_WIN: "host", \
+        OPPONENT_WIN: "opponent", DRAW: "draw"}
+
+WIN_VALUE = 10 ** 9
+
+def to_array(states, handles=("host", "opponent")):
+    """Returns int8 array (count, width, height) of the fields of the states
+    (all of them should have the same width and height). `handles` are the
+    handles coded as 1 and -1."""
+    states = list(states)
+    if not states:
+        raise ValueError("At least one state is required")
+
+    width = states[0].width
+    height = states[0].height
+    codes = {handles[0]: 1, handles[1]: -1}
+    boards = numpy.zeros((len(states), width, height), dtype=numpy.int8)
+    for index, state in enumerate(states):
+        if (state.width, state.height) != (width, height):
+            raise ValueError("All fields should have the same size, " \
+                    "%dx%d is not %dx%d" % \
+                    (state.width, state.height, width, height))
+        for x, column in enumerate(state.field):
+            for y, handle in enumerate(column):
+                if handle != None:
+                    boards[index, x, y] = codes[handle]
+    return boards
+
+def window_counts(boards, qty_to_win, dir_x, dir_y):
+    """Returns (host, opponent) tuple of int16 arrays: the numbers of stones
+    of the players in every window of the direction, for every field. The
+    shape is (count, windows along x, windows along y)."""
+    _, width, height = boards.shape
+    span = qty_to_win - 1
+    windows_x = width - abs(dir_x) * span
+    windows_y = height - abs(dir_y) * span
+    if windows_x <= 0 or windows_y <= 0:
+        empty = numpy.zeros((boards.shape[0], 0, 0), dtype=numpy.int16)
+        return empty, empty
+
+    host = (boards == 1).astype(numpy.int16)
+    opponent = (boards == -1).astype(numpy.int16)
+    # The window starts at (x, y) for dir_y >= 0, and at (x, y + span) for
+    # the (1, -1) direction.
+    start_y = span if dir_y < 0 else 0
+
+    host_sum = numpy.zeros((boards.shape[0], windows_x, windows_y), \
+            dtype=numpy.int16)
+    opponent_sum = numpy.zeros_like(host_sum)
+    for step in range(qty_to_win):
+        x = dir_x * step
+        y = start_y + dir_y * step
+        host_sum += host[:, x:x + windows_x, y:y + windows_y]
+        opponent_sum += opponent[:, x:x + windows_x, y:y + windows_y]
+    return host_sum, opponent_sum
+
+def _all_window_counts(boards, qty_to_win):
+    return [window_counts(boards, qty_to_win, dir_x, dir_y) \
+            for dir_x, dir_y in DIRECTIONS]
+
+def _results(boards, qty_to_win, counts):
+    count = boards.shape[0]
+    host_won = numpy.zeros(count, dtype=bool)
+    opponent_won = numpy.zeros(count, dtype=bool)
+    for host, opponent in counts:
+        if host.size:
+            host_won |= (host == qty_to_win).reshape(count, -1).any(axis=1)
+            opponent_won |= \
+                    (opponent == qty_to_win).reshape(count, -1).any(axis=1)
+
+    full = (boards != 0).reshape(count, -1).all(axis=1)
+    results = numpy.full(count, NOTHING, dtype=numpy.int8)
+    results[full] = DRAW
+    results[opponent_won] = OPPONENT_WIN
+    results[host_won] = HOST_WIN
+    return results
+
+def _pattern_scores(qty_to_win, counts, count):
+    # window_score of `tttoe.patterns`: 0, 1, 10, 100... for 0, 1, 2, 3...
+    # stones.
+    window_scores = numpy.array([0] + [10 ** (stones - 1) \
+            for stones in range(1, qty_to_win + 1)], dtype=numpy.int64)
+    scores = numpy.zeros(count, dtype=numpy.int64)
+    for host, opponent in counts:
+        if not host.size:
+            continue
+        host_live = numpy.where(opponent == 0, window_scores[host], 0)
+        opponent_live = numpy.where(host == 0, window_scores[opponent], 0)
+        scores += (host_live - opponent_live).reshape(count, -1).sum(axis=1)
+    return scores
+
+def results(boards, qty_to_win):
+    """Returns int8 array of results of the fields: HOST_WIN or OPPONENT_WIN
+    if the field has a winning sequence of the player, DRAW if the field is
+    full, NOTHING otherwise."""
+    return _results(boards, qty_to_win, \
+            _all_window_counts(boards, qty_to_win))
+
+def result_names(results_array):
+    """Converts `results` to the list of `last_move_result` strings."""
+    return [_RESULT_NAMES[result] for result in results_array.tolist()]
+
+def pattern_scores(boards, qty_to_win):
+    """Returns int64 array of pattern scores (see `tttoe.patterns`): the
+    score of the "host" minus the score of the "opponent" for every field."""
+    return _pattern_scores(qty_to_win, \
+            _all_window_counts(boards, qty_to_win), boards.shape[0])
+
+def heuristic(boards, qty_to_win, win_value=WIN_VALUE):
+    """Returns int64 array of values of the fields, the same as
+    `MinimaxStrategy(evaluate_patterns=True).heuristic` returns for them:
+    `win_value` for a win of the "host", `-win_value` for a win of the
+    "opponent", 0 for a draw, and pattern scores (limited by
+    `win_value - 1`) for other fields. Windows are counted once for both
+    results and scores, so it can evaluate the leaves of a batched search."""
+    counts = _all_window_counts(boards, qty_to_win)
+    field_results = _results(boards, qty_to_win, counts)
+    values = numpy.clip(_pattern_scores(qty_to_win, counts, boards.shape[0]), \
+            -win_value + 1, win_value - 1)
+    values[field_results == DRAW] = 0
+    values[field_results == HOST_WIN] = win_value
+    values[field_results == OPPONENT_WIN] = -win_value
+    return values
@@ -0,0 +1,472 @@
+# pylint: disable=too-many-arguments, protected-access
+
+"""
+This module defines `BitboardGameState` class. See its documentation.
+"""
+
+import random
+from collections import OrderedDict
+from tttoe import zobrist
+from tttoe import patterns
+
+class _Geometry:
+    """Precomputed masks for a specific (width, height, qty_to_win) board.
+    Instances are cached and shared by all states with the same geometry,
+    only `_MAX_CACHED` recently used geometries are kept (states keep their
+    geometry anyway).
+
+    Cell (x, y) is stored in the bit number `x * height + y`, so iterating
+    bits from the lowest to the highest gives the same order as
+    `GameState.all_available_moves`.
+    """
+
+    _MAX_CACHED = 32
+    _cache = OrderedDict()
+
+    @staticmethod
+    def get(width, height, qty_to_win):
+        """returns the cached geometry, creates it on the first call"""
+        key = (width, height, qty_to_win)
+        cache = _Geometry._cache
+        geometry = cache.get(key)
+        if geometry is None:
+            geometry = _Geometry(width, height, qty_to_win)
+            cache[key] = geometry
+            while len(cache) > _Geometry._MAX_CACHED:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(key)
+        return geometry
+
+    def __init__(self, width, height, qty_to_win):
+        self.width = width
+        self.height = height
+        self.qty_to_win = qty_to_win
+        self.cells_count = width * height
+        self.full_mask = (1 << self.cells_count) - 1
+
+        lines_through = [[] for _ in range(self.cells_count)]
+
+        for dir_x, dir_y in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+            for start_x in range(width):
+                for start_y in range(height):
+                    end_x = start_x + dir_x * (qty_to_win - 1)
+                    end_y = start_y + dir_y * (qty_to_win - 1)
+                    if not (0 <= end_x < width and 0 <= end_y < height):
+                        continue
+
+                    cells = [(start_x + dir_x * i) * height + start_y + dir_y * i
+                             for i in range(qty_to_win)]
+                    mask = 0
+                    for cell in cells:
+                        mask |= 1 << cell
+                    for cell in cells:
+                        lines_through[cell].append(mask)
+
+        self.lines_through = tuple(tuple(lines) for lines in lines_through)
+        self._near_masks = dict()
+
+    def near_masks(self, radius):
+        """returns tuple of masks: cells which are not farther than `radius`
+        from the cell (for each cell)"""
+        masks = self._near_masks.get(radius)
+        if masks is None:
+            masks = []
+            for x in range(self.width):
+                for y in range(self.height):
+                    mask = 0
+                    for near_x in range(max(0, x - radius), \
+                            min(self.width, x + radius + 1)):
+                        for near_y in range(max(0, y - radius), \
+                                min(self.height, y + radius + 1)):
+                            mask |= 1 << (near_x * self.height + near_y)
+                    masks.append(mask)
+            masks = tuple(masks)
+            self._near_masks[radius] = masks
+        return masks
+
+    def cell(self, pos_x, pos_y):
+        """returns the bit number of the (pos_x, pos_y) cell"""
+        if pos_x < 0 or pos_x >= self.width or \
+                pos_y < 0 or pos_y >= self.height:
+            raise ValueError("The cell (%d, %d) is out of the field " \
+                    "(width: %d, height: %d)" % \
+                    (pos_x, pos_y, self.width, self.height))
+        return pos_x * self.height + pos_y
+
+
+class BitboardGameState:
+    """Drop-in replacement for `GameState` which keeps the field as integer
+    bitmasks (one mask per player handle) instead of a list of lists.
+
+    `make_move` doesn't copy the field: the new state just gets the new
+    masks. The win check doesn't walk the field either: for every cell we
+    precompute masks of all winning lines passing through it, so the check is
+    a few AND operations. The draw check is a single comparison.
+
+    The state supports at most two player handles (the first two handles
+    used in `make_move` or found in the initial field).
+
+    Example usage is the same as for `GameState`:
+
+    state = BitboardGameState(3, 3, 3)
+    new_state = state.make_move(0, 0, "x")
+    new_state.last_move_result # returns "nothing"
+
+    new_state.apply_move(1, 1, "o") # in place, see `GameState.apply_move`
+    new_state.undo_move()
+    """
+
+    def __init__(self, width, height, qty_to_win, field=None):
+        self._geometry = _Geometry.get(width, height, qty_to_win)
+        self._handles = ()
+        self._boards = ()
+        self._occupied = 0
+        self._last_move_result = "nothing"
+        self._hash = None
+        self._pattern_scores = None
+        self._move_stack = []
+
+        if field != None:
+            for x in range(width):
+                for y in range(height):
+                    handle = field[x][y]
+                    if handle != None:
+                        self._set_cell(self._geometry.cell(x, y), handle)
+
+    @staticmethod
+    def from_state(state):
+        """Makes `BitboardGameState` with the same field and the same result of
+        the last move as the provided state (any state with `field` and
+        `last_move_result` properties, e.g. `GameState`)."""
+        if isinstance(state, BitboardGameState):
+            return state
+
+        new_state = BitboardGameState(state.width, state.height, \
+                state.qty_to_win, field=state.field)
+        new_state._last_move_result = state.last_move_result
+        return new_state
+
+    def __getstate__(self):
+        # Geometry tables can be large, they are rebuilt (or taken from the
+        # cache) on unpickling, so pickled states stay compact. Applied moves
+        # can't be undone in the unpickled state.
+        geometry = self._geometry
+        return (geometry.width, geometry.height, geometry.qty_to_win, \
+                self._handles, self._boards, self._last_move_result, \
+                self._pattern_scores)
+
+    def __setstate__(self, data):
+        width, height, qty_to_win, handles, boards, last_move_result, \
+                pattern_scores = data
+        self._geometry = _Geometry.get(width, height, qty_to_win)
+        self._handles = handles
+        self._boards = boards
+        self._occupied = 0
+        for board in boards:
+            self._occupied |= board
+        self._last_move_result = last_move_result
+        self._hash = None
+        self._pattern_scores = pattern_scores
+        self._move_stack = []
+
+    @property
+    def width(self):
+        """width getter"""
+        return self._geometry.width
+
+    @property
+    def height(self):
+        """height getter"""
+        return self._geometry.height
+
+    @property
+    def qty_to_win(self):
+        """qty_to_win getter"""
+        return self._geometry.qty_to_win
+
+    def _handle_index(self, player_handle):
+        try:
+            return self._handles.index(player_handle)
+        except ValueError:
+            pass
+
+        if len(self._handles) == 2:
+            raise ValueError("Only two player handles are supported, " \
+                    "\"%s\" is the third one" % player_handle)
+
+        self._handles += (player_handle,)
+        self._boards += (0,)
+        return len(self._handles) - 1
+
+    def _set_cell(self, cell, player_handle):
+        index = self._handle_index(player_handle)
+        bit = 1 << cell
+        boards = list(self._boards)
+        boards[index] |= bit
+        self._boards = tuple(boards)
+        self._occupied |= bit
+        return boards[index]
+
+    def _clone(self):
+        new_state = BitboardGameState.__new__(BitboardGameState)
+        new_state._geometry = self._geometry
+        new_state._handles = self._handles
+        new_state._boards = self._boards
+        new_state._occupied = self._occupied
+        new_state._last_move_result = self._last_move_result
+        new_state._hash = None
+        new_state._pattern_scores = self._pattern_scores
+        new_state._move_stack = []
+        return new_state
+
+    @property
+    def pattern_scores(self):
+        """Returns dict {player_handle: score} of pattern scores or None.
+        See `GameState.pattern_scores`."""
+        return self._pattern_scores
+
+    def with_pattern_scores(self):
+        """Returns a copy of the state which tracks pattern scores. See
+        `GameState.with_pattern_scores`."""
+        new_state = self._clone()
+        new_state._hash = self._hash
+        geometry = self._geometry
+        new_state._pattern_scores = patterns.field_scores(self.field, \
+                geometry.width, geometry.height, geometry.qty_to_win)
+        return new_state
+
+    def _pattern_scores_after(self, pos_x, pos_y, player_handle):
+        geometry = self._geometry
+        mover_board = 0
+        if player_handle in self._handles:
+            mover_board = self._boards[self._handles.index(player_handle)]
+        other_board = self._occupied & ~mover_board
+
+        gain = 0
+        loss = 0
+        for dir_x, dir_y in patterns.DIRECTIONS:
+            cells, center = patterns.line_cells(geometry.width, \
+                    geometry.height, geometry.qty_to_win, pos_x, pos_y, \
+                    dir_x, dir_y)
+            owners = []
+            for x, y in cells:
+                cell = x * geometry.height + y
+                if mover_board >> cell & 1:
+                    owners.append(patterns.MOVER)
+                elif other_board >> cell & 1:
+                    owners.append(patterns.OTHER)
+                else:
+                    owners.append(patterns.EMPTY)
+
+            line_gain, line_loss = patterns.line_delta(owners, center, \
+                    geometry.qty_to_win)
+            gain += line_gain
+            loss += line_loss
+
+        return patterns.apply_move(self._pattern_scores, player_handle, \
+                gain, loss)
+
+    @property
+    def zobrist_hash(self):
+        """Returns Zobrist hash of the field (see `tttoe.zobrist`). It's
+        computed on the first access, states made by `make_move` from a state
+        with known hash get their hash incrementally."""
+        if self._hash == None:
+            geometry = self._geometry
+            value = zobrist.base_key(geometry.width, geometry.height, \
+                    geometry.qty_to_win)
+            for handle, board in zip(self._handles, self._boards):
+                while board:
+                    lowest = board & -board
+                    value ^= zobrist.cell_key(geometry.width, geometry.height, \
+                            geometry.qty_to_win, handle, lowest.bit_length() - 1)
+                    board ^= lowest
+            self._hash = value
+        return self._hash
+
+    @property
+    def moves_count(self):
+        """Returns the number of occupied cells."""
+        return bin(self._occupied).count("1")
+
+    @property
+    def field(self):
+        """Returns the field as a list of lists (the same layout as
+        `GameState.field`). The list is built on every call, changing it
+        doesn't affect the state."""
+        geometry = self._geometry
+        field = [[None] * geometry.height for _ in range(geometry.width)]
+        for handle, board in zip(self._handles, self._boards):
+            for x in range(geometry.width):
+                column = field[x]
+                offset = x * geometry.height
+                for y in range(geometry.height):
+                    if board >> (offset + y) & 1:
+                        column[y] = handle
+        return field
+
+    def occupied_cells(self):
+        """Yields (x, y, player_handle) of every stone (see
+        `SparseGameState.occupied_cells`), without building the field."""
+        height = self._geometry.height
+        for handle, board in zip(self._handles, self._boards):
+            while board:
+                lowest = board & -board
+                cell = lowest.bit_length() - 1
+                yield cell // height, cell % height, handle
+                board ^= lowest
+
+    def all_available_moves(self):
+        """Generator on each possible move that can be perfoemed. Yields x and
+        y positions of possible steps."""
+        height = self._geometry.height
+        free = self._geometry.full_mask & ~self._occupied
+        while free:
+            lowest = free & -free
+            cell = lowest.bit_length() - 1
+            yield cell // height, cell % height
+            free ^= lowest
+
+    def moves_near_stones(self, radius):
+        """Generator on possible moves which are not farther than `radius`
+        from any occupied cell. See `GameState.moves_near_stones`."""
+        geometry = self._geometry
+        occupied = self._occupied
+        if not occupied:
+            yield geometry.width // 2, geometry.height // 2
+            return
+
+        near_masks = geometry.near_masks(radius)
+        near = 0
+        while occupied:
+            lowest = occupied & -occupied
+            near |= near_masks[lowest.bit_length() - 1]
+            occupied ^= lowest
+
+        height = geometry.height
+        free = near & ~self._occupied
+        while free:
+            lowest = free & -free
+            cell = lowest.bit_length() - 1
+            yield cell // height, cell % height
+            free ^= lowest
+
+    def random_playout(self, player_handles, rnd=random):
+        """Plays random moves until the game is over, returns the result.
+        See `GameState.random_playout`, the moves are made on copies of the
+        masks."""
+        if self._last_move_result != "nothing":
+            return self._last_move_result
+
+        geometry = self._geometry
+        lines_through = geometry.lines_through
+        owned = dict(zip(self._handles, self._boards))
+        boards = [owned.get(handle, 0) for handle in player_handles]
+
+        cells = []
+        free = geometry.full_mask & ~self._occupied
+        while free:
+            lowest = free & -free
+            cells.append(lowest.bit_length() - 1)
+            free ^= lowest
+        rnd.shuffle(cells)
+
+        for index, cell in enumerate(cells):
+            turn = index % 2
+            board = boards[turn] | 1 << cell
+            boards[turn] = board
+            for mask in lines_through[cell]:
+                if board & mask == mask:
+                    return player_handles[turn]
+
+        return "draw"
+
+    def is_winning_move(self, pos_x, pos_y, player_handle):
+        """Returns True if the move of the player to the empty (pos_x, pos_y)
+        cell makes a winning sequence. The state is not changed."""
+        geometry = self._geometry
+        cell = geometry.cell(pos_x, pos_y)
+        if player_handle in self._handles:
+            board = self._boards[self._handles.index(player_handle)]
+        else:
+            board = 0
+        board |= 1 << cell
+
+        for mask in geometry.lines_through[cell]:
+            if board & mask == mask:
+                return True
+        return False
+
+    def make_move(self, pos_x, pos_y, player_handle):
+        """Makes move and returns new state as a result. See
+        `GameState.make_move` for the arguments and the result.
+
+        Only the masks of the lines passing through the (pos_x, pos_y) cell
+        are checked to detect a win.
+        """
+
+        cell = self._validate_move(pos_x, pos_y, player_handle)
+
+        new_state = self._clone()
+        new_state._hash = self._hash
+        new_state._place(cell, pos_x, pos_y, player_handle)
+        return new_state
+
+    def apply_move(self, pos_x, pos_y, player_handle):
+        """Makes the move in place. See `GameState.apply_move`."""
+        cell = self._validate_move(pos_x, pos_y, player_handle)
+
+        self._move_stack.append((self._handles, self._boards, self._occupied, \
+                self._last_move_result, self._hash, self._pattern_scores))
+        self._place(cell, pos_x, pos_y, player_handle)
+
+    def undo_move(self):
+        """Takes back the last move made by `apply_move`. See
+        `GameState.undo_move`."""
+        if not self._move_stack:
+            raise ValueError("There are no applied moves to undo")
+
+        self._handles, self._boards, self._occupied, \
+                self._last_move_result, self._hash, self._pattern_scores = \
+                self._move_stack.pop()
+
+    def _validate_move(self, pos_x, pos_y, player_handle):
+        """returns the bit number of the cell"""
+        if player_handle in ("nothing", "draw"):
+            raise ValueError("\"nothing\" and \"draw\" hanles are reserved")
+
+        cell = self._geometry.cell(pos_x, pos_y)
+        if self._occupied >> cell & 1:
+            raise ValueError("The value in the cell (%d, %d) is already set" % \
+                    (pos_x, pos_y))
+        return cell
+
+    def _place(self, cell, pos_x, pos_y, player_handle):
+        """puts the player's handle to the empty cell, updates the hash, the
+        scores and the result of the move"""
+        geometry = self._geometry
+        if self._pattern_scores != None:
+            self._pattern_scores = self._pattern_scores_after(pos_x, pos_y, \
+                    player_handle)
+        board = self._set_cell(cell, player_handle)
+        if self._hash != None:
+            self._hash ^= zobrist.cell_key(geometry.width, geometry.height, \
+                    geometry.qty_to_win, player_handle, cell)
+
+        for mask in geometry.lines_through[cell]:
+            if board & mask == mask:
+                self._last_move_result = player_handle
+                return
+
+        if self._occupied == geometry.full_mask:
+            self._last_move_result = "draw"
+            return
+
+        self._last_move_result = "nothing"
+
+    @property
+    def last_move_result(self):
+        """Returns the result of the previous move. See
+        `GameState.last_move_result`."""
+        return self._last_move_result
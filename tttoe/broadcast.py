@@ -0,0 +1,212 @@
+"""
+This module implements delivery of game messages to players. See
+`Broadcaster` docs.
+
+A message is built once for all players (`tttoe.protocol.Message` is
+encoded once per protocol version). Every player has a bounded send queue:
+messages are written to the player at once while it takes them, and queued
+while its connection is busy sending previous ones. When the queue of a
+lagging player overflows, its board updates are dropped and it gets one
+snapshot of the whole game (a "sync" message) when it catches up, so a slow
+spectator costs at most `max_queue` messages of memory.
+"""
+
+import time
+from collections import deque
+
+# Events which are replaced by the snapshot of a lagging player.
+_COALESCED_EVENTS = frozenset(["move", "gameover", "sync"])
+
+class FanoutStats:
+    """Statistics of the messages broadcast in one game.
+
+    Attributes:
+
+        broadcasts -- number of broadcast messages.
+        sent -- number of messages written to players.
+        queued -- number of messages queued for busy players.
+        dropped -- number of messages dropped for lagging players.
+        snapshots -- number of snapshots written to players who caught up.
+        max_latency -- the longest broadcast (seconds from the broadcast call
+            until the message is written or queued for every player).
+        total_latency -- the sum of broadcast times (seconds).
+    """
+
+    def __init__(self):
+        self.broadcasts = 0
+        self.sent = 0
+        self.queued = 0
+        self.dropped = 0
+        self.snapshots = 0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+
+    def record_broadcast(self, latency):
+        self.broadcasts += 1
+        self.total_latency += latency
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+    @property
+    def mean_latency(self):
+        if self.broadcasts == 0:
+            return 0.0
+        return self.total_latency / self.broadcasts
+
+    def as_dict(self):
+        """Returns the statistics as a dict (e.g. to send them to a metrics
+        system or to serialize to JSON)."""
+        return dict(broadcasts=self.broadcasts, sent=self.sent, \
+                queued=self.queued, dropped=self.dropped, \
+                snapshots=self.snapshots, max_latency=self.max_latency, \
+                mean_latency=self.mean_latency)
+
+    def __str__(self):
+        return "broadcasts: %d, sent: %d, queued: %d, dropped: %d, " \
+                "snapshots: %d, latency: mean %.6fs, max %.6fs" % \
+                (self.broadcasts, self.sent, self.queued, self.dropped, \
+                self.snapshots, self.mean_latency, self.max_latency)
+
+def _is_droppable(message):
+    if message["event"] in _COALESCED_EVENTS:
+        return True
+    handle = message["data"].get("player_handle")
+    return handle is not None and handle.startswith("spectator_")
+
+class _SendQueue:
+    __slots__ = ("player", "is_busy", "messages", "lagging")
+
+    def __init__(self, player):
+        self.player = player
+        # Players without `is_write_busy` (e.g. AI players) always take
+        # messages at once.
+        self.is_busy = getattr(player, "is_write_busy", None)
+        self.messages = deque()
+        self.lagging = False
+
+class Broadcaster:
+    """Sends messages to the players of one game.
+
+    Example usage:
+
+    broadcaster = Broadcaster(game.snapshot, max_queue=64)
+    broadcaster.add("host", socket)
+    broadcaster.send(message, exclude="host") # to all players but the host
+    broadcaster.flush() # periodically, writes queued messages
+
+    A player is a socket or an AI player, it has `write_message(message)`
+    method. A player may have `is_write_busy()` method returning True while
+    it didn't send previous messages yet, messages are queued for it then.
+
+    `snapshot` is a function returning the message with the whole game state
+    (see `Game.snapshot`), it's called once per broadcast for all lagging
+    players who caught up.
+
+    Queued messages are written by `send` and `flush` calls, so `flush`
+    should be called periodically (players who caught up when there are no
+    moves in the game get their messages then).
+
+    Every player gets the messages in the order of `send` calls, even if a
+    player sends a message while it's written one (e.g. an AI player which
+    moves at once): such messages are sent when the current one is written
+    or queued for every player.
+    """
+
+    def __init__(self, snapshot, max_queue=64):
+        if max_queue <= 0:
+            raise ValueError("max_queue should be positive (now %d)" % \
+                    max_queue)
+        self._snapshot = snapshot
+        self._max_queue = max_queue
+        self._queues = dict()
+        self._current_snapshot = None
+        # Messages sent while another one is being sent.
+        self._outbox = deque()
+        self._sending = False
+        self.stats = FanoutStats()
+
+    def __len__(self):
+        return len(self._queues)
+
+    @property
+    def lagging_count(self):
+        """number of players who missed messages and wait for a snapshot"""
+        return sum(1 for queue in self._queues.values() if queue.lagging)
+
+    @property
+    def queued_count(self):
+        """number of messages in all send queues"""
+        return sum(len(queue.messages) for queue in self._queues.values())
+
+    def add(self, player_handle, player):
+        self._queues[player_handle] = _SendQueue(player)
+
+    def remove(self, player_handle):
+        """removes the player, its queued messages are dropped"""
+        self._queues.pop(player_handle, None)
+
+    def send(self, message, exclude=None):
+        """Sends the message to all players except the `exclude` one."""
+        self._outbox.append((message, exclude, time.time()))
+        if self._sending:
+            return
+
+        self._sending = True
+        try:
+            while self._outbox:
+                message, exclude, started_at = self._outbox.popleft()
+                self._current_snapshot = None
+                # Players can be added or removed by the players who get
+                # the message.
+                for player_handle, queue in list(self._queues.items()):
+                    if player_handle != exclude:
+                        self._push(queue, message)
+                self.stats.record_broadcast(time.time() - started_at)
+        finally:
+            self._sending = False
+
+    def flush(self):
+        """writes queued messages to players who aren't busy anymore"""
+        for queue in self._queues.values():
+            if queue.messages or queue.lagging:
+                self._drain(queue)
+
+    def _push(self, queue, message):
+        if queue.is_busy is None or (not queue.messages and \
+                not queue.lagging and not queue.is_busy()):
+            queue.player.write_message(message)
+            self.stats.sent += 1
+            return
+
+        if queue.lagging and message["event"] in _COALESCED_EVENTS:
+            self.stats.dropped += 1
+        else:
+            queue.messages.append(message)
+            self.stats.queued += 1
+            if len(queue.messages) > self._max_queue:
+                self._coalesce(queue)
+        self._drain(queue)
+
+    def _coalesce(self, queue):
+        """Drops board updates (the snapshot replaces them) and notices about
+        spectators from the queue, the oldest messages if it's still full."""
+        kept = deque(message for message in queue.messages \
+                if not _is_droppable(message))
+        while len(kept) > self._max_queue:
+            kept.popleft()
+        self.stats.dropped += len(queue.messages) - len(kept)
+        queue.messages = kept
+        queue.lagging = True
+
+    def _drain(self, queue):
+        if queue.is_busy():
+            return
+        if queue.lagging:
+            if self._current_snapshot is None:
+                self._current_snapshot = self._snapshot()
+            queue.player.write_message(self._current_snapshot)
+            queue.lagging = False
+            self.stats.snapshots += 1
+        while queue.messages and not queue.is_busy():
+            queue.player.write_message(queue.messages.popleft())
+            self.stats.sent += 1
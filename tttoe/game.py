@@ -1,9 +1,13 @@
+import time
 import uuid
 from tttoe.gamestate import GameState
+from tttoe.protocol import Message
+from tttoe.broadcast import Broadcaster
 
 class Game:
     def __init__(self, field_width, field_height, qty_to_win, \
-            start_player_handle, host_char):
+            start_player_handle, host_char, state_class=GameState, \
+            max_send_queue=64):
 
         self._start_player_handle = start_player_handle
         self._host_char = host_char
@@ -12,8 +16,11 @@ class Game:
         self._players_hash = dict()
         self._game_id = uuid.uuid4().hex
         self._is_over = False
+        self._last_activity = time.time()
+        self._seq = 0
+        self._broadcaster = Broadcaster(self.snapshot, max_send_queue)
 
-        self.game_state = GameState(field_width, field_height, qty_to_win)
+        self.game_state = state_class(field_width, field_height, qty_to_win)
 
     @property
     def start_player_handle(self):
@@ -31,31 +38,77 @@ class Game:
     def is_over(self):
         return self._is_over
 
+    @property
+    def last_activity(self):
+        """time (`time.time()`) of the last move, joined or left player"""
+        return self._last_activity
+
+    @property
+    def seq(self):
+        """number of moves made in the game (see `tttoe.protocol`)"""
+        return self._seq
+
+    @property
+    def fanout_stats(self):
+        """`tttoe.broadcast.FanoutStats` of the game messages"""
+        return self._broadcaster.stats
+
+    @property
+    def players(self):
+        """returns dict {player_handle: player} (a copy)"""
+        return dict(self._players_hash)
+
     def perform_move(self, player_handle, x, y):
         if player_handle not in ["host", "opponent"]:
             raise ValueError("Only host or opponent can make moves, not \"%s\"" \
                 % player_handle)
 
         self.game_state = self.game_state.make_move(x, y, player_handle)
+        self._last_activity = time.time()
+        self._seq += 1
 
         res = self.game_state.last_move_result
         if res != "nothing":
             self._is_over = True
-            data = dict(event="gameover", data=dict(result_of_move=res))
-            for player in self._players_hash.values():
-                player.write_message(data)
-
-        for handle, player in self._players_hash.items():
-            data = dict(event="move", data=dict(player_handle=player_handle, \
-                x=x, y=y))
-            if handle != player_handle:
-                player.write_message(data)
+            self._broadcaster.send(Message("gameover", seq=self._seq, \
+                    result_of_move=res))
+
+        self._broadcaster.send(Message("move", seq=self._seq, \
+                player_handle=player_handle, x=x, y=y), exclude=player_handle)
+
+    def snapshot(self):
+        """returns "sync" message with the whole field (see
+        `tttoe.protocol`)"""
+        return Message("sync", seq=self._seq, field=self.game_state.field, \
+                result=self.game_state.last_move_result)
+
+    def send_snapshot(self, player_handle):
+        """writes `snapshot` to the player (e.g. it asked for a resync)"""
+        self._players_hash[player_handle].write_message(self.snapshot())
+
+    def setup_message(self, player_handle, connection_game_id=None):
+        """returns "setup" message of the player who joined the game
+        (`connection_game_id` is the id the player can share with a
+        friend)"""
+        return Message("setup", seq=self._seq, \
+                connection_game_id=connection_game_id, \
+                player_handle=player_handle, \
+                signs_map=dict(host=self._host_char, \
+                        opponent=dict(x="o", o="x")[self._host_char]), \
+                start_player_handle=self._start_player_handle, \
+                field=self.game_state.field)
+
+    def flush_messages(self):
+        """writes messages queued for slow players (see
+        `tttoe.broadcast.Broadcaster.flush`)"""
+        self._broadcaster.flush()
 
     def player_left(self, player_handle):
         del self._players_hash[player_handle]
-        data = dict(event="playerleft", data=dict(player_handle=player_handle))
-        for player in self._players_hash.values():
-            player.write_message(data)
+        self._broadcaster.remove(player_handle)
+        self._last_activity = time.time()
+        self._broadcaster.send(Message("playerleft", \
+                player_handle=player_handle))
 
     def append_player(self, socket_or_ai):
         if "host" not in self._players_hash:
@@ -67,10 +120,10 @@ class Game:
             self._spectators_count += 1
 
         self._players_hash[player_handle] = socket_or_ai
+        self._broadcaster.add(player_handle, socket_or_ai)
+        self._last_activity = time.time()
 
-        for handle, player in self._players_hash.items():
-            data = dict(event="playerjoined", data=dict(player_handle=player_handle))
-            if handle != player_handle:
-                player.write_message(data)
+        self._broadcaster.send(Message("playerjoined", \
+                player_handle=player_handle), exclude=player_handle)
 
         return player_handle
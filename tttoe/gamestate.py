@@ -5,7 +5,36 @@ This module defines `GameState` class. See its documentation.
 """
 
 import copy
+import random
 from tttoe.boxwalker import BoxWalker
+from tttoe import zobrist
+from tttoe import patterns
+
+def play_out(field, qty_to_win, moves, player_handles):
+    """Makes the `moves` (x, y) on the `field` (list of lists, it's changed)
+    by turns of the players (`player_handles` is a pair, the first player
+    moves first) until one of them wins, returns the winner's handle or
+    "draw" if the moves are over. It's the loop of `random_playout` of game
+    states which have a field of lists."""
+    width = len(field)
+    height = len(field[0])
+    for index, (pos_x, pos_y) in enumerate(moves):
+        handle = player_handles[index % 2]
+        field[pos_x][pos_y] = handle
+        for dir_x, dir_y in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            count = 1
+            for step_x, step_y in ((dir_x, dir_y), (-dir_x, -dir_y)):
+                x = pos_x + step_x
+                y = pos_y + step_y
+                while 0 <= x < width and 0 <= y < height and \
+                        field[x][y] == handle:
+                    count += 1
+                    x += step_x
+                    y += step_y
+            if count >= qty_to_win:
+                return handle
+
+    return "draw"
 
 class GameState:
     """Stores a state of tictactoe game.
@@ -31,6 +60,13 @@ class GameState:
     new_state.last_move_result # returns "x", what means that the terminal
                                # state is reached, and "x" is a winner.
                                # See `last_move_result` doc.
+
+    `apply_move` and `undo_move` methods change the state in place instead
+    (e.g. for a search which makes and takes back moves on one state):
+
+    state.apply_move(1, 1, "o")
+    state.last_move_result # returns "nothing"
+    state.undo_move()      # the state is the same as before `apply_move`
     """
 
     def __init__(self, width, height, qty_to_win, field=None):
@@ -38,6 +74,10 @@ class GameState:
         self._height = height
         self._qty_to_win = qty_to_win
         self._last_move_result = "nothing"
+        self._hash = None
+        self._moves_count = None
+        self._pattern_scores = None
+        self._move_stack = []
 
         if field == None:
             self._field = [[None for _ in range(self._height) ] for _ in range(self._width)]
@@ -48,7 +88,85 @@ class GameState:
     def field(self):
         return self._field
 
+    @property
+    def width(self):
+        """width getter"""
+        return self._width
+
+    @property
+    def height(self):
+        """height getter"""
+        return self._height
+
+    @property
+    def qty_to_win(self):
+        """qty_to_win getter"""
+        return self._qty_to_win
+
+    @property
+    def zobrist_hash(self):
+        """Returns Zobrist hash of the field (see `tttoe.zobrist`). It's
+        computed on the first access, states made by `make_move` from a state
+        with known hash get their hash incrementally."""
+        if self._hash == None:
+            self._hash = zobrist.field_hash(self._width, self._height, \
+                    self._qty_to_win, self._field)
+        return self._hash
+
+    @property
+    def moves_count(self):
+        """Returns the number of occupied cells."""
+        if self._moves_count == None:
+            self._moves_count = sum(1 for column in self._field \
+                    for handle in column if handle != None)
+        return self._moves_count
+
+    @property
+    def pattern_scores(self):
+        """Returns dict {player_handle: score} of pattern scores (see
+        `tttoe.patterns`), or None if the state doesn't track them. States
+        made by `make_move` from a state which tracks the scores track them
+        too, the scores are updated incrementally."""
+        return self._pattern_scores
+
+    def with_pattern_scores(self):
+        """Returns a copy of the state which tracks pattern scores (they are
+        computed for the whole field once)."""
+        new_state = self._clone()
+        new_state._last_move_result = self._last_move_result
+        new_state._hash = self._hash
+        new_state._moves_count = self._moves_count
+        new_state._pattern_scores = patterns.field_scores(self._field, \
+                self._width, self._height, self._qty_to_win)
+        return new_state
+
+    def _pattern_scores_after(self, pos_x, pos_y, player_handle):
+        gain = 0
+        loss = 0
+        for dir_x, dir_y in patterns.DIRECTIONS:
+            cells, center = patterns.line_cells(self._width, self._height, \
+                    self._qty_to_win, pos_x, pos_y, dir_x, dir_y)
+            owners = []
+            for x, y in cells:
+                handle = self._field[x][y]
+                if handle == None:
+                    owners.append(patterns.EMPTY)
+                elif handle == player_handle:
+                    owners.append(patterns.MOVER)
+                else:
+                    owners.append(patterns.OTHER)
+
+            line_gain, line_loss = patterns.line_delta(owners, center, \
+                    self._qty_to_win)
+            gain += line_gain
+            loss += line_loss
+
+        return patterns.apply_move(self._pattern_scores, player_handle, \
+                gain, loss)
+
     def _is_fully_filled(self):
+        if self._moves_count != None:
+            return self._moves_count == self._width * self._height
         for _ in self.all_available_moves():
             return False
         return True
@@ -65,6 +183,62 @@ class GameState:
                 if self._field[x][y] == None:
                     yield x, y
 
+    def moves_near_stones(self, radius):
+        """Generator on possible moves which are not farther than `radius`
+        cells (horizontally, vertically or diagonally) from any occupied cell.
+        Yields the central cell if the field is empty. The order is the same
+        as in `all_available_moves`."""
+        near = set()
+        for x in range(self._width):
+            for y in range(self._height):
+                if self._field[x][y] != None:
+                    for near_x in range(max(0, x - radius), \
+                            min(self._width, x + radius + 1)):
+                        for near_y in range(max(0, y - radius), \
+                                min(self._height, y + radius + 1)):
+                            near.add((near_x, near_y))
+
+        if not near:
+            yield self._width // 2, self._height // 2
+            return
+
+        for x, y in self.all_available_moves():
+            if (x, y) in near:
+                yield x, y
+
+    def is_winning_move(self, pos_x, pos_y, player_handle):
+        """Returns True if the move of the player to the empty (pos_x, pos_y)
+        cell makes a winning sequence. The state is not changed."""
+        walker = BoxWalker(self._width, self._height, pos_x, pos_y)
+
+        for direction in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+            count = 0
+
+            for x, y in walker.steps_in_direction(direction[0], direction[1]):
+                if (x == pos_x and y == pos_y) or \
+                        self._field[x][y] == player_handle:
+                    count += 1
+                    if count == self._qty_to_win:
+                        return True
+                else:
+                    walker.turn_around_or_stop()
+
+        return False
+
+    def random_playout(self, player_handles, rnd=random):
+        """Plays random moves by turns of the players (`player_handles` is a
+        pair, the first player moves first) until the game is over, returns
+        the result (see `last_move_result`). The moves are made on a copy of
+        the field, the state is not changed. It's much faster than making
+        the moves by `make_move` (e.g. for Monte Carlo rollouts)."""
+        if self._last_move_result != "nothing":
+            return self._last_move_result
+
+        field = [list(column) for column in self._field]
+        moves = list(self.all_available_moves())
+        rnd.shuffle(moves)
+        return play_out(field, self._qty_to_win, moves, player_handles)
+
     def make_move(self, pos_x, pos_y, player_handle):
         """Makes move and returns new state as a result. New state contains
         the result of previous move (see `last_move_result` method).
@@ -94,6 +268,36 @@ class GameState:
                 reserved and used as result of `last_move_result` method.
         """
 
+        self._validate_move(pos_x, pos_y, player_handle)
+
+        new_state = self._clone()
+        new_state._hash = self._hash
+        new_state._moves_count = self._moves_count
+        new_state._pattern_scores = self._pattern_scores
+        new_state._place(pos_x, pos_y, player_handle)
+        return new_state
+
+    def apply_move(self, pos_x, pos_y, player_handle):
+        """Makes the move in place (the arguments and the result are the same
+        as for `make_move`). The move can be taken back by `undo_move`."""
+        self._validate_move(pos_x, pos_y, player_handle)
+
+        self._move_stack.append((pos_x, pos_y, self._last_move_result, \
+                self._hash, self._moves_count, self._pattern_scores))
+        self._place(pos_x, pos_y, player_handle)
+
+    def undo_move(self):
+        """Takes back the last move made by `apply_move`, the field and
+        `last_move_result` are restored."""
+        if not self._move_stack:
+            raise ValueError("There are no applied moves to undo")
+
+        pos_x, pos_y, self._last_move_result, self._hash, \
+                self._moves_count, self._pattern_scores = \
+                self._move_stack.pop()
+        self._field[pos_x][pos_y] = None
+
+    def _validate_move(self, pos_x, pos_y, player_handle):
         if player_handle in ("nothing", "draw"):
             raise ValueError("\"nothing\" and \"draw\" hanles are reserved")
 
@@ -101,29 +305,39 @@ class GameState:
             raise ValueError("The value in the cell (%d, %d) is already set" % \
                     (pos_x, pos_y))
 
-        new_state = self._clone()
-        new_state._field[pos_x][pos_y] = player_handle
+    def _place(self, pos_x, pos_y, player_handle):
+        """puts the player's handle to the empty cell, updates the hash, the
+        scores and the result of the move"""
+        if self._pattern_scores != None:
+            self._pattern_scores = self._pattern_scores_after(pos_x, pos_y, \
+                    player_handle)
+        if self._moves_count != None:
+            self._moves_count += 1
+        if self._hash != None:
+            self._hash ^= zobrist.cell_key(self._width, self._height, \
+                    self._qty_to_win, player_handle, \
+                    pos_x * self._height + pos_y)
+        self._field[pos_x][pos_y] = player_handle
 
-        walker = BoxWalker(new_state._width, new_state._height, pos_x, pos_y)
+        walker = BoxWalker(self._width, self._height, pos_x, pos_y)
 
         for direction in [(1, 0), (0, 1), (1, 1), (1, -1)]:
             count = 0
 
             for x, y in walker.steps_in_direction(direction[0], direction[1]):
-                if new_state._field[x][y] == player_handle:
+                if self._field[x][y] == player_handle:
                     count += 1
-                    if count == new_state._qty_to_win:
-                        new_state._last_move_result = player_handle
-                        return new_state
+                    if count == self._qty_to_win:
+                        self._last_move_result = player_handle
+                        return
                 else:
                     walker.turn_around_or_stop()
 
-        if new_state._is_fully_filled():
-            new_state._last_move_result = "draw"
-            return new_state
+        if self._is_fully_filled():
+            self._last_move_result = "draw"
+            return
 
-        new_state._last_move_result = "nothing"
-        return new_state
+        self._last_move_result = "nothing"
 
     @property
     def last_move_result(self):
@@ -1,10 +1,89 @@
+import copy
+from tttoe import symmetry
+
 class MinimaxStrategy:
+    """Strategy of the tictactoe game for `minimax.run` (see its docs for
+    the strategy methods).
+
+    Options:
+
+        max_depth -- the search depth.
+        candidate_radius -- if provided, only the cells which are not farther
+            than `candidate_radius` from occupied cells are considered as
+            possible moves (on large fields the moves far from all stones are
+            almost never good, and the branching factor drops a lot).
+        order_moves -- if True, moves are searched in order: winning moves
+            first, moves that block the opponent's win next, then killer
+            moves (moves which caused cutoffs on the same move number) and
+            moves by their history score (how often and how deep they caused
+            cutoffs). Good moves first means more alpha-beta cutoffs.
+        evaluate_patterns -- if True, non-terminal states are evaluated by
+            pattern scores of the players (see `tttoe.patterns`), instead of
+            the same value for all of them. The scores are updated
+            incrementally by `make_move`, so the evaluation is cheap, and the
+            search doesn't need to be deep to play well.
+        skip_symmetric -- if True, moves which lead to positions symmetric
+            to already generated ones (by symmetries of the field which don't
+            change the current position, see `tttoe.symmetry.stabilizer`)
+            are skipped. It cuts the search on empty and near-empty fields up
+            to 8 times. Payloads are real field coordinates anyway.
+
+    `order_moves` and `skip_symmetric` don't change the value of the
+    position found by the search (except for the moves pruned by
+    `candidate_radius`), so ordered and unordered searches can be
+    benchmarked against each other by their values and node counts. The
+    chosen move can differ: the first of several moves with the best value
+    is chosen, and both options change which one goes first.
+
+    The strategy implements the make/unmake methods of `minimax.run_negamax`
+    (`moves`, `apply_move`, `undo_move`), so `run_negamax` searches on the
+    passed state itself with `apply_move`/`undo_move` of the state instead of
+    making a new state for every move. With `evaluate_patterns` pass a state
+    which tracks the scores (see `with_pattern_scores`) in this case, e.g.
+    made by `searched_copy`.
+    """
+
+    _PLAYER_HANDLES = {-1: "opponent", 1: "host"}
+    _OUTCOMES = {"opponent": -1, "draw": 0, "host": 1}
+    _KILLERS_PER_MOVE_NUMBER = 2
+    _WIN_VALUE = 10 ** 9
+
+    def __init__(self, max_depth=5, candidate_radius=None, order_moves=False, \
+            evaluate_patterns=False, skip_symmetric=False):
+        self._max_depth = max_depth
+        self._candidate_radius = candidate_radius
+        self._order_moves = order_moves
+        self._evaluate_patterns = evaluate_patterns
+        self._skip_symmetric = skip_symmetric
+        self._history = dict()
+        self._killers = dict()
+
+    def cache_key(self):
+        """Returns a tuple of the settings which can change the found move
+        (e.g. to cache the moves, see `tttoe.move_cache`)."""
+        return (self._max_depth, self._candidate_radius, self._order_moves, \
+                self._evaluate_patterns, self._skip_symmetric)
+
+    def below_heuristic(self):
+        return -self._WIN_VALUE - 1 if self._evaluate_patterns else -1
 
-    def below_heuristic(self): return -1
-    def above_heuristic(self): return 4
-    def max_depth(self): return 5
+    def above_heuristic(self):
+        return self._WIN_VALUE + 1 if self._evaluate_patterns else 4
+
+    def max_depth(self): return self._max_depth
+
+    def searched_copy(self, state):
+        """Returns a copy of the state for `minimax.run_negamax` (it changes
+        the searched state), with `evaluate_patterns` the copy tracks the
+        pattern scores."""
+        if self._evaluate_patterns:
+            return state.with_pattern_scores()
+        return copy.deepcopy(state)
 
     def heuristic(self, state):
+        if self._evaluate_patterns:
+            return self._patterns_heuristic(state)
+
         evaluation_map = {
             "opponent": 0,
             "nothing": 1,
@@ -13,10 +92,119 @@ class MinimaxStrategy:
         }
         return evaluation_map[state.last_move_result]
 
+    def _patterns_heuristic(self, state):
+        evaluation_map = {
+            "opponent": -self._WIN_VALUE,
+            "draw": 0,
+            "host": self._WIN_VALUE
+        }
+        result = state.last_move_result
+        if result != "nothing":
+            return evaluation_map[result]
+
+        scores = state.pattern_scores
+        if scores is None:
+            scores = state.with_pattern_scores().pattern_scores
+        value = scores.get("host", 0) - scores.get("opponent", 0)
+        return max(-self._WIN_VALUE + 1, min(self._WIN_VALUE - 1, value))
+
+    def state_hash(self, state):
+        return state.zobrist_hash
+
     def is_state_terminal(self, state):
         return state.last_move_result != "nothing"
 
+    def outcome(self, state):
+        """1 or -1 if this player won the terminal state, 0 if it's a draw
+        (for `minimax.run_proof_number`)"""
+        return self._OUTCOMES[state.last_move_result]
+
+    def random_playout(self, state, player, rnd):
+        """Plays a random game from the state by its `random_playout` (see
+        `GameState.random_playout`), returns its `outcome` (for
+        `minimax.MCTSearcher`)."""
+        result = state.random_playout((self._PLAYER_HANDLES[player], \
+                self._PLAYER_HANDLES[-player]), rnd)
+        return self._OUTCOMES[result]
+
     def all_substates(self, state, player):
-        sign = {-1: "opponent", 1: "host"}[player]
-        for x, y in state.all_available_moves():
+        if self._evaluate_patterns and state.pattern_scores is None:
+            # Only the root state of the search gets here, its substates
+            # track the scores.
+            state = state.with_pattern_scores()
+
+        sign = self._PLAYER_HANDLES[player]
+        moves = self.candidate_moves(state, player)
+        if self._skip_symmetric:
+            moves = self._unique_moves(state, moves)
+
+        for x, y in moves:
             yield state.make_move(x, y, sign), (x, y)
+
+    def moves(self, state, player):
+        moves = self.candidate_moves(state, player)
+        if self._skip_symmetric:
+            moves = self._unique_moves(state, moves)
+        return moves
+
+    def apply_move(self, state, payload, player):
+        state.apply_move(payload[0], payload[1], self._PLAYER_HANDLES[player])
+
+    def undo_move(self, state, payload):
+        state.undo_move()
+
+    def _unique_moves(self, state, moves):
+        transforms = symmetry.stabilizer(state)
+        if not transforms:
+            for move in moves:
+                yield move
+            return
+
+        generated = set()
+        for move in moves:
+            if any(transform.apply(move[0], move[1]) in generated \
+                    for transform in transforms):
+                continue
+            generated.add(move)
+            yield move
+
+    def candidate_moves(self, state, player):
+        """Returns the moves to search (x, y tuples) in the search order."""
+        if self._candidate_radius is None:
+            moves = state.all_available_moves()
+        else:
+            moves = state.moves_near_stones(self._candidate_radius)
+
+        if not self._order_moves:
+            return moves
+
+        sign = self._PLAYER_HANDLES[player]
+        other_sign = {-1: "host", 1: "opponent"}[player]
+        killers = self._killers.get((player, state.moves_count), ())
+
+        def move_score(move):
+            if state.is_winning_move(move[0], move[1], sign):
+                return (3, 0)
+            if state.is_winning_move(move[0], move[1], other_sign):
+                return (2, 0)
+            history_score = self._history.get((player, move), 0)
+            if move in killers:
+                return (1, history_score)
+            return (0, history_score)
+
+        # The sort is stable, so the moves with equal scores keep the order.
+        return sorted(moves, key=move_score, reverse=True)
+
+    def record_cutoff(self, state, player, payload, depth):
+        if not self._order_moves:
+            return
+
+        history_key = (player, payload)
+        self._history[history_key] = self._history.get(history_key, 0) + \
+                (depth + 1) * (depth + 1)
+
+        killers_key = (player, state.moves_count)
+        killers = self._killers.get(killers_key, ())
+        if payload not in killers:
+            self._killers[killers_key] = \
+                    ((payload,) + killers)[:self._KILLERS_PER_MOVE_NUMBER]
@@ -0,0 +1,221 @@
+"""
+This module implements caches of AI moves shared between games.
+
+Many games reach the same positions (especially openings), and the search
+of a position with the same strategy settings always finds the same move.
+The caches keep found moves by position: positions which are symmetric to
+each other (see `tttoe.symmetry`) share one entry, the move is stored in
+canonical coordinates and mapped back on lookup.
+
+The key is the field size, qty_to_win, the handle of the player to move, the
+strategy key (e.g. `MinimaxStrategy.cache_key()`, it includes the search
+depth) and the canonical code of the position (see
+`tttoe.tablebase.canonical_code`).
+
+`MoveCache` keeps moves in the process memory, it's shared by all games
+(and threads) of the process. `SharedMoveCache` keeps them in a SQLite file,
+so it's shared by worker processes too.
+"""
+
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+from tttoe.tablebase import canonical_code
+
+def _position_key(state, player_handle, strategy_key):
+    """returns (key, transform) tuple"""
+    code, transform = canonical_code(state, player_handle)
+    key = (state.width, state.height, state.qty_to_win, player_handle, \
+            strategy_key, code)
+    return key, transform
+
+def _to_canonical_cell(state, transform, move):
+    new_x, new_y = transform.apply(move[0], move[1])
+    return new_x * state.height + new_y
+
+def _from_canonical_cell(state, transform, cell):
+    return transform.invert(cell // state.height, cell % state.height)
+
+class MoveCache:
+    """In-process LRU cache of moves.
+
+    Example usage:
+
+    cache = MoveCache(max_entries=100000, max_bytes=64 * 1024 * 1024)
+    move = cache.get(state, "host", strategy.cache_key())
+    if move is None:
+        move = ... # search
+        cache.put(state, "host", strategy.cache_key(), move)
+
+    The least recently used entries are evicted when there are more than
+    `max_entries` entries or they take more than `max_bytes` (the size of an
+    entry is estimated). The cache is thread-safe.
+    """
+
+    def __init__(self, max_entries=100000, max_bytes=None):
+        if max_entries <= 0:
+            raise ValueError("max_entries should be positive (now %d)" % \
+                    max_entries)
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _entry_size(key, cell):
+        return sys.getsizeof(key) + sum(sys.getsizeof(item) for item in key) \
+                + sys.getsizeof(cell)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def memory_used(self):
+        """estimated size of the entries in bytes"""
+        return self._bytes
+
+    def get(self, state, player_handle, strategy_key):
+        """Returns (x, y) of the cached move of the player in the state, or
+        None."""
+        key, transform = _position_key(state, player_handle, strategy_key)
+        with self._lock:
+            cell = self._entries.get(key)
+            if cell is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return _from_canonical_cell(state, transform, cell)
+
+    def put(self, state, player_handle, strategy_key, move):
+        """stores (x, y) move of the player in the state"""
+        key, transform = _position_key(state, player_handle, strategy_key)
+        cell = _to_canonical_cell(state, transform, move)
+        with self._lock:
+            old_cell = self._entries.pop(key, None)
+            if old_cell is not None:
+                self._bytes -= self._entry_size(key, old_cell)
+            self._entries[key] = cell
+            self._bytes += self._entry_size(key, cell)
+
+            while len(self._entries) > self._max_entries or \
+                    (self._max_bytes is not None and \
+                    self._bytes > self._max_bytes and len(self._entries) > 1):
+                old_key, old_cell = self._entries.popitem(last=False)
+                self._bytes -= self._entry_size(old_key, old_cell)
+
+    def clear(self):
+        """removes all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """returns dict of counters (e.g. for logging)"""
+        return dict(entries=len(self._entries), memory_used=self._bytes, \
+                hits=self.hits, misses=self.misses)
+
+class SharedMoveCache:
+    """Move cache in a SQLite file, shared by all processes which open the
+    same file. The interface is the same as of `MoveCache`.
+
+    `max_entries` limits the number of rows, the least recently used rows are
+    removed. The database file is the memory cap: rows are small (the key
+    and one cell number). Hit and miss counters are counted by the instance
+    (by the process).
+
+    Instances can be pickled (e.g. passed to pool workers), the unpickled
+    instance opens its own connection.
+    """
+
+    _SCHEMA = "CREATE TABLE IF NOT EXISTS moves (key TEXT PRIMARY KEY, " \
+            "cell INTEGER NOT NULL, used INTEGER NOT NULL)"
+
+    def __init__(self, path, max_entries=1000000):
+        if max_entries <= 0:
+            raise ValueError("max_entries should be positive (now %d)" % \
+                    max_entries)
+        self._path = path
+        self._max_entries = max_entries
+        self._open()
+
+    def _open(self):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self._path, timeout=30, \
+                check_same_thread=False)
+        with self._connection:
+            self._connection.execute(self._SCHEMA)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS " \
+                    "moves_used ON moves (used)")
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        return (self._path, self._max_entries)
+
+    def __setstate__(self, data):
+        self._path, self._max_entries = data
+        self._open()
+
+    @staticmethod
+    def _text_key(key):
+        return ":".join(str(item) for item in key)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute( \
+                    "SELECT COUNT(*) FROM moves").fetchone()[0]
+
+    def _next_used(self):
+        row = self._connection.execute("SELECT MAX(used) FROM moves") \
+                .fetchone()
+        return (row[0] or 0) + 1
+
+    def get(self, state, player_handle, strategy_key):
+        """See `MoveCache.get`."""
+        key, transform = _position_key(state, player_handle, strategy_key)
+        text_key = self._text_key(key)
+        with self._lock, self._connection:
+            row = self._connection.execute( \
+                    "SELECT cell FROM moves WHERE key = ?", \
+                    (text_key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE moves SET used = ? " \
+                    "WHERE key = ?", (self._next_used(), text_key))
+            self.hits += 1
+        return _from_canonical_cell(state, transform, row[0])
+
+    def put(self, state, player_handle, strategy_key, move):
+        """See `MoveCache.put`."""
+        key, transform = _position_key(state, player_handle, strategy_key)
+        cell = _to_canonical_cell(state, transform, move)
+        with self._lock, self._connection:
+            self._connection.execute("INSERT OR REPLACE INTO moves " \
+                    "(key, cell, used) VALUES (?, ?, ?)", \
+                    (self._text_key(key), cell, self._next_used()))
+            count = self._connection.execute( \
+                    "SELECT COUNT(*) FROM moves").fetchone()[0]
+            if count > self._max_entries:
+                self._connection.execute("DELETE FROM moves WHERE key IN " \
+                        "(SELECT key FROM moves ORDER BY used LIMIT ?)", \
+                        (count - self._max_entries,))
+
+    def clear(self):
+        """See `MoveCache.clear`."""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM moves")
+
+    def stats(self):
+        """See `MoveCache.stats`."""
+        return dict(entries=len(self), hits=self.hits, misses=self.misses)
+
+    def close(self):
+        """closes the database connection"""
+        self._connection.close()
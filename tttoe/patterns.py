@@ -0,0 +1,141 @@
+"""
+This module implements pattern-based evaluation of tictactoe fields.
+
+Every sequence of `qty_to_win` adjacent cells (horizontal, vertical or
+diagonal) is a "window" - a place where a player can still make a winning
+sequence. A window which contains stones of one player only is scored for this
+player, the more stones the higher the score. Windows with stones of both
+players are dead and scored nothing.
+
+Open runs (free cells on both sides) are covered by more live windows than
+half-open runs (blocked on one side), so they get higher scores, and runs
+blocked on both sides (no live window) get nothing.
+
+The score of a player is the sum of scores of its windows. It can be computed
+for the whole field (`field_scores`), or updated incrementally after a move
+(`line_delta`) - a move changes only the windows passing through its cell, so
+the update costs O(qty_to_win) for each of four directions.
+"""
+
+DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+EMPTY = 0
+MOVER = 1
+OTHER = 2
+
+def window_score(stones):
+    """returns the score of the window with `stones` stones of one player"""
+    if stones == 0:
+        return 0
+    return 10 ** (stones - 1)
+
+def line_delta(owners, center, qty_to_win):
+    """Computes how the move changes the scores of the windows on one line.
+
+    Arguments:
+        owners -- list of EMPTY, MOVER or OTHER codes of the cells of the line
+            before the move. Usually it's cells from `center - qty_to_win + 1`
+            to `center + qty_to_win - 1` (cut by the field borders).
+        center -- index of the move cell in `owners` (the cell is EMPTY).
+
+    Returns (gain, loss) tuple: the mover's score increases by `gain`, the
+    other player's score decreases by `loss`.
+    """
+    first = max(0, center - qty_to_win + 1)
+    last = min(center, len(owners) - qty_to_win)
+    if first > last:
+        return 0, 0
+
+    mine = 0
+    other = 0
+    for owner in owners[first:first + qty_to_win]:
+        if owner == MOVER:
+            mine += 1
+        elif owner == OTHER:
+            other += 1
+
+    gain = 0
+    loss = 0
+    for start in range(first, last + 1):
+        if start > first:
+            dropped = owners[start - 1]
+            added = owners[start + qty_to_win - 1]
+            if dropped == MOVER:
+                mine -= 1
+            elif dropped == OTHER:
+                other -= 1
+            if added == MOVER:
+                mine += 1
+            elif added == OTHER:
+                other += 1
+
+        if other == 0:
+            gain += window_score(mine + 1) - window_score(mine)
+        elif mine == 0:
+            loss += window_score(other)
+
+    return gain, loss
+
+def line_cells(width, height, qty_to_win, pos_x, pos_y, dir_x, dir_y):
+    """Returns the list of (x, y) cells of the line in the direction, not
+    farther than `qty_to_win - 1` from (pos_x, pos_y), and the index of
+    (pos_x, pos_y) in the list."""
+    before = []
+    for step in range(1, qty_to_win):
+        x = pos_x - dir_x * step
+        y = pos_y - dir_y * step
+        if x < 0 or x >= width or y < 0 or y >= height:
+            break
+        before.append((x, y))
+    before.reverse()
+
+    cells = before + [(pos_x, pos_y)]
+    for step in range(1, qty_to_win):
+        x = pos_x + dir_x * step
+        y = pos_y + dir_y * step
+        if x < 0 or x >= width or y < 0 or y >= height:
+            break
+        cells.append((x, y))
+
+    return cells, len(before)
+
+def apply_move(scores, player_handle, gain, loss):
+    """Returns a new scores dict ({handle: score}) changed by the move of
+    the player (see `line_delta`). Supports two players."""
+    new_scores = dict(scores)
+    new_scores[player_handle] = new_scores.get(player_handle, 0) + gain
+    if loss:
+        for handle in new_scores:
+            if handle != player_handle:
+                new_scores[handle] -= loss
+    return new_scores
+
+def field_scores(field, width, height, qty_to_win):
+    """Computes scores ({handle: score}) of all players for the whole field
+    (list of lists, None for empty cells)."""
+    scores = dict()
+    for column in field:
+        for handle in column:
+            if handle != None:
+                scores[handle] = 0
+
+    for dir_x, dir_y in DIRECTIONS:
+        for start_x in range(width):
+            for start_y in range(height):
+                end_x = start_x + dir_x * (qty_to_win - 1)
+                end_y = start_y + dir_y * (qty_to_win - 1)
+                if not (0 <= end_x < width and 0 <= end_y < height):
+                    continue
+
+                handles = set()
+                stones = 0
+                for step in range(qty_to_win):
+                    handle = field[start_x + dir_x * step][start_y + dir_y * step]
+                    if handle != None:
+                        handles.add(handle)
+                        stones += 1
+
+                if len(handles) == 1:
+                    scores[handles.pop()] += window_score(stones)
+
+    return scores
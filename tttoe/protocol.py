@@ -0,0 +1,148 @@
+"""
+This module implements messages of the websocket protocol.
+
+Version 1 (the default) messages are JSON objects {"event": ..., "data":
+{...}}, the field is sent as nested lists of player handles.
+
+Version 2 (the client connects with the `protocol=2` argument) messages are
+compact JSON objects with short keys:
+
+    setup -- {"e": "s", "q": seq, "p": player handle, "g": game id to share
+        or null, "sm": signs map, "sp": start player handle, "w": width,
+        "h": height, "b": board}
+    move -- {"e": "m", "q": seq, "p": player, "x": x, "y": y}
+    gameover -- {"e": "g", "q": seq, "r": result}
+    playerjoined, playerleft -- {"e": "j" or "l", "p": player handle}
+    sync -- {"e": "b", "q": seq, "w": width, "h": height, "b": board,
+        "r": result} (the answer to a resync request)
+    error -- {"e": "x", "m": message}
+
+The board is a string of `width * height` chars, cell (x, y) is the char
+number `x * height + y`: "." for an empty cell, "h" for the host and "o" for
+the opponent. In results and players "h", "o" and "d" stand for "host",
+"opponent" and "draw" ("n" is "nothing" - the game is not over), spectator
+handles are sent as is.
+
+`seq` is the number of moves made in the game. A client which gets a move
+or gameover message with `seq` other than its last `seq` + 1 missed
+something, it sends a resync request and gets the whole board.
+
+Client messages of version 2: {"e": "m", "x": x, "y": y} (a move) and
+{"e": "r"} (a resync request).
+
+A `Message` is encoded once for every protocol version, so a broadcast to
+many players is serialized once.
+"""
+
+import json
+
+VERSIONS = (1, 2)
+
+EMPTY_CELL = "."
+
+_SHORT_HANDLES = {"host": "h", "opponent": "o", "draw": "d", "nothing": "n"}
+_LONG_HANDLES = dict((short, handle) \
+        for handle, short in _SHORT_HANDLES.items())
+
+def short_handle(handle):
+    """returns the version 2 form of the player handle or the result"""
+    return _SHORT_HANDLES.get(handle, handle)
+
+def long_handle(handle):
+    """inverse of `short_handle`"""
+    return _LONG_HANDLES.get(handle, handle)
+
+def pack_field(field):
+    """Returns the board string of the field (list of lists of handles)."""
+    return "".join(EMPTY_CELL if handle == None else _SHORT_HANDLES[handle] \
+            for column in field for handle in column)
+
+def unpack_field(board, width, height):
+    """Returns the field (list of lists of handles) of the board string."""
+    if len(board) != width * height:
+        raise ValueError("The board should have %d cells, not %d" % \
+                (width * height, len(board)))
+    return [[None if char == EMPTY_CELL else _LONG_HANDLES[char] \
+            for char in board[x * height:(x + 1) * height]] \
+            for x in range(width)]
+
+def _field_keys(field):
+    return dict(w=len(field), h=len(field[0]) if field else 0, \
+            b=pack_field(field))
+
+def _setup_v2(message):
+    data = message["data"]
+    result = dict(e="s", q=message.seq, p=short_handle(data["player_handle"]), \
+            g=data["connection_game_id"], sm=data["signs_map"], \
+            sp=short_handle(data["start_player_handle"]))
+    result.update(_field_keys(data["field"]))
+    return result
+
+def _sync_v2(message):
+    data = message["data"]
+    result = dict(e="b", q=message.seq, r=short_handle(data["result"]))
+    result.update(_field_keys(data["field"]))
+    return result
+
+_TO_V2 = {
+    "setup": _setup_v2,
+    "move": lambda message: dict(e="m", q=message.seq, \
+            p=short_handle(message["data"]["player_handle"]), \
+            x=message["data"]["x"], y=message["data"]["y"]),
+    "gameover": lambda message: dict(e="g", q=message.seq, \
+            r=short_handle(message["data"]["result_of_move"])),
+    "playerjoined": lambda message: dict(e="j", \
+            p=short_handle(message["data"]["player_handle"])),
+    "playerleft": lambda message: dict(e="l", \
+            p=short_handle(message["data"]["player_handle"])),
+    "sync": _sync_v2,
+    "error": lambda message: dict(e="x", m=message["data"]["message"]),
+}
+
+class Message(dict):
+    """Server message. It's a dict {"event": event, "data": data} (the
+    version 1 form, AI players read it as is), `encode` returns its text for
+    a protocol version.
+
+    Example usage:
+
+    message = Message("move", seq=5, player_handle="host", x=1, y=2)
+    message.encode(2) # returns '{"e":"m","q":5,"p":"h","x":1,"y":2}'
+    """
+
+    def __init__(self, event, seq=None, **data):
+        dict.__init__(self, event=event, data=data)
+        self.seq = seq
+        self._encoded = dict()
+
+    def encode(self, version):
+        """returns the JSON text of the message for the protocol version
+        (it's built on the first call for the version)"""
+        text = self._encoded.get(version)
+        if text is None:
+            if version == 1:
+                text = json.dumps(dict(self))
+            elif version == 2:
+                text = json.dumps(_TO_V2[self["event"]](self), \
+                        separators=(",", ":"), sort_keys=True)
+            else:
+                raise ValueError("Unknown protocol version: %s" % version)
+            self._encoded[version] = text
+        return text
+
+def decode(text, version):
+    """Decodes the client message, returns (event, data) tuple: ("move",
+    {"x": x, "y": y}) or ("resync", {}) (version 2 only)."""
+    msg = json.loads(text)
+    if version == 1:
+        return msg["event"], msg.get("data", dict())
+
+    if version == 2:
+        event = msg["e"]
+        if event == "m":
+            return "move", dict(x=msg["x"], y=msg["y"])
+        if event == "r":
+            return "resync", dict()
+        raise ValueError("Unknown event: %s" % event)
+
+    raise ValueError("Unknown protocol version: %s" % version)
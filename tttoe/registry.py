@@ -0,0 +1,162 @@
+"""
+This module defines `GameRegistry` class. See its documentation.
+"""
+
+import sys
+import time
+
+class RegistryFull(Exception):
+    """Exception raised by `GameRegistry.add` if the registry has the
+    maximum number of games or takes the maximum memory.
+
+    Attributes:
+        message
+    """
+    def __init__(self, message):
+        Exception.__init__(self, message)
+        self.message = message
+
+def _object_size(obj, seen):
+    """Returns the size of the object and the lists, tuples, dicts and sets
+    it contains (other objects are not followed)."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += _object_size(key, seen) + _object_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += _object_size(item, seen)
+    return size
+
+def game_memory(game):
+    """Estimates the memory taken by the game and its state, in bytes.
+    Players and objects shared by many states (e.g. precomputed tables of
+    bitboards) are not counted."""
+    seen = set()
+    size = _object_size(game, seen) + _object_size(game.__dict__, seen)
+    state = game.game_state
+    size += _object_size(state, seen)
+    if hasattr(state, "__dict__"):
+        for name, value in state.__dict__.items():
+            if name != "_geometry":
+                size += _object_size(value, seen)
+    return size
+
+class GameRegistry:
+    """Keeps the games of the server by game id.
+
+    Example usage:
+
+    registry = GameRegistry(max_games=1000, idle_timeout=3600)
+    registry.add(game, joinable=True) # raises RegistryFull if it's full
+    registry.get(game.game_id)        # returns the game (only joinable)
+    registry.sweep()                  # removes games idle for an hour
+
+    Options:
+
+        max_games -- the maximum number of games, or None.
+        idle_timeout -- games without moves and joined or left players for
+            this time (seconds) are removed by `sweep`, or None.
+        max_memory -- the maximum estimated memory of all games (bytes, see
+            `game_memory`), or None. The memory is estimated when a game is
+            added and by `sweep` (game states change between sweeps).
+        on_expire -- function called with every game removed by `sweep`
+            (e.g. to close connections of its players).
+
+    Games without players are removed by `sweep` too.
+    """
+
+    def __init__(self, max_games=None, idle_timeout=None, max_memory=None, \
+            on_expire=None):
+        self._max_games = max_games
+        self._idle_timeout = idle_timeout
+        self._max_memory = max_memory
+        self._on_expire = on_expire
+        # {game_id: [game, joinable, estimated memory]}
+        self._entries = dict()
+        self.added_count = 0
+        self.rejected_count = 0
+        self.expired_count = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, game_id):
+        return game_id in self._entries
+
+    @property
+    def memory_used(self):
+        """estimated memory of all games (bytes) at the last estimation"""
+        return sum(entry[2] for entry in self._entries.values())
+
+    @property
+    def players_count(self):
+        """number of players (including AI players and spectators) of all
+        games"""
+        return sum(len(entry[0].players) for entry in self._entries.values())
+
+    def add(self, game, joinable=False):
+        """Adds the game. Joinable games can be found by `get` (e.g. other
+        players join them by the game id). Raises `RegistryFull`."""
+        if self._max_games is not None and \
+                len(self._entries) >= self._max_games:
+            self.rejected_count += 1
+            raise RegistryFull("The server has too many games (%d), " \
+                    "try again later" % self._max_games)
+
+        memory = game_memory(game)
+        if self._max_memory is not None and \
+                self.memory_used + memory > self._max_memory:
+            self.rejected_count += 1
+            raise RegistryFull("The server is out of memory for games, " \
+                    "try again later")
+
+        self._entries[game.game_id] = [game, joinable, memory]
+        self.added_count += 1
+
+    def get(self, game_id):
+        """returns the joinable game or None"""
+        entry = self._entries.get(game_id)
+        if entry is None or not entry[1]:
+            return None
+        return entry[0]
+
+    def games(self):
+        """returns the list of all games"""
+        return [entry[0] for entry in self._entries.values()]
+
+    def remove(self, game_id):
+        """removes the game if it's registered"""
+        self._entries.pop(game_id, None)
+
+    def sweep(self, now=None):
+        """Removes idle games and games without players, estimates the memory
+        of other games. Returns the list of removed games."""
+        if now is None:
+            now = time.time()
+
+        expired = []
+        for game_id, entry in list(self._entries.items()):
+            game = entry[0]
+            if not game.players or (self._idle_timeout is not None and \
+                    now - game.last_activity > self._idle_timeout):
+                del self._entries[game_id]
+                expired.append(game)
+            else:
+                entry[2] = game_memory(game)
+
+        self.expired_count += len(expired)
+        if self._on_expire is not None:
+            for game in expired:
+                self._on_expire(game)
+        return expired
+
+    def stats(self):
+        """returns dict of counters (e.g. for logging)"""
+        return dict(games=len(self._entries), players=self.players_count, \
+                memory_used=self.memory_used, added=self.added_count, \
+                rejected=self.rejected_count, expired=self.expired_count)
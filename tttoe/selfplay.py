@@ -0,0 +1,159 @@
+"""
+This module plays AI vs AI games without the web server (e.g. to test the
+strength and the speed of strategy settings on many games).
+
+Games are played by a plain loop over moves (unlike `Game` with `AIPlayer`
+instances, where every move is made from the callback of the previous one),
+in a pool of worker processes. Every finished game is reported as one JSON
+object (see `play_game`), the command line runner writes them as JSON Lines:
+
+    python -m tttoe.selfplay --width 15 --height 15 --qty-to-win 5 \\
+        --games 100 --processes 4 --depth 2 --candidate-radius 1 \\
+        --order-moves --patterns --opening-moves 2 --output games.jsonl
+
+Run `python -m tttoe.selfplay --help` to see all options.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tttoe.aiplayer import search_move
+from tttoe.bitboard_gamestate import BitboardGameState
+from tttoe.minimax_strategy import MinimaxStrategy
+
+_PLAYERS = {"host": 1, "opponent": -1}
+
+def play_game(game_index, settings):
+    """Plays one game, returns dict with keys:
+
+        game -- game_index;
+        start_player -- "host" starts even games, "opponent" starts odd ones;
+        opening -- list of [x, y] random moves made before the AI moves;
+        moves -- list of AI moves, dicts with x, y, player, seconds (search
+            time) and nodes (searched nodes);
+        result -- "host", "opponent" or "draw";
+        seconds -- the time of the whole game.
+
+    `settings` is a dict with keys: width, height, qty_to_win, host_strategy
+    and opponent_strategy (`MinimaxStrategy` keyword arguments),
+    time_budget (seconds per move or None), transposition_table_entries,
+    opening_moves (the number of random moves) and seed.
+    """
+    started_at = time.time()
+    strategies = {
+        "host": MinimaxStrategy(**settings["host_strategy"]),
+        "opponent": MinimaxStrategy(**settings["opponent_strategy"])
+    }
+    rnd = random.Random("%s:%d" % (settings["seed"], game_index))
+
+    state = BitboardGameState(settings["width"], settings["height"], \
+            settings["qty_to_win"])
+    handle = "host" if game_index % 2 == 0 else "opponent"
+    other_handle = {"host": "opponent", "opponent": "host"}
+    game = dict(game=game_index, start_player=handle, opening=[], moves=[])
+
+    for _ in range(settings["opening_moves"]):
+        if state.last_move_result != "nothing":
+            break
+        pos_x, pos_y = rnd.choice(list(state.all_available_moves()))
+        state = state.make_move(pos_x, pos_y, handle)
+        game["opening"].append([pos_x, pos_y])
+        handle = other_handle[handle]
+
+    while state.last_move_result == "nothing":
+        move_started_at = time.time()
+        (pos_x, pos_y), stats = search_move(state, _PLAYERS[handle], \
+                strategies[handle], settings["transposition_table_entries"], \
+                settings["time_budget"], collect_stats=True)
+        game["moves"].append(dict(x=pos_x, y=pos_y, player=handle, \
+                seconds=time.time() - move_started_at, nodes=stats.nodes))
+        state = state.make_move(pos_x, pos_y, handle)
+        handle = other_handle[handle]
+
+    game["result"] = state.last_move_result
+    game["seconds"] = time.time() - started_at
+    return game
+
+def run_games(settings, games, processes=None):
+    """Plays `games` games in `processes` worker processes (the number of
+    CPUs by default), yields the results of `play_game` as games finish."""
+    with ProcessPoolExecutor(processes) as executor:
+        futures = [executor.submit(play_game, game_index, settings) \
+                for game_index in range(games)]
+        for future in as_completed(futures):
+            yield future.result()
+
+def _parse_args(args):
+    parser = argparse.ArgumentParser( \
+            description="Plays AI vs AI games, writes them as JSON Lines.")
+    parser.add_argument("--width", type=int, default=3)
+    parser.add_argument("--height", type=int, default=3)
+    parser.add_argument("--qty-to-win", type=int, default=3)
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--processes", type=int, default=None, \
+            help="number of worker processes (the number of CPUs by default)")
+    parser.add_argument("--output", help="JSON Lines file (stdout by default)")
+    parser.add_argument("--seed", default="0", help="seed of random openings")
+    parser.add_argument("--opening-moves", type=int, default=0, \
+            help="number of random moves before the AI moves")
+    parser.add_argument("--move-time", type=float, default=None, \
+            help="search time per move (iterative deepening), seconds")
+    parser.add_argument("--tt-entries", type=int, default=0, \
+            help="transposition table size of each worker")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--opponent-depth", type=int, default=None, \
+            help="search depth of the opponent (--depth by default)")
+    parser.add_argument("--candidate-radius", type=int, default=None)
+    parser.add_argument("--order-moves", action="store_true")
+    parser.add_argument("--patterns", action="store_true")
+    parser.add_argument("--skip-symmetric", action="store_true")
+    return parser.parse_args(args)
+
+def _settings(options):
+    host_strategy = dict(max_depth=options.depth, \
+            candidate_radius=options.candidate_radius, \
+            order_moves=options.order_moves, \
+            evaluate_patterns=options.patterns, \
+            skip_symmetric=options.skip_symmetric)
+    opponent_strategy = dict(host_strategy)
+    if options.opponent_depth is not None:
+        opponent_strategy["max_depth"] = options.opponent_depth
+
+    return dict(width=options.width, height=options.height, \
+            qty_to_win=options.qty_to_win, host_strategy=host_strategy, \
+            opponent_strategy=opponent_strategy, \
+            time_budget=options.move_time, \
+            transposition_table_entries=options.tt_entries, \
+            opening_moves=options.opening_moves, seed=options.seed)
+
+def main(args):
+    options = _parse_args(args)
+    settings = _settings(options)
+
+    output = open(options.output, "w") if options.output else sys.stdout
+    results = dict(host=0, opponent=0, draw=0)
+    moves_count = 0
+    search_seconds = 0.0
+    try:
+        for game in run_games(settings, options.games, options.processes):
+            output.write(json.dumps(game, sort_keys=True) + "\n")
+            output.flush()
+            results[game["result"]] += 1
+            moves_count += len(game["moves"])
+            search_seconds += sum(move["seconds"] for move in game["moves"])
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    sys.stderr.write("games: %d, host wins: %d, opponent wins: %d, " \
+            "draws: %d, mean move time: %.3fs\n" % (options.games, \
+            results["host"], results["opponent"], results["draw"], \
+            search_seconds / moves_count if moves_count else 0.0))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,441 @@
+# pylint: disable=too-many-arguments, protected-access
+
+"""
+This module defines `SparseGameState` class. See its documentation.
+"""
+
+import random
+from collections import OrderedDict
+from tttoe import zobrist
+from tttoe import patterns
+from tttoe.gamestate import play_out
+
+_DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+# Zobrist keys of cells of unbounded fields, {(qty_to_win, handle, x, y): key}.
+# Games on unbounded fields can visit any cells, so only the recently used
+# keys are kept (an evicted key is generated again from the same seed).
+_MAX_POINT_KEYS = 1 << 16
+_point_keys = OrderedDict()
+
+def _point_key(qty_to_win, player_handle, pos_x, pos_y):
+    key = (qty_to_win, player_handle, pos_x, pos_y)
+    value = _point_keys.get(key)
+    if value is None:
+        value = random.Random("zobrist:inf:%d:%s:%d:%d" % key).getrandbits(64)
+        _point_keys[key] = value
+        while len(_point_keys) > _MAX_POINT_KEYS:
+            _point_keys.popitem(last=False)
+    else:
+        _point_keys.move_to_end(key)
+    return value
+
+class SparseGameState:
+    """Drop-in replacement for `GameState` which keeps only occupied cells:
+    a dict {(x, y): player_handle} and the bounding box of the stones.
+
+    Memory and the cost of a move depend on the number of stones, not on the
+    field size: `make_move` copies the dict of stones, the win check looks up
+    `qty_to_win - 1` cells in each direction, the draw check compares the
+    incrementally counted number of empty cells with 0, and
+    `moves_near_stones` visits only the cells around the stones. Only
+    `all_available_moves` and `field` of a bounded field cost its area.
+
+    If `width` and `height` are None, the field is unbounded (Gomoku-style):
+    coordinates can be any integers (including negative ones), the game is
+    never a draw, `all_available_moves` yields the empty cells of the bounding
+    box of the stones extended by `qty_to_win - 1` cells, and `field`
+    returns the cells of the bounding box (see `bounding_box`).
+
+    Example usage is the same as for `GameState`:
+
+    state = SparseGameState(100, 100, 5)
+    new_state = state.make_move(50, 50, "x")
+    new_state.last_move_result # returns "nothing"
+
+    state = SparseGameState(None, None, 5) # unbounded
+    new_state = state.make_move(-3, 1000, "x")
+    """
+
+    def __init__(self, width, height, qty_to_win, field=None):
+        if (width is None) != (height is None):
+            raise ValueError("width and height should be both provided " \
+                    "or both None")
+
+        self._width = width
+        self._height = height
+        self._qty_to_win = qty_to_win
+        self._cells = dict()
+        # (min_x, min_y, max_x, max_y) or None if there are no stones
+        self._box = None
+        self._empty_count = None if width is None else width * height
+        self._last_move_result = "nothing"
+        self._hash = None
+        self._pattern_scores = None
+        self._move_stack = []
+
+        if field != None:
+            for x, column in enumerate(field):
+                for y, handle in enumerate(column):
+                    if handle != None:
+                        self._set_cell(x, y, handle)
+
+    @staticmethod
+    def from_state(state):
+        """Makes `SparseGameState` with the same field and the same result of
+        the last move as the provided state (e.g. `GameState`)."""
+        if isinstance(state, SparseGameState):
+            return state
+
+        new_state = SparseGameState(state.width, state.height, \
+                state.qty_to_win, field=state.field)
+        new_state._last_move_result = state.last_move_result
+        return new_state
+
+    @property
+    def width(self):
+        """width getter (None for an unbounded field)"""
+        return self._width
+
+    @property
+    def height(self):
+        """height getter (None for an unbounded field)"""
+        return self._height
+
+    @property
+    def qty_to_win(self):
+        """qty_to_win getter"""
+        return self._qty_to_win
+
+    @property
+    def is_unbounded(self):
+        return self._width is None
+
+    @property
+    def bounding_box(self):
+        """Returns (min_x, min_y, max_x, max_y) of the stones, or None if the
+        field is empty."""
+        return self._box
+
+    @property
+    def empty_count(self):
+        """Returns the number of empty cells (None for an unbounded
+        field)."""
+        return self._empty_count
+
+    def occupied_cells(self):
+        """Yields (x, y, player_handle) of every stone (in no particular
+        order)."""
+        for (x, y), handle in self._cells.items():
+            yield x, y, handle
+
+    def _inside(self, pos_x, pos_y):
+        return self._width is None or \
+                (0 <= pos_x < self._width and 0 <= pos_y < self._height)
+
+    def _set_cell(self, pos_x, pos_y, player_handle):
+        self._cells[(pos_x, pos_y)] = player_handle
+        if self._empty_count is not None:
+            self._empty_count -= 1
+        if self._box is None:
+            self._box = (pos_x, pos_y, pos_x, pos_y)
+        else:
+            min_x, min_y, max_x, max_y = self._box
+            self._box = (min(min_x, pos_x), min(min_y, pos_y), \
+                    max(max_x, pos_x), max(max_y, pos_y))
+
+    def _clone(self):
+        new_state = SparseGameState.__new__(SparseGameState)
+        new_state._width = self._width
+        new_state._height = self._height
+        new_state._qty_to_win = self._qty_to_win
+        new_state._cells = dict(self._cells)
+        new_state._box = self._box
+        new_state._empty_count = self._empty_count
+        new_state._last_move_result = self._last_move_result
+        new_state._hash = None
+        new_state._pattern_scores = self._pattern_scores
+        new_state._move_stack = []
+        return new_state
+
+    def _cell_key(self, player_handle, pos_x, pos_y):
+        if self._width is None:
+            return _point_key(self._qty_to_win, player_handle, pos_x, pos_y)
+        return zobrist.cell_key(self._width, self._height, self._qty_to_win, \
+                player_handle, pos_x * self._height + pos_y)
+
+    @property
+    def zobrist_hash(self):
+        """Returns Zobrist hash of the field (see `tttoe.zobrist`), equal to
+        the hash of `GameState` with the same bounded field. It's computed on
+        the first access, states made by `make_move` from a state with known
+        hash get their hash incrementally."""
+        if self._hash == None:
+            if self._width is None:
+                value = random.Random("zobrist:inf:%d" % \
+                        self._qty_to_win).getrandbits(64)
+            else:
+                value = zobrist.base_key(self._width, self._height, \
+                        self._qty_to_win)
+            for (x, y), handle in self._cells.items():
+                value ^= self._cell_key(handle, x, y)
+            self._hash = value
+        return self._hash
+
+    @property
+    def moves_count(self):
+        """Returns the number of occupied cells."""
+        return len(self._cells)
+
+    @property
+    def field(self):
+        """Returns the field as a list of lists (the same layout as
+        `GameState.field`). For an unbounded field the lists cover the
+        bounding box: `field[x][y]` is the cell (min_x + x, min_y + y). The
+        list is built on every call, changing it doesn't affect the state."""
+        if self._width is not None:
+            origin_x, origin_y = 0, 0
+            width, height = self._width, self._height
+        elif self._box is None:
+            return []
+        else:
+            origin_x, origin_y, max_x, max_y = self._box
+            width, height = max_x - origin_x + 1, max_y - origin_y + 1
+
+        field = [[None] * height for _ in range(width)]
+        for (x, y), handle in self._cells.items():
+            field[x - origin_x][y - origin_y] = handle
+        return field
+
+    @property
+    def pattern_scores(self):
+        """Returns dict {player_handle: score} of pattern scores or None.
+        See `GameState.pattern_scores`."""
+        return self._pattern_scores
+
+    def with_pattern_scores(self):
+        """Returns a copy of the state which tracks pattern scores. See
+        `GameState.with_pattern_scores`. Only the windows with stones are
+        visited."""
+        new_state = self._clone()
+        new_state._hash = self._hash
+        new_state._pattern_scores = self._field_scores()
+        return new_state
+
+    def _field_scores(self):
+        qty_to_win = self._qty_to_win
+        scores = dict((handle, 0) for handle in self._cells.values())
+        visited = set()
+        for pos_x, pos_y in self._cells:
+            for dir_x, dir_y in patterns.DIRECTIONS:
+                for back in range(qty_to_win):
+                    start_x = pos_x - dir_x * back
+                    start_y = pos_y - dir_y * back
+                    window = (start_x, start_y, dir_x, dir_y)
+                    if window in visited:
+                        continue
+                    visited.add(window)
+                    end_x = start_x + dir_x * (qty_to_win - 1)
+                    end_y = start_y + dir_y * (qty_to_win - 1)
+                    if not (self._inside(start_x, start_y) and \
+                            self._inside(end_x, end_y)):
+                        continue
+
+                    handles = set()
+                    stones = 0
+                    for step in range(qty_to_win):
+                        handle = self._cells.get((start_x + dir_x * step, \
+                                start_y + dir_y * step))
+                        if handle != None:
+                            handles.add(handle)
+                            stones += 1
+                    if len(handles) == 1:
+                        scores[handles.pop()] += patterns.window_score(stones)
+        return scores
+
+    def _line_cells(self, pos_x, pos_y, dir_x, dir_y):
+        """See `patterns.line_cells`."""
+        before = []
+        for step in range(1, self._qty_to_win):
+            x = pos_x - dir_x * step
+            y = pos_y - dir_y * step
+            if not self._inside(x, y):
+                break
+            before.append((x, y))
+        before.reverse()
+
+        cells = before + [(pos_x, pos_y)]
+        for step in range(1, self._qty_to_win):
+            x = pos_x + dir_x * step
+            y = pos_y + dir_y * step
+            if not self._inside(x, y):
+                break
+            cells.append((x, y))
+        return cells, len(before)
+
+    def _pattern_scores_after(self, pos_x, pos_y, player_handle):
+        gain = 0
+        loss = 0
+        for dir_x, dir_y in patterns.DIRECTIONS:
+            cells, center = self._line_cells(pos_x, pos_y, dir_x, dir_y)
+            owners = []
+            for cell in cells:
+                handle = self._cells.get(cell)
+                if handle == None:
+                    owners.append(patterns.EMPTY)
+                elif handle == player_handle:
+                    owners.append(patterns.MOVER)
+                else:
+                    owners.append(patterns.OTHER)
+
+            line_gain, line_loss = patterns.line_delta(owners, center, \
+                    self._qty_to_win)
+            gain += line_gain
+            loss += line_loss
+
+        return patterns.apply_move(self._pattern_scores, player_handle, \
+                gain, loss)
+
+    def all_available_moves(self):
+        """Generator on each possible move that can be perfoemed. Yields x and
+        y positions of possible steps (see the class docs for unbounded
+        fields)."""
+        if self._width is not None:
+            min_x, min_y = 0, 0
+            max_x, max_y = self._width - 1, self._height - 1
+        elif self._box is None:
+            yield 0, 0
+            return
+        else:
+            margin = self._qty_to_win - 1
+            min_x, min_y, max_x, max_y = self._box
+            min_x, min_y = min_x - margin, min_y - margin
+            max_x, max_y = max_x + margin, max_y + margin
+
+        cells = self._cells
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                if (x, y) not in cells:
+                    yield x, y
+
+    def random_playout(self, player_handles, rnd=random):
+        """Plays random moves until the game is over, returns the result.
+        See `GameState.random_playout`, the moves are made on the field built
+        by `field`. Games on unbounded fields never end, so they can't be
+        played out."""
+        if self._width is None:
+            raise ValueError("Games on unbounded fields can't be played out")
+        if self._last_move_result != "nothing":
+            return self._last_move_result
+
+        moves = list(self.all_available_moves())
+        rnd.shuffle(moves)
+        return play_out(self.field, self._qty_to_win, moves, player_handles)
+
+    def moves_near_stones(self, radius):
+        """Generator on possible moves which are not farther than `radius`
+        from any occupied cell. See `GameState.moves_near_stones` (the order
+        is the same). Yields (0, 0) on an empty unbounded field."""
+        if not self._cells:
+            if self._width is None:
+                yield 0, 0
+            else:
+                yield self._width // 2, self._height // 2
+            return
+
+        near = set()
+        for pos_x, pos_y in self._cells:
+            for x in range(pos_x - radius, pos_x + radius + 1):
+                for y in range(pos_y - radius, pos_y + radius + 1):
+                    near.add((x, y))
+
+        cells = self._cells
+        for x, y in sorted(near):
+            if (x, y) not in cells and self._inside(x, y):
+                yield x, y
+
+    def _makes_line(self, pos_x, pos_y, player_handle):
+        cells = self._cells
+        for dir_x, dir_y in _DIRECTIONS:
+            count = 1
+            for sign in (1, -1):
+                x = pos_x + dir_x * sign
+                y = pos_y + dir_y * sign
+                while cells.get((x, y)) == player_handle:
+                    count += 1
+                    x += dir_x * sign
+                    y += dir_y * sign
+            if count >= self._qty_to_win:
+                return True
+        return False
+
+    def is_winning_move(self, pos_x, pos_y, player_handle):
+        """Returns True if the move of the player to the empty (pos_x, pos_y)
+        cell makes a winning sequence. The state is not changed."""
+        return self._makes_line(pos_x, pos_y, player_handle)
+
+    def make_move(self, pos_x, pos_y, player_handle):
+        """Makes move and returns new state as a result. See
+        `GameState.make_move` for the arguments and the result."""
+        self._validate_move(pos_x, pos_y, player_handle)
+
+        new_state = self._clone()
+        new_state._hash = self._hash
+        new_state._place(pos_x, pos_y, player_handle)
+        return new_state
+
+    def apply_move(self, pos_x, pos_y, player_handle):
+        """Makes the move in place. See `GameState.apply_move`."""
+        self._validate_move(pos_x, pos_y, player_handle)
+
+        self._move_stack.append((pos_x, pos_y, self._box, \
+                self._last_move_result, self._hash, self._pattern_scores))
+        self._place(pos_x, pos_y, player_handle)
+
+    def undo_move(self):
+        """Takes back the last move made by `apply_move`. See
+        `GameState.undo_move`."""
+        if not self._move_stack:
+            raise ValueError("There are no applied moves to undo")
+
+        pos_x, pos_y, self._box, self._last_move_result, self._hash, \
+                self._pattern_scores = self._move_stack.pop()
+        del self._cells[(pos_x, pos_y)]
+        if self._empty_count is not None:
+            self._empty_count += 1
+
+    def _validate_move(self, pos_x, pos_y, player_handle):
+        if player_handle in ("nothing", "draw"):
+            raise ValueError("\"nothing\" and \"draw\" hanles are reserved")
+
+        if not self._inside(pos_x, pos_y):
+            raise ValueError("The cell (%d, %d) is out of the field " \
+                    "(width: %d, height: %d)" % (pos_x, pos_y, self._width, \
+                    self._height))
+
+        if (pos_x, pos_y) in self._cells:
+            raise ValueError("The value in the cell (%d, %d) is already set" % \
+                    (pos_x, pos_y))
+
+    def _place(self, pos_x, pos_y, player_handle):
+        """puts the player's handle to the empty cell, updates the hash, the
+        scores and the result of the move"""
+        if self._pattern_scores != None:
+            self._pattern_scores = self._pattern_scores_after(pos_x, pos_y, \
+                    player_handle)
+        if self._hash != None:
+            self._hash ^= self._cell_key(player_handle, pos_x, pos_y)
+        self._set_cell(pos_x, pos_y, player_handle)
+
+        if self._makes_line(pos_x, pos_y, player_handle):
+            self._last_move_result = player_handle
+        elif self._empty_count == 0:
+            self._last_move_result = "draw"
+        else:
+            self._last_move_result = "nothing"
+
+    @property
+    def last_move_result(self):
+        """Returns the result of the previous move. See
+        `GameState.last_move_result`."""
+        return self._last_move_result
@@ -0,0 +1,153 @@
+"""
+This module implements symmetries of tictactoe fields.
+
+A square field has 8 symmetries (rotations by 0, 90, 180, 270 degrees and 4
+reflections), a rectangular field has 4 (identity, two reflections and the
+rotation by 180 degrees). Positions which are mapped to each other by a
+symmetry are equivalent: the game result is the same, and the best moves are
+mapped by the same symmetry.
+
+`transforms` returns the symmetries of the field, `canonical_form` returns the
+same key for all equivalent positions (and the transform which maps the
+position to its canonical form), `stabilizer` returns the symmetries which
+don't change the position (moves mapped to each other by them are equivalent).
+"""
+
+class Transform:
+    """Symmetry of a field: maps the (x, y) cell to
+    (xx * x + xy * y + xc, yx * x + yy * y + yc).
+
+    Example usage:
+
+    transform = transforms(3, 3)[1] # rotation by 90 degrees
+    transform.apply(0, 0)   # returns (2, 0)
+    transform.invert(2, 0)  # returns (0, 0)
+    """
+
+    def __init__(self, name, width, height, coefficients):
+        self.name = name
+        self._width = width
+        self._height = height
+        self._coefficients = coefficients
+
+        cells_count = width * height
+        perm = [None] * cells_count
+        for x in range(width):
+            for y in range(height):
+                new_x, new_y = self.apply(x, y)
+                perm[x * height + y] = new_x * height + new_y
+        self.perm = tuple(perm)
+
+        inverse_perm = [None] * cells_count
+        for cell, new_cell in enumerate(perm):
+            inverse_perm[new_cell] = cell
+        self.inverse_perm = tuple(inverse_perm)
+
+    def apply(self, pos_x, pos_y):
+        """maps the cell"""
+        xx, xy, xc, yx, yy, yc = self._coefficients
+        return xx * pos_x + xy * pos_y + xc, yx * pos_x + yy * pos_y + yc
+
+    def invert(self, pos_x, pos_y):
+        """maps the cell back (applies the inverse transform)"""
+        cell = self.inverse_perm[pos_x * self._height + pos_y]
+        return cell // self._height, cell % self._height
+
+    def is_identity(self):
+        """returns True if the transform doesn't move cells"""
+        return self.perm == tuple(range(len(self.perm)))
+
+_transforms_cache = dict()
+
+def transforms(width, height):
+    """Returns the list of `Transform` symmetries of the field, the identity
+    goes first."""
+    key = (width, height)
+    result = _transforms_cache.get(key)
+    if result is not None:
+        return result
+
+    max_x = width - 1
+    max_y = height - 1
+    definitions = [
+        ("identity", (1, 0, 0, 0, 1, 0)),
+        ("flip_x", (-1, 0, max_x, 0, 1, 0)),
+        ("flip_y", (1, 0, 0, 0, -1, max_y)),
+        ("rotate_180", (-1, 0, max_x, 0, -1, max_y))
+    ]
+    if width == height:
+        definitions[1:1] = [("rotate_90", (0, -1, max_y, 1, 0, 0))]
+        definitions += [
+            ("rotate_270", (0, 1, 0, -1, 0, max_x)),
+            ("transpose", (0, 1, 0, 1, 0, 0)),
+            ("anti_transpose", (0, -1, max_y, -1, 0, max_x))
+        ]
+
+    result = [Transform(name, width, height, coefficients) \
+            for name, coefficients in definitions]
+    _transforms_cache[key] = result
+    return result
+
+def _occupied_cells(state):
+    """returns list of (cell, handle) tuples of the state"""
+    height = state.height
+    if hasattr(state, "occupied_cells"):
+        # Sparse states list their stones without scanning the field.
+        return [(x * height + y, handle) \
+                for x, y, handle in state.occupied_cells()]
+
+    field = state.field
+    cells = []
+    for x, column in enumerate(field):
+        for y, handle in enumerate(column):
+            if handle != None:
+                cells.append((x * height + y, handle))
+    return cells
+
+def canonical_form(state, handles=None):
+    """Returns (key, transform) tuple. The key is equal for all positions
+    which are symmetric to each other, and different for other positions. The
+    transform maps the state to its canonical form (so the moves found for the
+    canonical form can be mapped back by `transform.invert`).
+
+    The key is a tuple of masks of the cells of every handle from `handles`
+    (all handles used in the state, sorted, by default) after the transform.
+    """
+    cells = _occupied_cells(state)
+    if handles is None:
+        handles = sorted(set(handle for _, handle in cells))
+    handle_indexes = dict((handle, index) for index, handle in enumerate(handles))
+
+    best_key = None
+    best_transform = None
+    for transform in transforms(state.width, state.height):
+        perm = transform.perm
+        masks = [0] * len(handles)
+        for cell, handle in cells:
+            masks[handle_indexes[handle]] |= 1 << perm[cell]
+        key = tuple(masks)
+        if best_key is None or key < best_key:
+            best_key = key
+            best_transform = transform
+
+    return best_key, best_transform
+
+def stabilizer(state):
+    """Returns the list of transforms (except the identity) which map the
+    state to itself. The moves mapped to each other by these transforms lead
+    to equivalent positions. Unbounded fields (`width` is None) have no
+    symmetries."""
+    if state.width is None:
+        return []
+    cells = _occupied_cells(state)
+    owners = dict(cells)
+
+    result = []
+    for transform in transforms(state.width, state.height)[1:]:
+        perm = transform.perm
+        for cell, handle in cells:
+            if owners.get(perm[cell]) != handle:
+                break
+        else:
+            result.append(transform)
+    return result
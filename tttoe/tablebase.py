@@ -0,0 +1,206 @@
+"""
+This module implements precomputed perfect-play tables for small fields.
+
+`build` enumerates all positions reachable from the empty field of the
+specified geometry, solves them and writes the best move of every
+non-terminal position to a file. `Tablebase` reads the file (it's
+memory-mapped, so many processes share it through the page cache) and looks
+up the best move in microseconds instead of searching it.
+
+Positions are stored once for all symmetric positions (see `tttoe.symmetry`)
+and relative to the player to move (cells of the player to move and of the
+other player), so the table doesn't depend on player handles and on who
+started the game.
+
+File format (all numbers are little-endian):
+
+    header -- magic b"TTTB", format version, width, height, qty_to_win
+        (one byte each) and the number of positions (4 bytes);
+    keys -- sorted codes of canonical positions (8 bytes each). The code is
+        a number in base 3, the digit of a cell is 0 for an empty cell, 1 for
+        the cell of the player to move and 2 for the cell of the other one;
+    moves -- cell numbers (x * height + y) of the best moves in canonical
+        positions (1 byte each, in the same order as keys).
+
+Build a table from the command line:
+
+    python -m tttoe.tablebase 3 3 3 tablebases/3x3x3.tb
+"""
+
+import mmap
+import os
+import struct
+import sys
+
+from tttoe import symmetry
+from tttoe.bitboard_gamestate import BitboardGameState
+
+_MAGIC = b"TTTB"
+_VERSION = 1
+_HEADER = struct.Struct("<4sBBBBI")
+_KEY = struct.Struct("<Q")
+_MAX_CELLS = 40 # 3 ** 40 < 2 ** 64
+
+_WIN_SCORE = 1000
+
+def canonical_code(state, player_handle):
+    """Returns (code, transform) tuple: the smallest code of the position
+    among all its symmetric positions (for the player to move
+    `player_handle`), and the transform which maps the position to the
+    canonical one (see `tttoe.symmetry.canonical_form`)."""
+    digits = []
+    height = state.height
+    for x, column in enumerate(state.field):
+        for y, handle in enumerate(column):
+            if handle != None:
+                digits.append((x * height + y, \
+                        1 if handle == player_handle else 2))
+
+    best_code = None
+    best_transform = None
+    for transform in symmetry.transforms(state.width, state.height):
+        perm = transform.perm
+        code = 0
+        for cell, digit in digits:
+            code += digit * 3 ** perm[cell]
+        if best_code is None or code < best_code:
+            best_code = code
+            best_transform = transform
+
+    return best_code, best_transform
+
+def _solve(state, player_handle, other_handle, table):
+    """Negamax over all positions. Returns the score of the position for the
+    player to move (positive - win, the faster the higher; negative - loss;
+    0 - draw), fills `table` {code: (score, canonical best cell)}."""
+    code, transform = canonical_code(state, player_handle)
+    known = table.get(code)
+    if known is not None:
+        return known[0]
+
+    best_score = None
+    best_move = None
+    for pos_x, pos_y in state.all_available_moves():
+        new_state = state.make_move(pos_x, pos_y, player_handle)
+        result = new_state.last_move_result
+        if result == player_handle:
+            score = _WIN_SCORE
+        elif result == "draw":
+            score = 0
+        else:
+            score = -_solve(new_state, other_handle, player_handle, table)
+            # Prefer faster wins and slower losses.
+            score -= 1 if score > 0 else -1 if score < 0 else 0
+
+        if best_score is None or score > best_score:
+            best_score = score
+            best_move = (pos_x, pos_y)
+
+    new_x, new_y = transform.apply(*best_move)
+    table[code] = (best_score, new_x * state.height + new_y)
+    return best_score
+
+def build(width, height, qty_to_win, path):
+    """Solves all positions reachable from the empty field and writes the
+    table to the file. Returns the number of stored positions."""
+    if width * height > _MAX_CELLS:
+        raise ValueError("Fields with more than %d cells are not supported" % \
+                _MAX_CELLS)
+
+    table = dict()
+    _solve(BitboardGameState(width, height, qty_to_win), "a", "b", table)
+
+    codes = sorted(table)
+    with open(path, "wb") as output:
+        output.write(_HEADER.pack(_MAGIC, _VERSION, width, height, \
+                qty_to_win, len(codes)))
+        for code in codes:
+            output.write(_KEY.pack(code))
+        output.write(bytes(table[code][1] for code in codes))
+
+    return len(codes)
+
+class Tablebase:
+    """Memory-mapped table of best moves built by `build`.
+
+    Example usage:
+
+    tablebase = Tablebase("tablebases/3x3x3.tb")
+    tablebase.lookup(game_state, "host") # returns (x, y) of the best move
+                                         # or None if there is no such
+                                         # position in the table.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as input_file:
+            self._data = mmap.mmap(input_file.fileno(), 0, \
+                    access=mmap.ACCESS_READ)
+
+        magic, version, width, height, qty_to_win, count = \
+                _HEADER.unpack_from(self._data, 0)
+        if magic != _MAGIC or version != _VERSION:
+            self._data.close()
+            raise ValueError("\"%s\" is not a tablebase file" % path)
+
+        self.width = width
+        self.height = height
+        self.qty_to_win = qty_to_win
+        self._count = count
+        self._keys_offset = _HEADER.size
+        self._moves_offset = self._keys_offset + count * _KEY.size
+
+    def __len__(self):
+        return self._count
+
+    def _find(self, code):
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            key = _KEY.unpack_from(self._data, \
+                    self._keys_offset + middle * _KEY.size)[0]
+            if key < code:
+                low = middle + 1
+            elif key > code:
+                high = middle
+            else:
+                return middle
+        return None
+
+    def lookup(self, state, player_handle):
+        """Returns (x, y) of the best move of the player in the state, or
+        None if the table has no such position (other geometry, the position
+        is terminal or unreachable)."""
+        if (state.width, state.height, state.qty_to_win) != \
+                (self.width, self.height, self.qty_to_win):
+            return None
+
+        code, transform = canonical_code(state, player_handle)
+        index = self._find(code)
+        if index is None:
+            return None
+
+        cell = self._data[self._moves_offset + index]
+        return transform.invert(cell // self.height, cell % self.height)
+
+    def close(self):
+        """unmaps the file"""
+        self._data.close()
+
+def main(args):
+    if len(args) != 4:
+        print("usage: python -m tttoe.tablebase WIDTH HEIGHT QTY_TO_WIN PATH")
+        return 1
+
+    width, height, qty_to_win = [int(arg) for arg in args[:3]]
+    path = args[3]
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    count = build(width, height, qty_to_win, path)
+    print("%d positions written to %s" % (count, path))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,299 @@
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+import minimax
+from tttoe.aiplayer import AIPlayer
+from tttoe.game import Game
+from tttoe.bitboard_gamestate import BitboardGameState
+from tttoe.minimax_strategy import MinimaxStrategy
+from tttoe.threat_search import ThreatSearch
+
+class IOLoopStub:
+    def __init__(self):
+        self.futures = []
+        self.callbacks = []
+        self.callbacks_run = 0
+
+    def add_future(self, future, callback):
+        self.futures.append((future, callback))
+
+    def add_callback(self, callback, *args):
+        self.callbacks.append((callback, args))
+
+    def run_callback(self):
+        callback, args = self.callbacks.pop(0)
+        self.callbacks_run += 1
+        callback(*args)
+
+    def run(self):
+        while self.futures or self.callbacks:
+            if self.callbacks:
+                self.run_callback()
+                continue
+            future, callback = self.futures.pop(0)
+            if not future.cancelled():
+                future.result(timeout=60)
+            callback(future)
+
+class SocketStub:
+    def __init__(self):
+        self.messages = []
+
+    def write_message(self, message):
+        self.messages.append(message)
+
+def test_ai_vs_ai_game_is_draw():
+    game = Game(3, 3, 3, "host", "x", state_class=BitboardGameState)
+    ai_1 = AIPlayer(game)
+    AIPlayer(game)
+    ai_1.make_move()
+
+    assert game.is_over
+    assert game.game_state.last_move_result == "draw"
+
+def test_executor_and_io_loop_provided_together():
+    game = Game(3, 3, 3, "host", "x")
+    with pytest.raises(ValueError) as excinfo:
+        AIPlayer(game, io_loop=IOLoopStub())
+    assert str(excinfo.value) == "executor and io_loop should be provided " \
+            "together"
+
+def test_ai_vs_ai_game_in_executor():
+    io_loop = IOLoopStub()
+    with ProcessPoolExecutor(2) as executor:
+        game = Game(3, 3, 3, "host", "x")
+        ai_1 = AIPlayer(game, executor=executor, io_loop=io_loop, \
+                worker_transposition_table_entries=1000)
+        AIPlayer(game, executor=executor, io_loop=io_loop)
+        ai_1.make_move()
+        assert game.game_state.last_move_result == "nothing"
+
+        io_loop.run()
+
+    assert game.is_over
+    assert game.game_state.last_move_result == "draw"
+
+def test_stats_callback():
+    reports = []
+    game = Game(3, 3, 3, "host", "x", state_class=BitboardGameState)
+    ai_1 = AIPlayer(game, stats_callback=lambda ai, stats: \
+            reports.append((ai.player_handle, stats)))
+    AIPlayer(game)
+    ai_1.make_move()
+
+    assert len(reports) == 5
+    assert all(handle == "host" for handle, _ in reports)
+    assert reports[0][1].nodes > reports[-1][1].nodes > 0
+
+def test_stats_callback_in_executor():
+    reports = []
+    io_loop = IOLoopStub()
+    with ProcessPoolExecutor(1) as executor:
+        game = Game(3, 3, 3, "host", "x")
+        ai = AIPlayer(game, executor=executor, io_loop=io_loop, \
+                stats_callback=lambda ai, stats: reports.append(stats))
+        ai.make_move()
+        io_loop.run()
+
+    assert len(reports) == 1
+    assert reports[0].nodes > 0
+    assert sum(column.count("host") for column in game.game_state.field) == 1
+
+def test_stale_move_is_not_performed():
+    io_loop = IOLoopStub()
+    with ProcessPoolExecutor(1) as executor:
+        game = Game(3, 3, 3, "host", "x")
+        ai = AIPlayer(game, executor=executor, io_loop=io_loop)
+        ai.make_move()
+        game.perform_move("opponent", 1, 1)
+        io_loop.run()
+
+    # The first search is dropped, the AI responds to the opponent's move
+    # only once.
+    cells = [handle for column in game.game_state.field for handle in column]
+    assert cells.count("host") == 1
+    assert cells.count("opponent") == 1
+    assert game.game_state.field[1][1] == "opponent"
+
+def test_bitboard_state_pickling():
+    state = BitboardGameState(3, 3, 3).make_move(0, 0, "host")
+    state = state.make_move(1, 1, "opponent")
+
+    restored = pickle.loads(pickle.dumps(state))
+    assert restored.field == state.field
+    assert restored.zobrist_hash == state.zobrist_hash
+    assert restored.make_move(0, 1, "host").make_move(2, 2, "opponent") \
+            .make_move(0, 2, "host").last_move_result == "host"
+
+def test_ai_vs_ai_game_with_time_budget():
+    game = Game(3, 3, 3, "host", "x", state_class=BitboardGameState)
+    ai_1 = AIPlayer(game, time_budget=1)
+    AIPlayer(game, time_budget=1)
+    ai_1.make_move()
+
+    assert game.game_state.last_move_result == "draw"
+
+def test_threat_search_before_search():
+    game = Game(15, 15, 5, "host", "x")
+    for (pos_x, pos_y), handle in [((5, 7), "host"), ((0, 0), "opponent"), \
+            ((6, 7), "host"), ((14, 0), "opponent"), ((7, 5), "host"), \
+            ((0, 14), "opponent"), ((7, 6), "host"), ((14, 14), "opponent")]:
+        game.game_state = game.game_state.make_move(pos_x, pos_y, handle)
+    reports = []
+    ai = AIPlayer(game, strategy=MinimaxStrategy(max_depth=1), \
+            threat_search=ThreatSearch(), \
+            stats_callback=lambda ai, stats: reports.append(stats))
+    ai.make_move()
+
+    # two open threes at once, the search isn't run
+    assert game.game_state.field[7][7] == "host"
+    assert reports == []
+
+def test_solved_moves():
+    # the first player wins 3 in a row on 4x4 field, the shallow search
+    # doesn't see it
+    game = Game(4, 4, 3, "host", "x", state_class=BitboardGameState)
+    ai_1 = AIPlayer(game, strategy=MinimaxStrategy(max_depth=1, \
+            skip_symmetric=True), solve_nodes=100000)
+    AIPlayer(game, strategy=MinimaxStrategy(max_depth=3, order_moves=True))
+    ai_1.make_move()
+
+    assert game.game_state.last_move_result == "host"
+
+def test_solved_moves_in_executor():
+    io_loop = IOLoopStub()
+    with ProcessPoolExecutor(1) as executor:
+        game = Game(3, 3, 3, "host", "x")
+        ai_1 = AIPlayer(game, executor=executor, io_loop=io_loop, \
+                strategy=MinimaxStrategy(max_depth=0), solve_nodes=100000)
+        AIPlayer(game, executor=executor, io_loop=io_loop, \
+                strategy=MinimaxStrategy(max_depth=0), solve_nodes=100000)
+        ai_1.make_move()
+        io_loop.run()
+
+    assert game.game_state.last_move_result == "draw"
+
+def test_monte_carlo_searcher():
+    searcher = minimax.MCTSearcher(processes=0, iterations=1000, seed=1)
+    game = Game(3, 3, 3, "host", "x", state_class=BitboardGameState)
+    ai_1 = AIPlayer(game, parallel_searcher=searcher)
+    AIPlayer(game, strategy=MinimaxStrategy(max_depth=9))
+    ai_1.make_move()
+
+    assert game.game_state.last_move_result == "draw"
+    # the tree of the previous move is reused
+    assert len(searcher._trees) == 1
+
+def test_slice_nodes_needs_io_loop():
+    game = Game(3, 3, 3, "host", "x")
+    with pytest.raises(ValueError):
+        AIPlayer(game, slice_nodes=100)
+    with ProcessPoolExecutor(1) as executor:
+        with pytest.raises(ValueError):
+            AIPlayer(game, executor=executor, io_loop=IOLoopStub(), \
+                    slice_nodes=100)
+
+def test_ai_vs_ai_game_by_slices():
+    reports = []
+    io_loop = IOLoopStub()
+    game = Game(3, 3, 3, "host", "x", state_class=BitboardGameState)
+    ai_1 = AIPlayer(game, io_loop=io_loop, slice_nodes=50, \
+            strategy=MinimaxStrategy(max_depth=9), \
+            stats_callback=lambda ai, stats: reports.append(stats))
+    AIPlayer(game, io_loop=io_loop, slice_nodes=50, \
+            strategy=MinimaxStrategy(max_depth=9))
+    ai_1.make_move()
+    assert game.game_state.moves_count == 0
+
+    # the search doesn't change the state of the game between slices
+    io_loop.run_callback()
+    assert game.game_state.moves_count == 0
+
+    io_loop.run()
+    assert game.game_state.last_move_result == "draw"
+    assert io_loop.callbacks_run > 9
+    assert len(reports) == 5
+    assert reports[0].nodes > 50
+    assert reports[0].completed_depth == 9
+
+def test_ai_vs_ai_game_by_slices_with_time_budget():
+    io_loop = IOLoopStub()
+    game = Game(3, 3, 3, "host", "x")
+    ai_1 = AIPlayer(game, io_loop=io_loop, slice_nodes=50, time_budget=1)
+    AIPlayer(game, io_loop=io_loop, slice_nodes=50, time_budget=1)
+    ai_1.make_move()
+    io_loop.run()
+
+    assert game.game_state.last_move_result == "draw"
+
+class TrackedScoresStrategy(MinimaxStrategy):
+    def heuristic(self, state):
+        # the scores aren't recomputed for the whole field at every leaf
+        assert state.pattern_scores is not None
+        return MinimaxStrategy.heuristic(self, state)
+
+def test_sliced_search_tracks_pattern_scores():
+    io_loop = IOLoopStub()
+    game = Game(5, 5, 4, "host", "x", state_class=BitboardGameState)
+    ai = AIPlayer(game, io_loop=io_loop, slice_nodes=50, \
+            strategy=TrackedScoresStrategy(max_depth=2, \
+            evaluate_patterns=True))
+    ai.make_move()
+    io_loop.run()
+
+    assert game.game_state.moves_count == 1
+    assert game.game_state.pattern_scores is None
+
+def test_search_cancelled_when_player_left():
+    io_loop = IOLoopStub()
+    game = Game(5, 5, 4, "host", "x", state_class=BitboardGameState)
+    ai = AIPlayer(game, io_loop=io_loop, slice_nodes=10, \
+            strategy=MinimaxStrategy(max_depth=6))
+    game.append_player(SocketStub())
+    ai.make_move()
+    io_loop.run_callback()
+    io_loop.run_callback()
+
+    game.player_left("opponent")
+    io_loop.run()
+    assert io_loop.callbacks_run == 3
+    assert game.game_state.moves_count == 0
+
+def test_search_not_cancelled_when_spectator_left():
+    io_loop = IOLoopStub()
+    game = Game(3, 3, 3, "host", "x", state_class=BitboardGameState)
+    ai = AIPlayer(game, io_loop=io_loop, slice_nodes=10, \
+            strategy=MinimaxStrategy(max_depth=9))
+    game.append_player(SocketStub())
+    spectator = game.append_player(SocketStub())
+    ai.make_move()
+    io_loop.run_callback()
+
+    game.player_left(spectator)
+    io_loop.run()
+    assert game.game_state.moves_count == 1
+
+def test_queued_search_cancelled_when_player_left():
+    io_loop = IOLoopStub()
+    with ProcessPoolExecutor(1) as executor:
+        game = Game(3, 3, 3, "host", "x")
+        ai = AIPlayer(game, executor=executor, io_loop=io_loop)
+        game.append_player(SocketStub())
+        ai.make_move()
+        game.player_left("opponent")
+        io_loop.run()
+
+    assert game.game_state.moves_count == 0
+
+def test_solved_moves_by_slices():
+    io_loop = IOLoopStub()
+    game = Game(4, 4, 3, "host", "x", state_class=BitboardGameState)
+    ai_1 = AIPlayer(game, io_loop=io_loop, slice_nodes=100, \
+            strategy=MinimaxStrategy(max_depth=1, skip_symmetric=True), \
+            solve_nodes=100000)
+    AIPlayer(game, strategy=MinimaxStrategy(max_depth=3, order_moves=True))
+    ai_1.make_move()
+    io_loop.run()
+
+    assert game.game_state.last_move_result == "host"
+    assert io_loop.callbacks_run > 3
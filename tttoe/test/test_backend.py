@@ -0,0 +1,195 @@
+import queue
+import time
+from multiprocessing import AuthenticationError
+import pytest
+from tttoe.backend import LocalBackend, Hub, HubBackend, PublishedGame, \
+        RemoteGame
+from tttoe.game import Game
+
+class SocketStub:
+    def __init__(self):
+        self.messages = []
+        self.closed = False
+
+    def write_message(self, msg):
+        self.messages.append(msg)
+
+    def close(self):
+        self.closed = True
+
+    @property
+    def events(self):
+        return [msg["event"] for msg in self.messages]
+
+@pytest.fixture
+def hub(request):
+    hub = Hub(b"test")
+    hub.start()
+    request.addfinalizer(hub.close)
+    return hub
+
+def make_hub_backend(hub, request):
+    backend = HubBackend(hub.address, b"test")
+    request.addfinalizer(backend.close)
+    return backend
+
+def test_local_backend_publish():
+    backend = LocalBackend()
+    received = []
+    backend.subscribe("channel", received.append)
+    backend.publish("channel", dict(value=1))
+    backend.publish("other", dict(value=2))
+    assert received == [dict(value=1)]
+
+    backend.unsubscribe("channel", received.append)
+    backend.publish("channel", dict(value=3))
+    assert received == [dict(value=1)]
+
+def test_local_backend_games():
+    backend = LocalBackend()
+    backend.register_game("id")
+    assert backend.has_game("id").result(timeout=5)
+    backend.unregister_game("id")
+    assert not backend.has_game("id").result(timeout=5)
+
+def test_remote_game():
+    backend = LocalBackend()
+    game = Game(3, 3, 3, "host", "x")
+    host = SocketStub()
+    game.append_player(host)
+    published = PublishedGame(backend, game)
+    assert backend.has_game(game.game_id).result(timeout=5)
+
+    opponent = SocketStub()
+    remote_game = RemoteGame(backend, game.game_id)
+    remote_game.append_player(opponent)
+    assert opponent.events == ["setup"]
+    setup = opponent.messages[0]
+    assert setup["data"]["player_handle"] == "opponent"
+    assert setup["data"]["signs_map"] == dict(host="x", opponent="o")
+    assert host.events == ["playerjoined"]
+
+    game.perform_move("host", 0, 0)
+    assert opponent.messages[-1]["data"] == \
+            dict(player_handle="host", x=0, y=0)
+    assert opponent.messages[-1].seq == 1
+
+    remote_game.perform_move(None, 1, 1)
+    assert game.game_state.field[1][1] == "opponent"
+    assert host.messages[-1]["event"] == "move"
+
+    remote_game.send_snapshot(None)
+    assert opponent.messages[-1]["event"] == "sync"
+    assert opponent.messages[-1].seq == 2
+
+    remote_game.player_left(None)
+    assert "opponent" not in game.players
+    assert host.messages[-1]["event"] == "playerleft"
+
+    published.close()
+    assert not backend.has_game(game.game_id).result(timeout=5)
+
+def test_remote_player_close():
+    backend = LocalBackend()
+    game = Game(3, 3, 3, "host", "x")
+    game.append_player(SocketStub())
+    PublishedGame(backend, game)
+
+    opponent = SocketStub()
+    RemoteGame(backend, game.game_id).append_player(opponent)
+    game.players["opponent"].close()
+    assert opponent.closed
+
+def test_hub_backend_publish(hub, request):
+    first = make_hub_backend(hub, request)
+    second = make_hub_backend(hub, request)
+    received = queue.Queue()
+    second.subscribe("channel", received.put)
+    # the subscription is sent before has_game, so the hub has it after the
+    # reply
+    assert not second.has_game("id").result(timeout=5)
+
+    first.publish("channel", dict(value=1))
+    assert received.get(timeout=5) == dict(value=1)
+
+    first.register_game("id")
+    assert second.has_game("id").result(timeout=5)
+    first.close()
+    # games of disconnected processes are unregistered
+    for _ in range(50):
+        if not second.has_game("id").result(timeout=5):
+            break
+        time.sleep(0.01)
+    assert not second.has_game("id").result(timeout=5)
+
+def test_hub_remote_game(hub, request):
+    owner_backend = make_hub_backend(hub, request)
+    player_backend = make_hub_backend(hub, request)
+    commands = queue.Queue()
+
+    game = Game(3, 3, 3, "host", "x")
+    host = SocketStub()
+    game.append_player(host)
+    published = PublishedGame(owner_backend, game)
+    # commands are executed by the test thread (like by the io_loop)
+    owner_backend.unsubscribe("game:%s" % game.game_id, published._on_command)
+    owner_backend.subscribe("game:%s" % game.game_id, commands.put)
+    # requests of one process are handled in order, of different processes
+    # in any order
+    assert owner_backend.has_game(game.game_id).result(timeout=5)
+    assert player_backend.has_game(game.game_id).result(timeout=5)
+
+    class QueueSocket(SocketStub):
+        def __init__(self):
+            SocketStub.__init__(self)
+            self.received = queue.Queue()
+
+        def write_message(self, msg):
+            SocketStub.write_message(self, msg)
+            self.received.put(msg)
+
+    opponent = QueueSocket()
+    remote_game = RemoteGame(player_backend, game.game_id)
+    remote_game.append_player(opponent)
+    published._on_command(commands.get(timeout=5))
+    setup = opponent.received.get(timeout=5)
+    assert setup["event"] == "setup"
+    assert setup["data"]["player_handle"] == "opponent"
+
+    remote_game.perform_move(None, 2, 2)
+    published._on_command(commands.get(timeout=5))
+    assert game.game_state.field[2][2] == "opponent"
+
+    game.perform_move("host", 0, 0)
+    move = opponent.received.get(timeout=5)
+    assert move["event"] == "move"
+    assert move.seq == 2
+
+def test_hub_replies_matched_to_requests(hub, request):
+    first = make_hub_backend(hub, request)
+    second = make_hub_backend(hub, request)
+    first.register_game("a")
+    # the registration is handled by the hub before the reply
+    assert first.has_game("a").result(timeout=5)
+
+    futures = [(game_id, second.has_game(game_id)) \
+            for game_id in ["a", "b", "a", "c"] * 10]
+    assert [future.result(timeout=5) for _, future in futures] == \
+            [game_id == "a" for game_id, _ in futures]
+
+    # a reply nobody waits for is dropped
+    second._connection.send(("has_game", -1, "a"))
+    assert not second.has_game("b").result(timeout=5)
+    assert second.has_game("a").result(timeout=5)
+
+def test_has_game_fails_when_hub_closed(hub, request):
+    backend = make_hub_backend(hub, request)
+    backend.close()
+    # the hub doesn't read requests after "close", the request fails when
+    # the hub closes the connection (or it's sent to the closed one)
+    with pytest.raises((EOFError, OSError)):
+        backend.has_game("id").result(timeout=5)
+
+def test_hub_rejects_wrong_authkey(hub):
+    with pytest.raises(AuthenticationError):
+        HubBackend(hub.address, b"wrong")
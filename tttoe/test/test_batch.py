@@ -0,0 +1,67 @@
+import random
+import pytest
+from tttoe.gamestate import GameState
+from tttoe.minimax_strategy import MinimaxStrategy
+from tttoe import patterns
+
+numpy = pytest.importorskip("numpy")
+from tttoe import batch
+
+def random_states(width, height, qty_to_win, count, seed):
+    rnd = random.Random(seed)
+    states = []
+    for _ in range(count):
+        state = GameState(width, height, qty_to_win)
+        handles = ["host", "opponent"]
+        moves_count = rnd.randint(0, width * height)
+        while state.last_move_result == "nothing" and \
+                state.moves_count < moves_count:
+            pos_x, pos_y = rnd.choice(list(state.all_available_moves()))
+            state = state.make_move(pos_x, pos_y, handles[0])
+            handles.reverse()
+        states.append(state)
+    return states
+
+def test_to_array():
+    state = GameState(3, 2, 2).make_move(0, 1, "host").make_move(2, 0, \
+            "opponent")
+    boards = batch.to_array([state])
+    assert boards.dtype == numpy.int8
+    assert boards.tolist() == [[[0, 1], [0, 0], [-1, 0]]]
+
+def test_to_array_validates_sizes():
+    with pytest.raises(ValueError):
+        batch.to_array([GameState(3, 3, 3), GameState(4, 3, 3)])
+    with pytest.raises(ValueError):
+        batch.to_array([])
+
+def test_window_counts():
+    state = GameState(4, 3, 3).make_move(1, 2, "host").make_move(2, 1, "host")
+    host, opponent = batch.window_counts(batch.to_array([state]), 3, 1, -1)
+    # Windows of the (1, -1) direction start at (0, 2) and (1, 2).
+    assert host.tolist() == [[[0], [2]]]
+    assert opponent.tolist() == [[[0], [0]]]
+
+def test_same_results_and_scores_as_game_state():
+    for width, height, qty_to_win in [(3, 3, 3), (5, 4, 3), (6, 6, 4), \
+            (2, 5, 3)]:
+        states = random_states(width, height, qty_to_win, 60, width * height)
+        boards = batch.to_array(states)
+
+        assert batch.result_names(batch.results(boards, qty_to_win)) == \
+                [state.last_move_result for state in states]
+
+        expected_scores = []
+        for state in states:
+            scores = patterns.field_scores(state.field, width, height, \
+                    qty_to_win)
+            expected_scores.append(scores.get("host", 0) - \
+                    scores.get("opponent", 0))
+        assert batch.pattern_scores(boards, qty_to_win).tolist() == \
+                expected_scores
+
+def test_same_heuristic_as_strategy():
+    strategy = MinimaxStrategy(evaluate_patterns=True)
+    states = random_states(7, 7, 4, 40, 3)
+    assert batch.heuristic(batch.to_array(states), 4).tolist() == \
+            [strategy.heuristic(state) for state in states]
@@ -0,0 +1,197 @@
+import random
+import pytest
+from tttoe.gamestate import GameState
+from tttoe.bitboard_gamestate import BitboardGameState, _Geometry
+
+def test_init_default_last_step_result():
+    state = BitboardGameState(3, 3, 2)
+    assert state.last_move_result == "nothing"
+
+def test_field():
+    field = [[None, "a", None, "b"],
+             ["a", "b", "b", None],
+             [None, None, None, None]]
+    state = BitboardGameState(3, 4, 3, field=field)
+    assert state.field == field
+
+    state.field[0][0] = "a"
+    assert state.field == field
+
+def test_occupied_cells():
+    field = [[None, "a", None, "b"],
+             ["a", "b", "b", None],
+             [None, None, None, None]]
+    state = BitboardGameState(3, 4, 3, field=field)
+    assert sorted(state.occupied_cells()) == [(0, 1, "a"), (0, 3, "b"), \
+            (1, 0, "a"), (1, 1, "b"), (1, 2, "b")]
+    assert list(BitboardGameState(3, 3, 3).occupied_cells()) == []
+
+def test_geometry_cache_is_bounded():
+    state = BitboardGameState(3, 3, 3).make_move(0, 0, "x")
+    for width in range(4, 4 + _Geometry._MAX_CACHED + 5):
+        BitboardGameState(width, 3, 3)
+    assert len(_Geometry._cache) == _Geometry._MAX_CACHED
+    # states keep their evicted geometry
+    state = state.make_move(1, 1, "x").make_move(2, 2, "x")
+    assert state.last_move_result == "x"
+
+def test_all_available_moves():
+    field = [[None, "b", None, "a"],
+             ["a", "b", "a", "b"],
+             [None, None, None, None]]
+    state = BitboardGameState(3, 4, 3, field=field)
+    moves = [(pos_x, pos_y) for pos_x, pos_y in state.all_available_moves()]
+    assert moves == [(0, 0), (0, 2), (2, 0), (2, 1), (2, 2), (2, 3)]
+
+def test_make_move_validates_reserved_hanles():
+    exp_message = "\"nothing\" and \"draw\" hanles are reserved"
+
+    state = BitboardGameState(3, 2, 3)
+    for handle in ("nothing", "draw"):
+        with pytest.raises(ValueError) as excinfo:
+            state.make_move(0, 0, handle)
+        assert str(excinfo.value) == exp_message
+
+def test_make_move_validates_if_step_is_available():
+    state = BitboardGameState(3, 2, 3).make_move(0, 0, "a")
+
+    with pytest.raises(ValueError) as excinfo:
+        state.make_move(0, 0, "b")
+    assert str(excinfo.value) == "The value in the cell (0, 0) is already " \
+        "set"
+
+def test_make_move_validates_cell_position():
+    state = BitboardGameState(3, 2, 3)
+
+    with pytest.raises(ValueError) as excinfo:
+        state.make_move(3, 0, "a")
+    assert str(excinfo.value) == "The cell (3, 0) is out of the field " \
+        "(width: 3, height: 2)"
+
+def test_make_move_validates_handles_qty():
+    state = BitboardGameState(3, 2, 3).make_move(0, 0, "a")
+    state = state.make_move(1, 0, "b")
+
+    with pytest.raises(ValueError) as excinfo:
+        state.make_move(2, 0, "c")
+    assert str(excinfo.value) == "Only two player handles are supported, " \
+        "\"c\" is the third one"
+
+def test_make_move_does_not_change_original_state():
+    state = BitboardGameState(3, 3, 3)
+    new_state = state.make_move(1, 1, "a")
+
+    assert state.field == [[None] * 3] * 3
+    assert new_state.field[1][1] == "a"
+
+def test_make_move_results_draw():
+    field = [["a", None], ["b", "a"], ["b", "a"]]
+    first_state = BitboardGameState(3, 2, 3, field=field)
+    assert first_state.last_move_result == "nothing"
+
+    new_state = first_state.make_move(0, 1, "b")
+    assert new_state.last_move_result == "draw"
+
+def test_make_move_results_win():
+    field = [["a", "b"], ["a", "b"], [None, "a"]]
+    first_state = BitboardGameState(3, 2, 3, field=field)
+    assert first_state.last_move_result == "nothing"
+
+    new_state = first_state.make_move(2, 0, "a")
+    assert new_state.last_move_result == "a"
+
+def test_same_results_as_game_state():
+    rnd = random.Random(42)
+
+    for width, height, qty_to_win in [(3, 3, 3), (4, 3, 3), (5, 5, 4)]:
+        for _ in range(50):
+            state = GameState(width, height, qty_to_win)
+            bitboard_state = BitboardGameState(width, height, qty_to_win)
+            handles = ["x", "o"]
+
+            while state.last_move_result == "nothing":
+                moves = list(state.all_available_moves())
+                assert list(bitboard_state.all_available_moves()) == moves
+
+                pos_x, pos_y = rnd.choice(moves)
+                state = state.make_move(pos_x, pos_y, handles[0])
+                bitboard_state = bitboard_state.make_move(pos_x, pos_y, \
+                        handles[0])
+                handles.reverse()
+
+                assert bitboard_state.last_move_result == \
+                        state.last_move_result
+                assert bitboard_state.field == state.field
+
+def test_moves_near_stones_and_winning_moves_as_game_state():
+    rnd = random.Random(7)
+
+    for _ in range(20):
+        state = GameState(6, 5, 4)
+        bitboard_state = BitboardGameState(6, 5, 4)
+        handles = ["x", "o"]
+
+        while state.last_move_result == "nothing":
+            assert bitboard_state.moves_count == state.moves_count
+            for radius in (1, 2):
+                assert list(bitboard_state.moves_near_stones(radius)) == \
+                        list(state.moves_near_stones(radius))
+            for pos_x, pos_y in state.all_available_moves():
+                for handle in handles:
+                    assert bitboard_state.is_winning_move(pos_x, pos_y, \
+                            handle) == state.is_winning_move(pos_x, pos_y, \
+                            handle)
+
+            pos_x, pos_y = rnd.choice(list(state.all_available_moves()))
+            state = state.make_move(pos_x, pos_y, handles[0])
+            bitboard_state = bitboard_state.make_move(pos_x, pos_y, handles[0])
+            handles.reverse()
+
+def test_apply_and_undo_moves_as_make_move():
+    rnd = random.Random(11)
+
+    for state_class in (GameState, BitboardGameState):
+        for _ in range(20):
+            state = state_class(5, 4, 3).with_pattern_scores()
+            state.zobrist_hash # the hash is tracked from the empty field
+            mutable_state = state_class(5, 4, 3).with_pattern_scores()
+            states = [state]
+            handles = ["x", "o"]
+
+            while state.last_move_result == "nothing":
+                pos_x, pos_y = rnd.choice(list(state.all_available_moves()))
+                state = state.make_move(pos_x, pos_y, handles[0])
+                mutable_state.apply_move(pos_x, pos_y, handles[0])
+                states.append(state)
+                handles.reverse()
+
+                assert mutable_state.last_move_result == state.last_move_result
+                assert mutable_state.field == state.field
+                assert mutable_state.pattern_scores == state.pattern_scores
+                assert mutable_state.moves_count == state.moves_count
+
+            for state in reversed(states[:-1]):
+                mutable_state.undo_move()
+                assert mutable_state.last_move_result == state.last_move_result
+                assert mutable_state.field == state.field
+                assert mutable_state.pattern_scores == state.pattern_scores
+                assert mutable_state.zobrist_hash == state.zobrist_hash
+
+            with pytest.raises(ValueError):
+                mutable_state.undo_move()
+
+def test_random_playout_as_game_state():
+    for width, height, qty_to_win in [(3, 3, 3), (7, 5, 4), (15, 15, 5)]:
+        state = GameState(width, height, qty_to_win).make_move(1, 1, "x")
+        bitboard_state = BitboardGameState(width, height, qty_to_win) \
+                .make_move(1, 1, "x")
+        for seed in range(20):
+            # the handles aren't in the order of the state's boards
+            assert bitboard_state.random_playout(("o", "x"), \
+                    random.Random(seed)) == state.random_playout(("o", "x"), \
+                    random.Random(seed))
+            assert bitboard_state.field == state.field
+
+    state = BitboardGameState(3, 3, 3).make_move(0, 0, "x") \
+            .make_move(0, 1, "x").make_move(0, 2, "x")
+    assert state.random_playout(("o", "x")) == "x"
@@ -0,0 +1,189 @@
+import pytest
+from tttoe.broadcast import Broadcaster
+from tttoe.game import Game
+from tttoe.protocol import Message
+from tttoe.aiplayer import AIPlayer
+from tttoe.minimax_strategy import MinimaxStrategy
+
+class SocketStub:
+    def __init__(self):
+        self.messages = []
+
+    def write_message(self, msg):
+        self.messages.append(msg)
+
+class SlowSocketStub(SocketStub):
+    def __init__(self):
+        SocketStub.__init__(self)
+        self.busy = False
+
+    def is_write_busy(self):
+        return self.busy
+
+    @property
+    def events(self):
+        return [msg["event"] for msg in self.messages]
+
+def snapshot():
+    return Message("sync", seq=0, field=[[None]], result="nothing")
+
+def test_max_queue_should_be_positive():
+    with pytest.raises(ValueError):
+        Broadcaster(snapshot, max_queue=0)
+
+def test_send_to_all_but_excluded():
+    broadcaster = Broadcaster(snapshot)
+    host = SocketStub()
+    opponent = SlowSocketStub()
+    broadcaster.add("host", host)
+    broadcaster.add("opponent", opponent)
+
+    message = Message("move", seq=1, player_handle="host", x=0, y=0)
+    broadcaster.send(message, exclude="host")
+    assert host.messages == []
+    assert opponent.messages[0] is message
+    assert broadcaster.stats.broadcasts == 1
+    assert broadcaster.stats.sent == 1
+
+def test_queue_while_busy():
+    broadcaster = Broadcaster(snapshot, max_queue=4)
+    spectator = SlowSocketStub()
+    broadcaster.add("spectator_0", spectator)
+
+    spectator.busy = True
+    broadcaster.send(Message("move", seq=1, player_handle="host", x=0, y=0))
+    broadcaster.send(Message("playerjoined", player_handle="opponent"))
+    assert spectator.messages == []
+    assert broadcaster.queued_count == 2
+
+    broadcaster.flush()
+    assert spectator.messages == []
+
+    spectator.busy = False
+    broadcaster.flush()
+    assert spectator.events == ["move", "playerjoined"]
+    assert broadcaster.queued_count == 0
+    assert broadcaster.stats.queued == 2
+    assert broadcaster.stats.sent == 2
+
+def test_lagging_player_gets_snapshot():
+    broadcaster = Broadcaster(snapshot, max_queue=2)
+    spectator = SlowSocketStub()
+    other = SlowSocketStub()
+    broadcaster.add("spectator_0", spectator)
+    broadcaster.add("spectator_1", other)
+
+    spectator.busy = True
+    broadcaster.send(Message("playerleft", player_handle="opponent"))
+    broadcaster.send(Message("playerjoined", player_handle="spectator_2"))
+    for seq in range(1, 6):
+        broadcaster.send(Message("move", seq=seq, player_handle="host", \
+                x=seq, y=0))
+
+    assert len(other.messages) == 7
+    assert broadcaster.lagging_count == 1
+    # only the notice about the opponent is kept
+    assert broadcaster.queued_count == 1
+    assert broadcaster.stats.dropped == 6
+
+    spectator.busy = False
+    broadcaster.flush()
+    assert spectator.events == ["sync", "playerleft"]
+    assert broadcaster.lagging_count == 0
+    assert broadcaster.stats.snapshots == 1
+
+    broadcaster.send(Message("move", seq=6, player_handle="host", x=0, y=1))
+    assert spectator.events == ["sync", "playerleft", "move"]
+
+def test_messages_sent_by_players_go_after_the_current_one():
+    broadcaster = Broadcaster(snapshot)
+    first = SocketStub()
+    last = SocketStub()
+
+    class ReplyingSocket(SocketStub):
+        def write_message(self, msg):
+            SocketStub.write_message(self, msg)
+            if msg.seq == 1:
+                broadcaster.send(Message("move", seq=2, \
+                        player_handle="opponent", x=1, y=1))
+
+    broadcaster.add("host", first)
+    broadcaster.add("opponent", ReplyingSocket())
+    broadcaster.add("spectator_0", last)
+    broadcaster.send(Message("move", seq=1, player_handle="host", x=0, y=0))
+
+    assert [msg.seq for msg in first.messages] == [1, 2]
+    assert [msg.seq for msg in last.messages] == [1, 2]
+    assert broadcaster.stats.broadcasts == 2
+
+def test_spectator_gets_moves_of_ai_players_in_order():
+    game = Game(3, 3, 3, "host", "x")
+    ai_1 = AIPlayer(game, strategy=MinimaxStrategy(max_depth=2))
+    AIPlayer(game, strategy=MinimaxStrategy(max_depth=2))
+    spectator = SlowSocketStub()
+    game.append_player(spectator)
+    # the AI players move synchronously while the previous move is sent
+    ai_1.make_move()
+
+    assert game.is_over
+    seqs = [msg.seq for msg in spectator.messages]
+    assert seqs == sorted(seqs)
+    assert seqs[-1] == game.seq
+    assert spectator.events.count("move") == game.seq
+
+def test_snapshot_is_built_once_per_broadcast():
+    snapshots = []
+    def counting_snapshot():
+        snapshots.append(snapshot())
+        return snapshots[-1]
+
+    broadcaster = Broadcaster(counting_snapshot, max_queue=1)
+    spectators = [SlowSocketStub() for _ in range(3)]
+    for index, spectator in enumerate(spectators):
+        broadcaster.add("spectator_%d" % index, spectator)
+        spectator.busy = True
+
+    for seq in range(1, 4):
+        broadcaster.send(Message("move", seq=seq, player_handle="host", \
+                x=seq, y=0))
+    for spectator in spectators:
+        spectator.busy = False
+    broadcaster.flush()
+
+    assert len(snapshots) == 1
+    assert all(spectator.messages == [snapshots[0]] \
+            for spectator in spectators)
+
+def test_removed_player_queue_is_dropped():
+    broadcaster = Broadcaster(snapshot)
+    spectator = SlowSocketStub()
+    broadcaster.add("spectator_0", spectator)
+    spectator.busy = True
+    broadcaster.send(Message("playerjoined", player_handle="opponent"))
+    broadcaster.remove("spectator_0")
+    assert broadcaster.queued_count == 0
+    assert len(broadcaster) == 0
+
+def test_game_coalesces_moves_of_slow_spectator():
+    game = Game(3, 3, 3, "host", "x", max_send_queue=1)
+    host = SocketStub()
+    opponent = SocketStub()
+    spectator = SlowSocketStub()
+    game.append_player(host)
+    game.append_player(opponent)
+    game.append_player(spectator)
+
+    spectator.busy = True
+    game.perform_move("host", 0, 0)
+    game.perform_move("opponent", 1, 0)
+    game.perform_move("host", 0, 1)
+    spectator.busy = False
+    game.flush_messages()
+
+    assert spectator.events == ["sync"]
+    sync = spectator.messages[0]
+    assert sync.seq == 3
+    assert sync["data"]["field"] == game.game_state.field
+    assert len(opponent.messages) == 3
+    assert game.fanout_stats.broadcasts == 6
+    assert game.fanout_stats.dropped == 3
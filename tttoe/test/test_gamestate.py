@@ -1,4 +1,5 @@
 import pytest
+import random
 from tttoe.gamestate import GameState
 
 def test_init_default_last_step_result():
@@ -62,3 +63,76 @@ def test_make_move_results_win():
 
     new_state = first_state.make_move(2, 0, "a")
     assert new_state.last_move_result == "a"
+
+def test_moves_near_stones():
+    state = GameState(5, 5, 3)
+    assert list(state.moves_near_stones(1)) == [(2, 2)]
+
+    state = state.make_move(0, 0, "a").make_move(4, 3, "b")
+    assert list(state.moves_near_stones(1)) == \
+            [(0, 1), (1, 0), (1, 1), (3, 2), (3, 3), (3, 4), (4, 2), (4, 4)]
+
+def test_is_winning_move():
+    field = [["a", "b", None], ["a", None, "b"], [None, None, None]]
+    state = GameState(3, 3, 3, field=field)
+
+    assert state.is_winning_move(2, 0, "a")
+    assert not state.is_winning_move(2, 0, "b")
+    assert not state.is_winning_move(2, 2, "a")
+    assert state.field[2][0] == None
+
+def test_moves_count():
+    state = GameState(3, 3, 3, field=[["a", None, None], ["b"] * 3, [None] * 3])
+    assert state.moves_count == 4
+    assert state.make_move(0, 1, "a").moves_count == 5
+
+def test_apply_and_undo_move():
+    state = GameState(3, 3, 3).make_move(0, 0, "x").make_move(1, 1, "o")
+    zobrist_hash = state.zobrist_hash
+
+    state.apply_move(0, 1, "x")
+    assert state.field[0][1] == "x"
+    assert state.moves_count == 3
+    assert state.zobrist_hash == \
+            GameState(3, 3, 3, field=state.field).zobrist_hash
+    state.apply_move(2, 2, "o")
+    state.apply_move(0, 2, "x")
+    assert state.last_move_result == "x"
+
+    state.undo_move()
+    assert state.last_move_result == "nothing"
+    state.undo_move()
+    state.undo_move()
+    assert state.field == GameState(3, 3, 3).make_move(0, 0, "x") \
+            .make_move(1, 1, "o").field
+    assert state.moves_count == 2
+    assert state.zobrist_hash == zobrist_hash
+
+    with pytest.raises(ValueError):
+        state.undo_move()
+    with pytest.raises(ValueError):
+        state.apply_move(1, 1, "x")
+
+def test_random_playout():
+    for width, height, qty_to_win in [(3, 3, 3), (7, 5, 4), (15, 15, 5)]:
+        state = GameState(width, height, qty_to_win).make_move(1, 1, "x")
+        field = state.field
+        for seed in range(20):
+            result = state.random_playout(("o", "x"), random.Random(seed))
+            assert state.field == field
+
+            # the same moves by make_move
+            moves = list(state.all_available_moves())
+            random.Random(seed).shuffle(moves)
+            new_state = state
+            handles = ["o", "x"]
+            for pos_x, pos_y in moves:
+                new_state = new_state.make_move(pos_x, pos_y, handles[0])
+                handles.reverse()
+                if new_state.last_move_result != "nothing":
+                    break
+            assert result == new_state.last_move_result
+
+    state = GameState(3, 3, 3).make_move(0, 0, "x").make_move(0, 1, "x") \
+            .make_move(0, 2, "x")
+    assert state.random_playout(("o", "x")) == "x"
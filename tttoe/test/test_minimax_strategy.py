@@ -0,0 +1,196 @@
+import random
+import minimax
+from tttoe.minimax_strategy import MinimaxStrategy
+from tttoe.bitboard_gamestate import BitboardGameState
+
+def make_state(moves, width=5, height=5, qty_to_win=3):
+    state = BitboardGameState(width, height, qty_to_win)
+    for pos_x, pos_y, handle in moves:
+        state = state.make_move(pos_x, pos_y, handle)
+    return state
+
+def test_candidate_moves_default():
+    state = make_state([(0, 0, "host")], 3, 3, 3)
+    strategy = MinimaxStrategy()
+    assert list(strategy.candidate_moves(state, -1)) == \
+            list(state.all_available_moves())
+
+def test_candidate_moves_radius():
+    state = make_state([(0, 0, "host")])
+    strategy = MinimaxStrategy(candidate_radius=1)
+    assert list(strategy.candidate_moves(state, -1)) == \
+            [(0, 1), (1, 0), (1, 1)]
+
+def test_ordered_candidate_moves():
+    state = make_state([(0, 0, "host"), (4, 4, "opponent"),
+                        (0, 1, "host"), (4, 3, "opponent")])
+    strategy = MinimaxStrategy(order_moves=True)
+
+    moves = list(strategy.candidate_moves(state, 1))
+    assert moves[:2] == [(0, 2), (4, 2)]
+    assert sorted(moves) == sorted(state.all_available_moves())
+
+    moves = list(strategy.candidate_moves(state, -1))
+    assert moves[:2] == [(4, 2), (0, 2)]
+
+def test_cutoff_moves_go_first():
+    state = make_state([(0, 0, "host")])
+    strategy = MinimaxStrategy(order_moves=True)
+
+    strategy.record_cutoff(state, -1, (3, 3), 0)
+    strategy.record_cutoff(state, -1, (2, 2), 2)
+    assert list(strategy.candidate_moves(state, -1))[:2] == [(2, 2), (3, 3)]
+
+    other_state = make_state([(4, 4, "host")])
+    strategy.record_cutoff(other_state, -1, (1, 1), 3)
+    assert list(strategy.candidate_moves(other_state, -1))[:3] == \
+            [(1, 1), (2, 2), (3, 3)]
+
+def test_ordering_finds_the_same_move():
+    state = make_state([(0, 0, "host"), (2, 2, "opponent"), (0, 1, "host")])
+
+    expected = minimax.run(state, -1, MinimaxStrategy(max_depth=2))
+    assert expected == (0, 2)
+    assert minimax.run(state, -1, \
+            MinimaxStrategy(max_depth=2, order_moves=True)) == expected
+    assert minimax.run(state, -1, MinimaxStrategy(max_depth=2, \
+            candidate_radius=1, order_moves=True)) == expected
+
+def test_patterns_heuristic():
+    strategy = MinimaxStrategy(evaluate_patterns=True)
+    assert strategy.below_heuristic() < -10 ** 9 < 10 ** 9 < \
+            strategy.above_heuristic()
+
+    state = make_state([(0, 0, "host"), (4, 4, "opponent")])
+    assert strategy.heuristic(state) == 0
+    assert strategy.heuristic(state.make_move(1, 1, "host")) > 0
+    assert strategy.heuristic(make_state([(0, 0, "host"), (1, 0, "host"), \
+            (2, 0, "host")])) == 10 ** 9
+
+def test_patterns_heuristic_extends_open_run():
+    state = make_state([(3, 3, "host"), (0, 0, "opponent"), (3, 4, "host"),
+                        (6, 6, "opponent")], 7, 7, 4)
+    strategy = MinimaxStrategy(max_depth=0, evaluate_patterns=True)
+    assert minimax.run(state, 1, strategy) in [(3, 2), (3, 5)]
+
+def test_skip_symmetric_moves():
+    strategy = MinimaxStrategy(skip_symmetric=True)
+
+    moves = [payload for _, payload in \
+            strategy.all_substates(make_state([], 3, 3, 3), 1)]
+    assert moves == [(0, 0), (0, 1), (1, 1)]
+
+    moves = [payload for _, payload in \
+            strategy.all_substates(make_state([(0, 0, "host")], 3, 3, 3), -1)]
+    assert moves == [(0, 1), (0, 2), (1, 1), (1, 2), (2, 2)]
+
+def test_skip_symmetric_finds_the_same_move():
+    state = make_state([(0, 0, "host"), (1, 1, "opponent"), (2, 2, "host")],
+                       3, 3, 3)
+    expected = minimax.run(state, -1, MinimaxStrategy(max_depth=9))
+    result = minimax.run(state, -1, \
+            MinimaxStrategy(max_depth=9, skip_symmetric=True))
+    assert result == expected
+
+def test_parallel_search_finds_the_same_move():
+    states = [make_state([(1, 1, "host"), (2, 2, "opponent")], 4, 4, 3),
+              make_state([(0, 0, "host")], 3, 3, 3)]
+    for state in states:
+        for player in (1, -1):
+            strategy = MinimaxStrategy(max_depth=3, order_moves=True)
+            expected = minimax.run(state, player, strategy)
+            assert minimax.run_parallel(state, player, \
+                    MinimaxStrategy(max_depth=3, order_moves=True), \
+                    processes=2) == expected
+
+def test_negamax_make_unmake_finds_the_same_move():
+    for strategy_args in (dict(max_depth=3), \
+            dict(max_depth=2, candidate_radius=1, order_moves=True, \
+            evaluate_patterns=True, skip_symmetric=True)):
+        state = make_state([(2, 2, "host"), (1, 2, "opponent"), \
+                (2, 3, "host")])
+        if strategy_args.get("evaluate_patterns"):
+            state = state.with_pattern_scores()
+        field = state.field
+        expected = minimax.run(state, -1, MinimaxStrategy(**strategy_args))
+
+        strategy = MinimaxStrategy(**strategy_args)
+        assert minimax.run_negamax(state, -1, strategy) == expected
+        assert state.field == field
+        assert state.last_move_result == "nothing"
+
+def test_searched_copy():
+    state = make_state([(2, 2, "host"), (1, 2, "opponent")])
+    for evaluate_patterns in (False, True):
+        strategy = MinimaxStrategy(evaluate_patterns=evaluate_patterns)
+        searched_state = strategy.searched_copy(state)
+        assert searched_state is not state
+        assert searched_state.field == state.field
+        assert (searched_state.pattern_scores is not None) == \
+                evaluate_patterns
+
+        searched_state.apply_move(0, 0, "host")
+        assert state.field[0][0] is None
+
+def test_proof_number_search_solves_fields():
+    strategy = MinimaxStrategy(skip_symmetric=True)
+    result, move = minimax.run_proof_number(BitboardGameState(3, 3, 3), 1, \
+            strategy)
+    assert result == 0
+    assert move is not None
+
+    # the first player wins 3 in a row on 4x4 field
+    state = BitboardGameState(4, 4, 3)
+    result, move = minimax.run_proof_number(state, -1, strategy)
+    assert result == -1
+    state = state.make_move(move[0], move[1], "opponent")
+    assert minimax.run_proof_number(state, 1, strategy)[0] == -1
+
+    state = make_state([(0, 0, "host"), (1, 1, "opponent"), (0, 1, "host")], \
+            3, 3, 3)
+    # the opponent has to block
+    assert minimax.run_proof_number(state, -1, strategy) == (0, (0, 2))
+    assert strategy.outcome(state.make_move(2, 2, "opponent") \
+            .make_move(0, 2, "host")) == 1
+
+def test_proof_number_search_agrees_with_minimax():
+    states = [make_state([(1, 1, "host"), (2, 2, "opponent")], 4, 4, 3),
+              make_state([(0, 0, "host"), (1, 1, "opponent")], 3, 3, 3),
+              make_state([(1, 1, "host"), (0, 0, "opponent"), \
+                      (2, 0, "host")], 3, 3, 3)]
+    values = {0: -1, 1: 0, 2: 0, 3: 1}
+    for state in states:
+        for player in (1, -1):
+            strategy = MinimaxStrategy(max_depth=16, order_moves=True)
+            move = minimax.run(state, player, strategy)
+            expected = values[_minimax_value(state, player, move)]
+            result, _ = minimax.run_proof_number(state, player, strategy)
+            assert result == expected
+
+def _minimax_value(state, player, move):
+    state = state.make_move(move[0], move[1], \
+            MinimaxStrategy._PLAYER_HANDLES[player])
+    while state.last_move_result == "nothing":
+        player = -player
+        move = minimax.run(state, player, \
+                MinimaxStrategy(max_depth=16, order_moves=True))
+        state = state.make_move(move[0], move[1], \
+                MinimaxStrategy._PLAYER_HANDLES[player])
+    return MinimaxStrategy().heuristic(state)
+
+def test_monte_carlo_search():
+    strategy = MinimaxStrategy()
+    # the opponent has to block
+    state = make_state([(0, 0, "host"), (1, 1, "opponent"), (0, 1, "host")], \
+            3, 3, 3)
+    assert minimax.run_mcts(state, -1, strategy, iterations=500, \
+            seed=1) == (0, 2)
+
+    # the host has three in a column on a large field
+    state = make_state([(7, 7, "host"), (8, 8, "opponent"), (7, 8, "host"), \
+            (9, 9, "opponent"), (7, 9, "host"), (6, 6, "opponent")], \
+            15, 15, 5)
+    strategy = MinimaxStrategy(candidate_radius=1)
+    assert strategy.random_playout(state, 1, random.Random(1)) in (-1, 0, 1)
+    assert minimax.run_mcts(state, 1, strategy, iterations=1000, \
+            seed=1) in [(7, 6), (7, 10)]
@@ -0,0 +1,110 @@
+import os
+import pickle
+import shutil
+import tempfile
+import pytest
+from tttoe.move_cache import MoveCache, SharedMoveCache
+from tttoe.bitboard_gamestate import BitboardGameState
+from tttoe.gamestate import GameState
+from tttoe.aiplayer import AIPlayer
+from tttoe.game import Game
+
+@pytest.fixture
+def database_path(request):
+    directory = tempfile.mkdtemp()
+    request.addfinalizer(lambda: shutil.rmtree(directory))
+    return os.path.join(directory, "moves.sqlite")
+
+def make_state(moves, state_class=BitboardGameState):
+    state = state_class(3, 3, 3)
+    for pos_x, pos_y, handle in moves:
+        state = state.make_move(pos_x, pos_y, handle)
+    return state
+
+def check_cache(cache):
+    state = make_state([(0, 0, "host")])
+    assert cache.get(state, "opponent", (5,)) == None
+    cache.put(state, "opponent", (5,), (1, 1))
+    assert cache.get(state, "opponent", (5,)) == (1, 1)
+
+    # Symmetric position, the move is mapped.
+    symmetric = make_state([(2, 0, "host")], GameState)
+    cache.put(state, "opponent", (5,), (0, 1))
+    assert cache.get(symmetric, "opponent", (5,)) == (2, 1)
+
+    # Other strategy settings or player to move.
+    assert cache.get(state, "opponent", (6,)) == None
+    assert cache.get(state, "host", (5,)) == None
+
+    assert cache.hits == 2
+    assert cache.misses == 3
+    assert len(cache) == 1
+
+def test_move_cache():
+    check_cache(MoveCache())
+
+def test_shared_move_cache(database_path):
+    cache = SharedMoveCache(database_path)
+    check_cache(cache)
+    cache.close()
+
+def test_lru_eviction():
+    cache = MoveCache(max_entries=2)
+    states = [make_state([(x, 0, "host")]) for x in range(2)] + \
+            [make_state([(1, 1, "host")])]
+    cache.put(states[0], "opponent", (), (1, 1))
+    cache.put(states[1], "opponent", (), (1, 1))
+    cache.get(states[0], "opponent", ())
+    cache.put(states[2], "opponent", (), (0, 0))
+    assert len(cache) == 2
+    assert cache.get(states[1], "opponent", ()) == None
+    assert cache.get(states[0], "opponent", ()) == (1, 1)
+
+def test_memory_cap():
+    cache = MoveCache()
+    state = make_state([(0, 0, "host")])
+    cache.put(state, "opponent", (), (1, 1))
+    entry_size = cache.memory_used
+
+    cache = MoveCache(max_bytes=entry_size * 2)
+    for y in range(3):
+        cache.put(make_state([(0, y, "host"), (2, 2, "opponent")]), \
+                "host", (), (1, 1))
+    assert len(cache) < 3
+    assert cache.memory_used <= entry_size * 2
+    assert cache.stats()["entries"] == len(cache)
+
+def test_shared_lru_eviction(database_path):
+    cache = SharedMoveCache(database_path, max_entries=2)
+    states = [make_state([(x, 0, "host")]) for x in range(2)] + \
+            [make_state([(1, 1, "host")])]
+    cache.put(states[0], "opponent", (), (1, 1))
+    cache.put(states[1], "opponent", (), (1, 1))
+    cache.get(states[0], "opponent", ())
+    cache.put(states[2], "opponent", (), (0, 0))
+    assert len(cache) == 2
+    assert cache.get(states[1], "opponent", ()) == None
+    cache.close()
+
+def test_shared_between_instances(database_path):
+    state = make_state([(0, 0, "host")])
+    cache = SharedMoveCache(database_path)
+    cache.put(state, "opponent", (), (1, 1))
+
+    restored = pickle.loads(pickle.dumps(cache))
+    assert restored.get(state, "opponent", ()) == (1, 1)
+    assert restored.hits == 1
+    restored.close()
+    cache.close()
+
+def test_ai_player_uses_cache():
+    cache = MoveCache()
+    for _ in range(2):
+        game = Game(3, 3, 3, "host", "x", state_class=BitboardGameState)
+        ai_1 = AIPlayer(game, move_cache=cache)
+        AIPlayer(game, move_cache=cache)
+        ai_1.make_move()
+        assert game.game_state.last_move_result == "draw"
+
+    assert cache.misses == 9
+    assert cache.hits == 9
@@ -0,0 +1,60 @@
+import random
+import pytest
+from tttoe import patterns
+from tttoe.gamestate import GameState
+from tttoe.bitboard_gamestate import BitboardGameState
+
+def test_line_delta():
+    E, M, O = patterns.EMPTY, patterns.MOVER, patterns.OTHER
+
+    # Windows through the move cell (the third one): [E M E] and [M E E]
+    # get the second stone, [E E O] becomes dead.
+    assert patterns.line_delta([E, M, E, E, O], 2, 3) == (9 + 9, 1)
+    # The line is shorter than the window.
+    assert patterns.line_delta([E, E], 0, 3) == (0, 0)
+
+def test_line_cells():
+    cells, center = patterns.line_cells(5, 4, 3, 0, 1, 1, 1)
+    assert cells == [(0, 1), (1, 2), (2, 3)]
+    assert center == 0
+
+    cells, center = patterns.line_cells(5, 4, 3, 2, 1, 1, -1)
+    assert cells == [(0, 3), (1, 2), (2, 1), (3, 0)]
+    assert center == 2
+
+def test_field_scores():
+    field = [["a", None, None], [None, "b", None], [None, None, None]]
+    scores = patterns.field_scores(field, 3, 3, 3)
+    # "a" has column 0 and row 0, "b" has row 1, column 1 and the
+    # anti-diagonal (the diagonal is dead).
+    assert scores == {"a": 2, "b": 3}
+
+def test_incremental_scores_equal_full_scores():
+    rnd = random.Random(3)
+
+    for state_class in (GameState, BitboardGameState):
+        for width, height, qty_to_win in [(3, 3, 3), (7, 6, 4), (9, 9, 5)]:
+            for _ in range(10):
+                state = state_class(width, height, qty_to_win)
+                state = state.with_pattern_scores()
+                handles = ["x", "o"]
+
+                while state.last_move_result == "nothing":
+                    pos_x, pos_y = rnd.choice(list(state.all_available_moves()))
+                    state = state.make_move(pos_x, pos_y, handles[0])
+                    handles.reverse()
+
+                    expected = patterns.field_scores(state.field, width, \
+                            height, qty_to_win)
+                    for handle in handles:
+                        assert state.pattern_scores.get(handle, 0) == \
+                                expected.get(handle, 0)
+
+def test_states_without_tracking():
+    for state_class in (GameState, BitboardGameState):
+        state = state_class(3, 3, 3).make_move(0, 0, "x")
+        assert state.pattern_scores == None
+
+        state = state.with_pattern_scores()
+        assert state.pattern_scores == {"x": 3}
+        assert state.make_move(1, 1, "o").pattern_scores == {"x": 2, "o": 3}
@@ -0,0 +1,82 @@
+import json
+import pytest
+from tttoe.game import Game
+from tttoe.protocol import Message, decode, pack_field, unpack_field
+
+class SocketStub:
+    def __init__(self):
+        self.messages = []
+
+    def write_message(self, msg):
+        self.messages.append(msg)
+
+def test_pack_field():
+    field = [["host", None, None], [None, "opponent", None]]
+    assert pack_field(field) == "h...o."
+    assert unpack_field("h...o.", 2, 3) == field
+
+def test_unpack_field_checks_size():
+    with pytest.raises(ValueError):
+        unpack_field("h...o", 2, 3)
+
+def test_encode_v1():
+    message = Message("move", seq=5, player_handle="host", x=1, y=2)
+    assert json.loads(message.encode(1)) == \
+            dict(event="move", data=dict(player_handle="host", x=1, y=2))
+    assert message["event"] == "move"
+    assert message["data"]["x"] == 1
+
+def test_encode_v2():
+    message = Message("move", seq=5, player_handle="host", x=1, y=2)
+    assert message.encode(2) == '{"e":"m","p":"h","q":5,"x":1,"y":2}'
+
+    message = Message("gameover", seq=5, result_of_move="draw")
+    assert message.encode(2) == '{"e":"g","q":5,"r":"d"}'
+
+    message = Message("playerjoined", player_handle="spectator_0")
+    assert message.encode(2) == '{"e":"j","p":"spectator_0"}'
+
+    message = Message("setup", seq=1, connection_game_id=None, \
+            player_handle="opponent", signs_map=dict(host="x", opponent="o"), \
+            start_player_handle="host", field=[["host", None], [None, None]])
+    assert json.loads(message.encode(2)) == dict(e="s", q=1, p="o", g=None, \
+            sm=dict(host="x", opponent="o"), sp="h", w=2, h=2, b="h...")
+
+    message = Message("sync", seq=1, field=[["host"], [None]], \
+            result="nothing")
+    assert json.loads(message.encode(2)) == \
+            dict(e="b", q=1, w=2, h=1, b="h.", r="n")
+
+def test_encode_once():
+    message = Message("error", message="Game is full")
+    text = message.encode(2)
+    assert message.encode(2) is text
+    assert message.encode(1) is message.encode(1)
+
+    with pytest.raises(ValueError):
+        message.encode(3)
+
+def test_decode():
+    assert decode('{"event": "move", "data": {"x": 1, "y": 2}}', 1) == \
+            ("move", dict(x=1, y=2))
+    assert decode('{"e":"m","x":1,"y":2}', 2) == ("move", dict(x=1, y=2))
+    assert decode('{"e":"r"}', 2) == ("resync", dict())
+
+    with pytest.raises(ValueError):
+        decode('{"e":"z"}', 2)
+
+def test_game_shares_messages():
+    game = Game(3, 3, 3, "host", "x")
+    host = SocketStub()
+    opponent = SocketStub()
+    spectator = SocketStub()
+    game.append_player(host)
+    game.append_player(opponent)
+    game.append_player(spectator)
+
+    game.perform_move("host", 0, 0)
+    assert game.seq == 1
+    assert opponent.messages[-1] is spectator.messages[-1]
+    assert opponent.messages[-1].seq == 1
+    assert opponent.messages[-1]["data"] == \
+            dict(player_handle="host", x=0, y=0)
@@ -0,0 +1,82 @@
+import pytest
+from tttoe.game import Game
+from tttoe.gamestate import GameState
+from tttoe.registry import GameRegistry, RegistryFull, game_memory
+
+class SocketStub:
+    def __init__(self):
+        self.messages = []
+
+    def write_message(self, msg):
+        self.messages.append(msg)
+
+def make_game(width=3, state_class=GameState):
+    game = Game(width, width, 3, "host", "x", state_class=state_class)
+    game.append_player(SocketStub())
+    return game
+
+def test_get_joinable_games_only():
+    registry = GameRegistry()
+    joinable = make_game()
+    other = make_game()
+    registry.add(joinable, joinable=True)
+    registry.add(other)
+
+    assert registry.get(joinable.game_id) is joinable
+    assert registry.get(other.game_id) is None
+    assert other.game_id in registry
+    assert registry.get("unknown") is None
+
+    registry.remove(joinable.game_id)
+    assert registry.get(joinable.game_id) is None
+    assert len(registry) == 1
+
+def test_max_games():
+    registry = GameRegistry(max_games=2)
+    registry.add(make_game())
+    registry.add(make_game())
+    with pytest.raises(RegistryFull) as excinfo:
+        registry.add(make_game())
+    assert excinfo.value.message == "The server has too many games (2), " \
+            "try again later"
+    assert registry.stats()["rejected"] == 1
+
+def test_max_memory():
+    registry = GameRegistry(max_memory=game_memory(make_game()) * 2)
+    registry.add(make_game())
+    registry.add(make_game())
+    with pytest.raises(RegistryFull):
+        registry.add(make_game())
+
+def test_game_memory_grows_with_field():
+    assert game_memory(make_game(10)) > game_memory(make_game(3))
+
+def test_sweep_idle_and_empty_games():
+    expired = []
+    registry = GameRegistry(idle_timeout=60, on_expire=expired.append)
+    idle = make_game()
+    active = make_game()
+    empty = make_game()
+    for game in (idle, active, empty):
+        registry.add(game)
+    empty.player_left("host")
+
+    now = active.last_activity + 61
+    active.perform_move("host", 1, 1)
+    active._last_activity = now
+
+    assert set(registry.sweep(now)) == set([idle, empty])
+    assert set(expired) == set([idle, empty])
+    assert len(registry) == 1
+    assert registry.stats()["expired"] == 2
+
+def test_stats():
+    registry = GameRegistry()
+    game = make_game()
+    game.append_player(SocketStub())
+    registry.add(game)
+    stats = registry.stats()
+    assert stats["games"] == 1
+    assert stats["players"] == 2
+    assert stats["added"] == 1
+    assert stats["memory_used"] == game_memory(game)
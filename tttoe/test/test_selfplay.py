@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+from tttoe import selfplay
+
+def make_settings(**kwargs):
+    settings = dict(width=3, height=3, qty_to_win=3, \
+            host_strategy=dict(max_depth=9), \
+            opponent_strategy=dict(max_depth=9), time_budget=None, \
+            transposition_table_entries=0, opening_moves=0, seed="0")
+    settings.update(kwargs)
+    return settings
+
+def test_play_game():
+    game = selfplay.play_game(1, make_settings())
+    assert game["game"] == 1
+    assert game["start_player"] == "opponent"
+    assert game["result"] == "draw"
+    assert len(game["moves"]) == 9
+    assert [move["player"] for move in game["moves"][:2]] == \
+            ["opponent", "host"]
+    assert all(move["nodes"] > 0 for move in game["moves"])
+
+def test_opening_moves():
+    settings = make_settings(opening_moves=2, seed="x")
+    game = selfplay.play_game(0, settings)
+    assert len(game["opening"]) == 2
+    assert len(game["moves"]) + len(game["opening"]) <= 9
+    assert selfplay.play_game(0, settings)["opening"] == game["opening"]
+
+def test_weak_opponent_loses():
+    game = selfplay.play_game(0, make_settings(width=4, height=4, \
+            opponent_strategy=dict(max_depth=0), \
+            host_strategy=dict(max_depth=2)))
+    assert game["result"] == "host"
+
+def test_run_games():
+    games = list(selfplay.run_games(make_settings(), 4, processes=2))
+    assert sorted(game["game"] for game in games) == [0, 1, 2, 3]
+    assert all(game["result"] == "draw" for game in games)
+
+def test_main_writes_json_lines():
+    handle, path = tempfile.mkstemp()
+    os.close(handle)
+    try:
+        assert selfplay.main(["--games", "2", "--processes", "1", \
+                "--depth", "9", "--output", path]) == 0
+        with open(path) as input_file:
+            games = [json.loads(line) for line in input_file]
+    finally:
+        os.remove(path)
+
+    assert len(games) == 2
+    assert set(game["result"] for game in games) == set(["draw"])
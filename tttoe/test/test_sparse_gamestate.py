@@ -0,0 +1,194 @@
+import random
+import pytest
+import minimax
+from tttoe.gamestate import GameState
+from tttoe.sparse_gamestate import SparseGameState
+from tttoe import sparse_gamestate
+from tttoe.minimax_strategy import MinimaxStrategy
+from tttoe import symmetry
+
+def test_field():
+    field = [[None, "a", None, "b"],
+             ["a", "b", "b", None],
+             [None, None, None, None]]
+    state = SparseGameState(3, 4, 3, field=field)
+    assert state.field == field
+    assert state.moves_count == 5
+    assert state.empty_count == 7
+    assert state.bounding_box == (0, 0, 1, 3)
+
+    state.field[0][0] = "a"
+    assert state.field == field
+
+def test_make_move_validates_cell_position():
+    state = SparseGameState(3, 2, 3)
+
+    with pytest.raises(ValueError) as excinfo:
+        state.make_move(3, 0, "a")
+    assert str(excinfo.value) == "The cell (3, 0) is out of the field " \
+        "(width: 3, height: 2)"
+
+    with pytest.raises(ValueError):
+        state.make_move(0, -1, "a")
+
+def test_make_move_validates_if_step_is_available():
+    state = SparseGameState(3, 2, 3).make_move(0, 0, "a")
+
+    with pytest.raises(ValueError) as excinfo:
+        state.make_move(0, 0, "b")
+    assert str(excinfo.value) == "The value in the cell (0, 0) is already " \
+        "set"
+
+def test_make_move_results_draw():
+    field = [["a", None], ["b", "a"], ["b", "a"]]
+    first_state = SparseGameState(3, 2, 3, field=field)
+    new_state = first_state.make_move(0, 1, "b")
+    assert new_state.last_move_result == "draw"
+    assert new_state.empty_count == 0
+    assert first_state.empty_count == 1
+
+def test_same_results_as_game_state():
+    rnd = random.Random(42)
+
+    for width, height, qty_to_win in [(3, 3, 3), (4, 3, 3), (6, 5, 4)]:
+        for _ in range(20):
+            state = GameState(width, height, qty_to_win).with_pattern_scores()
+            state.zobrist_hash
+            sparse_state = SparseGameState(width, height, qty_to_win) \
+                    .with_pattern_scores()
+            sparse_state.zobrist_hash
+            handles = ["x", "o"]
+
+            while state.last_move_result == "nothing":
+                moves = list(state.all_available_moves())
+                assert list(sparse_state.all_available_moves()) == moves
+                for radius in (1, 2):
+                    assert list(sparse_state.moves_near_stones(radius)) == \
+                            list(state.moves_near_stones(radius))
+                for pos_x, pos_y in moves:
+                    for handle in handles:
+                        assert sparse_state.is_winning_move(pos_x, pos_y, \
+                                handle) == state.is_winning_move(pos_x, \
+                                pos_y, handle)
+
+                pos_x, pos_y = rnd.choice(moves)
+                state = state.make_move(pos_x, pos_y, handles[0])
+                sparse_state = sparse_state.make_move(pos_x, pos_y, \
+                        handles[0])
+                handles.reverse()
+
+                assert sparse_state.last_move_result == \
+                        state.last_move_result
+                assert sparse_state.field == state.field
+                assert sparse_state.moves_count == state.moves_count
+                assert sparse_state.zobrist_hash == state.zobrist_hash
+                assert sparse_state.pattern_scores == state.pattern_scores
+                assert SparseGameState.from_state(state) \
+                        .with_pattern_scores().pattern_scores == \
+                        state.pattern_scores
+
+def test_apply_and_undo_moves_as_make_move():
+    rnd = random.Random(11)
+
+    for width in (5, None):
+        state = SparseGameState(width, width and 4, 3).with_pattern_scores()
+        state.zobrist_hash
+        mutable_state = SparseGameState(width, width and 4, 3) \
+                .with_pattern_scores()
+        states = [state]
+        handles = ["x", "o"]
+
+        while state.last_move_result == "nothing":
+            pos_x, pos_y = rnd.choice(list(state.all_available_moves()))
+            state = state.make_move(pos_x, pos_y, handles[0])
+            mutable_state.apply_move(pos_x, pos_y, handles[0])
+            states.append(state)
+            handles.reverse()
+            assert mutable_state.field == state.field
+            assert mutable_state.pattern_scores == state.pattern_scores
+
+        for state in reversed(states[:-1]):
+            mutable_state.undo_move()
+            assert mutable_state.last_move_result == state.last_move_result
+            assert mutable_state.field == state.field
+            assert mutable_state.bounding_box == state.bounding_box
+            assert mutable_state.empty_count == state.empty_count
+            assert mutable_state.zobrist_hash == state.zobrist_hash
+
+        with pytest.raises(ValueError):
+            mutable_state.undo_move()
+
+def test_random_playout_as_game_state():
+    for width, height, qty_to_win in [(3, 3, 3), (7, 5, 4), (15, 15, 5)]:
+        state = GameState(width, height, qty_to_win).make_move(1, 1, "x")
+        sparse_state = SparseGameState(width, height, qty_to_win) \
+                .make_move(1, 1, "x")
+        for seed in range(20):
+            assert sparse_state.random_playout(("o", "x"), \
+                    random.Random(seed)) == state.random_playout(("o", "x"), \
+                    random.Random(seed))
+            assert sparse_state.field == state.field
+
+    with pytest.raises(ValueError):
+        SparseGameState(None, None, 3).random_playout(("o", "x"))
+
+def test_unbounded_field():
+    state = SparseGameState(None, None, 3)
+    assert list(state.all_available_moves()) == [(0, 0)]
+    assert list(state.moves_near_stones(1)) == [(0, 0)]
+    assert state.field == []
+
+    state = state.make_move(-100, 1000, "x")
+    state = state.make_move(-99, 1001, "x")
+    assert state.bounding_box == (-100, 1000, -99, 1001)
+    assert state.field == [["x", None], [None, "x"]]
+    assert state.empty_count is None
+    assert len(list(state.all_available_moves())) == 6 * 6 - 2
+    assert list(state.moves_near_stones(1))[0] == (-101, 999)
+    assert state.is_winning_move(-98, 1002, "x")
+    assert symmetry.stabilizer(state) == []
+
+    state = state.make_move(-101, 999, "x")
+    assert state.last_move_result == "x"
+
+def test_unbounded_hash_is_incremental():
+    state = SparseGameState(None, None, 5)
+    state.zobrist_hash
+    for move in [(0, 0), (-5, 3), (7, -2)]:
+        state = state.make_move(move[0], move[1], "x")
+    assert state.zobrist_hash == \
+            SparseGameState.from_state(state).zobrist_hash
+    other = SparseGameState(None, None, 5).make_move(7, -2, "x") \
+            .make_move(0, 0, "x").make_move(-5, 3, "x")
+    assert other.zobrist_hash == state.zobrist_hash
+
+def test_point_keys_are_bounded(monkeypatch):
+    monkeypatch.setattr(sparse_gamestate, "_MAX_POINT_KEYS", 10)
+    state = SparseGameState(None, None, 5)
+    state.zobrist_hash
+    for pos_x in range(0, 100, 2):
+        state = state.make_move(pos_x, 0, "x")
+    assert len(sparse_gamestate._point_keys) <= 10
+    # evicted keys are the same when they're generated again
+    assert state.zobrist_hash == \
+            SparseGameState.from_state(state).zobrist_hash
+
+def test_search_on_large_field():
+    state = SparseGameState(60, 60, 5)
+    for move, handle in [((30, 30), "host"), ((31, 31), "opponent"), \
+            ((30, 31), "host"), ((29, 31), "opponent"), \
+            ((30, 32), "host"), ((40, 40), "opponent")]:
+        state = state.make_move(move[0], move[1], handle)
+    strategy = MinimaxStrategy(max_depth=2, candidate_radius=1, \
+            order_moves=True)
+    # the host has three in a column, it extends them
+    assert minimax.run(state, 1, strategy) in [(30, 29), (30, 33)]
+
+def test_search_on_unbounded_field():
+    state = SparseGameState(None, None, 4)
+    for move, handle in [((0, 0), "host"), ((-5, 5), "opponent"), \
+            ((0, 2), "host"), ((-5, 6), "opponent"), ((0, 4), "host"), \
+            ((-5, 7), "opponent"), ((9, 9), "host")]:
+        state = state.make_move(move[0], move[1], handle)
+    strategy = MinimaxStrategy(max_depth=1, candidate_radius=1)
+    assert minimax.run(state, -1, strategy) in [(-5, 4), (-5, 8)]
@@ -0,0 +1,59 @@
+import pytest
+from tttoe import symmetry
+from tttoe.gamestate import GameState
+from tttoe.bitboard_gamestate import BitboardGameState
+
+def make_state(moves, width=3, height=3, qty_to_win=3):
+    state = BitboardGameState(width, height, qty_to_win)
+    for pos_x, pos_y, handle in moves:
+        state = state.make_move(pos_x, pos_y, handle)
+    return state
+
+def test_transforms():
+    assert len(symmetry.transforms(3, 3)) == 8
+    assert len(symmetry.transforms(4, 3)) == 4
+    assert symmetry.transforms(4, 3)[0].is_identity()
+
+    for width, height in [(3, 3), (4, 3), (5, 5)]:
+        perms = set()
+        for transform in symmetry.transforms(width, height):
+            assert sorted(transform.perm) == list(range(width * height))
+            perms.add(transform.perm)
+            for x in range(width):
+                for y in range(height):
+                    new_x, new_y = transform.apply(x, y)
+                    assert 0 <= new_x < width and 0 <= new_y < height
+                    assert transform.invert(new_x, new_y) == (x, y)
+        assert len(perms) == len(symmetry.transforms(width, height))
+
+def test_canonical_form_of_symmetric_positions():
+    corners = [(0, 0), (0, 2), (2, 0), (2, 2)]
+    keys = set()
+    for corner in corners:
+        state = make_state([(corner[0], corner[1], "x"), (1, 1, "o")])
+        key, transform = symmetry.canonical_form(state)
+        keys.add(key)
+
+        canonical_corner = transform.apply(*corner)
+        assert transform.invert(*canonical_corner) == corner
+    assert len(keys) == 1
+
+    center_state = make_state([(1, 1, "x"), (0, 0, "o")])
+    assert symmetry.canonical_form(center_state)[0] not in keys
+
+def test_canonical_form_same_for_game_state():
+    moves = [(0, 1, "x"), (2, 2, "o"), (1, 1, "x")]
+    state = GameState(3, 3, 3)
+    for pos_x, pos_y, handle in moves:
+        state = state.make_move(pos_x, pos_y, handle)
+
+    assert symmetry.canonical_form(state)[0] == \
+            symmetry.canonical_form(make_state(moves))[0]
+
+def test_stabilizer():
+    assert len(symmetry.stabilizer(make_state([]))) == 7
+    assert len(symmetry.stabilizer(make_state([(1, 1, "x")]))) == 7
+    assert [t.name for t in symmetry.stabilizer( \
+            make_state([(0, 0, "x")]))] == ["transpose"]
+    assert symmetry.stabilizer(make_state([(0, 1, "x"), (0, 0, "o")])) == []
+    assert len(symmetry.stabilizer(make_state([], 4, 3))) == 3
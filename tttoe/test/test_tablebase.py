@@ -0,0 +1,84 @@
+import os
+import shutil
+import tempfile
+import pytest
+from tttoe import tablebase
+from tttoe.tablebase import Tablebase
+from tttoe.gamestate import GameState
+from tttoe.bitboard_gamestate import BitboardGameState
+from tttoe.aiplayer import AIPlayer
+from tttoe.game import Game
+
+@pytest.fixture(scope="module")
+def tablebase_3x3(request):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "3x3x3.tb")
+    tablebase.build(3, 3, 3, path)
+    result = Tablebase(path)
+
+    def remove():
+        result.close()
+        shutil.rmtree(directory)
+    request.addfinalizer(remove)
+
+    return result
+
+def make_state(moves, state_class=BitboardGameState):
+    state = state_class(3, 3, 3)
+    for pos_x, pos_y, handle in moves:
+        state = state.make_move(pos_x, pos_y, handle)
+    return state
+
+def test_header(tablebase_3x3):
+    assert (tablebase_3x3.width, tablebase_3x3.height, \
+            tablebase_3x3.qty_to_win) == (3, 3, 3)
+    assert len(tablebase_3x3) > 0
+
+def test_wrong_file(tmpdir):
+    path = str(tmpdir.join("wrong.tb"))
+    with open(path, "wb") as output:
+        output.write(b"x" * 100)
+
+    with pytest.raises(ValueError) as excinfo:
+        Tablebase(path)
+    assert str(excinfo.value) == "\"%s\" is not a tablebase file" % path
+
+def test_lookup_other_geometry(tablebase_3x3):
+    assert tablebase_3x3.lookup(BitboardGameState(4, 3, 3), "host") == None
+
+def test_lookup_finds_wins_and_blocks_in_all_symmetries(tablebase_3x3):
+    for moves, win_move in [
+            ([(0, 0, "x"), (1, 0, "o"), (0, 1, "x"), (2, 0, "o")], (0, 2)),
+            ([(2, 2, "x"), (1, 2, "o"), (2, 1, "x"), (0, 2, "o")], (2, 0)),
+            ([(0, 2, "x"), (0, 1, "o"), (1, 2, "x"), (0, 0, "o")], (2, 2))]:
+        for state_class in (GameState, BitboardGameState):
+            state = make_state(moves, state_class)
+            assert tablebase_3x3.lookup(state, "x") == win_move
+            assert tablebase_3x3.lookup(state, "o") == win_move
+
+def test_lookup_moves_keep_the_draw(tablebase_3x3):
+    state = make_state([(0, 0, "host")])
+    handles = ["opponent", "host"]
+    while state.last_move_result == "nothing":
+        move = tablebase_3x3.lookup(state, handles[0])
+        assert move in list(state.all_available_moves())
+        state = state.make_move(move[0], move[1], handles[0])
+        handles.reverse()
+    assert state.last_move_result == "draw"
+
+def test_ai_player_with_tablebase(tablebase_3x3):
+    for start_player_handle in ("host", "opponent"):
+        game = Game(3, 3, 3, start_player_handle, "x")
+        ai_1 = AIPlayer(game, tablebase=tablebase_3x3)
+        ai_2 = AIPlayer(game, tablebase=tablebase_3x3)
+        if start_player_handle == "host":
+            ai_1.make_move()
+        else:
+            ai_2.make_move()
+        assert game.game_state.last_move_result == "draw"
+
+def test_build_validates_field_size(tmpdir):
+    with pytest.raises(ValueError) as excinfo:
+        tablebase.build(7, 6, 4, str(tmpdir.join("big.tb")))
+    assert str(excinfo.value) == "Fields with more than 40 cells are not " \
+            "supported"
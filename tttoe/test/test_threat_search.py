@@ -0,0 +1,171 @@
+import random
+from tttoe.gamestate import GameState
+from tttoe.sparse_gamestate import SparseGameState
+from tttoe.threat_search import ThreatSearch
+
+# The host wins by 6 moves (5 continuous fours, 11 moves of both players),
+# too deep for the full-width search.
+VCF_MOVES = [((5, 9), "host"), ((5, 4), "opponent"), ((6, 8), "host"), \
+        ((9, 6), "opponent"), ((5, 10), "host"), ((9, 10), "opponent"), \
+        ((5, 6), "host"), ((10, 9), "opponent"), ((7, 10), "host"), \
+        ((7, 7), "opponent"), ((9, 8), "host"), ((4, 6), "opponent"), \
+        ((9, 9), "host"), ((4, 5), "opponent")]
+
+# The host makes two open threes at once by (7, 7).
+VCT_MOVES = [((5, 7), "host"), ((0, 0), "opponent"), ((6, 7), "host"), \
+        ((14, 0), "opponent"), ((7, 5), "host"), ((0, 14), "opponent"), \
+        ((7, 6), "host"), ((14, 14), "opponent")]
+
+def make_state(moves, state=None, shift=0):
+    state = state if state is not None else GameState(15, 15, 5)
+    for (pos_x, pos_y), handle in moves:
+        state = state.make_move(pos_x + shift, pos_y + shift, handle)
+    return state
+
+def test_vcf_win():
+    state = make_state(VCF_MOVES)
+    search = ThreatSearch(max_depth=5, threes=False)
+    assert search.find_win(state, "host") == (5, 8)
+    assert len(search.line) == 11
+    assert search.nodes < 200
+
+    # every move of the host is a four, the opponent has the only reply
+    # (but the last one: the host has two fours)
+    handles = ["host", "opponent"]
+    for index, (pos_x, pos_y) in enumerate(search.line):
+        state = state.make_move(pos_x, pos_y, handles[0])
+        handles.reverse()
+        if handles[0] == "opponent" and state.last_move_result == "nothing":
+            moves = list(state.all_available_moves())
+            wins = [move for move in moves \
+                    if state.is_winning_move(move[0], move[1], "host")]
+            assert search.line[index + 1] in wins
+            assert len(wins) == 1 or index == len(search.line) - 3
+            assert not any(state.is_winning_move(move[0], move[1], \
+                    "opponent") for move in moves)
+    assert state.last_move_result == "host"
+
+def test_vct_win():
+    state = make_state(VCT_MOVES)
+    assert ThreatSearch(threes=False).find_win(state, "host") is None
+
+    search = ThreatSearch(threes=True)
+    assert search.find_win(state, "host") == (7, 7)
+    assert search.line[0] == (7, 7)
+
+    # the opponent has no open threes to make
+    assert ThreatSearch().find_win(state, "opponent") is None
+
+def test_no_win():
+    assert ThreatSearch().find_win(GameState(15, 15, 5), "host") is None
+    state = GameState(3, 3, 3).make_move(1, 1, "host")
+    assert ThreatSearch().find_win(state, "opponent") is None
+
+def test_immediate_win():
+    state = make_state([((0, 0), "host"), ((1, 0), "opponent"), \
+            ((0, 1), "host"), ((1, 1), "opponent")], GameState(3, 3, 3))
+    search = ThreatSearch()
+    assert search.find_win(state, "host") == (0, 2)
+    assert search.line == [(0, 2)]
+
+def test_four_of_defender_is_blocked():
+    # the opponent has four in a row, the host's own threats don't help
+    state = make_state(VCT_MOVES + [((3, 3), "opponent"), \
+            ((14, 7), "host"), ((3, 4), "opponent"), ((14, 9), "host"), \
+            ((3, 5), "opponent"), ((14, 11), "host"), ((3, 6), "opponent"), \
+            ((14, 13), "host")])
+    assert ThreatSearch().find_win(state, "host") is None
+    assert ThreatSearch().find_win(state, "opponent") in [(3, 2), (3, 7)]
+
+def test_max_nodes():
+    state = make_state(VCF_MOVES)
+    search = ThreatSearch(max_nodes=5, threes=False)
+    assert search.find_win(state, "host") is None
+    assert search.line is None
+    assert search.nodes == 6
+
+def test_max_depth():
+    state = make_state(VCF_MOVES)
+    assert ThreatSearch(max_depth=4, threes=False) \
+            .find_win(state, "host") is None
+    assert ThreatSearch(max_depth=5, threes=False) \
+            .find_win(state, "host") == (5, 8)
+
+def test_unbounded_field():
+    shift = -100
+    state = make_state(VCT_MOVES, SparseGameState(None, None, 5), shift)
+    search = ThreatSearch()
+    assert search.find_win(state, "host") == (7 + shift, 7 + shift)
+
+def _solve(cells, handle, other, empty_cells, lines, memo):
+    """exact result of the game for the player to move (1 - win, 0 - draw,
+    -1 - loss)"""
+    key = (frozenset(cells.items()), handle)
+    if key not in memo:
+        best = -1
+        for cell in sorted(empty_cells):
+            cells[cell] = handle
+            if any(all(cells.get(other_cell) == handle \
+                    for other_cell in line) for line in lines[cell]):
+                result = 1
+            elif len(empty_cells) == 1:
+                result = 0
+            else:
+                empty_cells.discard(cell)
+                result = -_solve(cells, other, handle, empty_cells, lines, \
+                        memo)
+                empty_cells.add(cell)
+            del cells[cell]
+            best = max(best, result)
+            if best == 1:
+                break
+        memo[key] = best
+    return memo[key]
+
+def _lines(width, height, qty_to_win):
+    """returns dict {cell: lines of `qty_to_win` cells through it}"""
+    lines = dict(((x, y), []) for x in range(width) for y in range(height))
+    for x in range(width):
+        for y in range(height):
+            for dir_x, dir_y in ((1, 0), (0, 1), (1, 1), (1, -1)):
+                line = [(x + dir_x * step, y + dir_y * step) \
+                        for step in range(qty_to_win)]
+                if all(cell in lines for cell in line):
+                    for cell in line:
+                        lines[cell].append(line)
+    return lines
+
+def test_found_wins_are_wins():
+    rnd = random.Random(3)
+    found = 0
+
+    for _ in range(60):
+        width, height, qty_to_win = rnd.choice([(4, 4, 3), (5, 4, 3), \
+                (4, 4, 4)])
+        state = GameState(width, height, qty_to_win)
+        handles = ["host", "opponent"]
+        for _ in range(rnd.randint(5, 9)):
+            pos_x, pos_y = rnd.choice(list(state.all_available_moves()))
+            state = state.make_move(pos_x, pos_y, handles[0])
+            handles.reverse()
+            if state.last_move_result != "nothing":
+                break
+        if state.last_move_result != "nothing":
+            continue
+
+        for threes in (False, True):
+            move = ThreatSearch(threes=threes).find_win(state, handles[0])
+            if move is None:
+                continue
+            found += 1
+            new_state = state.make_move(move[0], move[1], handles[0])
+            if new_state.last_move_result == handles[0]:
+                continue
+            cells = dict(((x, y), handle) \
+                    for x, column in enumerate(new_state.field) \
+                    for y, handle in enumerate(column) if handle is not None)
+            empty_cells = set(new_state.all_available_moves())
+            assert _solve(cells, handles[1], handles[0], empty_cells, \
+                    _lines(width, height, qty_to_win), dict()) == -1
+
+    assert found > 10
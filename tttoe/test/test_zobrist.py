@@ -0,0 +1,33 @@
+import pytest
+from tttoe import zobrist
+from tttoe.gamestate import GameState
+from tttoe.bitboard_gamestate import BitboardGameState
+
+def test_hashes_are_stable():
+    assert zobrist.base_key(3, 3, 3) == zobrist.base_key(3, 3, 3)
+    assert zobrist.base_key(3, 3, 3) != zobrist.base_key(4, 4, 3)
+    assert zobrist.cell_key(3, 3, 3, "x", 0) != \
+            zobrist.cell_key(3, 3, 3, "o", 0)
+
+def test_incremental_hash_equals_full_hash():
+    for state_class in (GameState, BitboardGameState):
+        state = state_class(4, 4, 3)
+        state.zobrist_hash
+        for x, y, handle in [(0, 0, "x"), (1, 1, "o"), (3, 2, "x")]:
+            state = state.make_move(x, y, handle)
+
+        assert state.zobrist_hash == zobrist.field_hash(4, 4, 3, state.field)
+        assert state.zobrist_hash == \
+                state_class(4, 4, 3, field=state.field).zobrist_hash
+
+def test_transpositions_have_equal_hashes():
+    for state_class in (GameState, BitboardGameState):
+        state_1 = state_class(3, 3, 3).make_move(0, 0, "x")
+        state_1 = state_1.make_move(1, 1, "o").make_move(2, 2, "x")
+
+        state_2 = state_class(3, 3, 3).make_move(2, 2, "x")
+        state_2 = state_2.make_move(1, 1, "o").make_move(0, 0, "x")
+
+        assert state_1.zobrist_hash == state_2.zobrist_hash
+        assert state_1.zobrist_hash != \
+                state_1.make_move(0, 1, "o").zobrist_hash
@@ -0,0 +1,305 @@
+"""
+This module implements threat-space search: it looks for forced wins which
+consist of threats only, so it reaches depths the full-width Minimax search
+can't.
+
+A window is a sequence of `qty_to_win` adjacent cells (see
+`tttoe.patterns`). A window with `qty_to_win - 1` stones of a player and one
+empty cell is a "four": the player wins by the move to the empty cell, so the
+other player must take it at once. A cell which makes two fours at once
+(e.g. the end of an open "three") is a "double four": the other player
+can't block both.
+
+The attacker plays only moves which make fours (victory by continuous fours,
+VCF) or, with `threes=True`, threats to make a double four (victory by
+continuous threats). The defender's replies are the only ones which can
+help: the block of the four, or the cells of the windows of the threatened
+double fours and the defender's own fours (counter-threats). If the
+attacker wins against all of them, the first move is a forced win.
+
+Windows with stones of one player are counted incrementally as stones are
+put and taken back, so a search node costs O(threats), not O(field size).
+"""
+
+# pylint: disable=too-many-instance-attributes
+
+_DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+class _OutOfNodes(Exception):
+    pass
+
+def _by_threats(moves):
+    """cells of dict {cell: number of windows}, more windows first"""
+    return sorted(moves, key=lambda cell: (-moves[cell], cell))
+
+class _Board:
+    """Stones of the attacker (0) and the defender (1, stones of all other
+    handles) with counts of stones in every window."""
+
+    def __init__(self, state, attacker_handle):
+        self.width = state.width
+        self.height = state.height
+        self.qty_to_win = state.qty_to_win
+        self.cells = dict()
+        # {window: [stones of player 0, stones of player 1]}, a window is
+        # (start_x, start_y, dir_x, dir_y)
+        self._counts = dict()
+        # live[player][stones] -- set of windows with `stones` stones of the
+        # player and no stones of the other one (for the last three levels)
+        self.live = [dict(), dict()]
+        for player in (0, 1):
+            for stones in range(max(1, self.qty_to_win - 3), \
+                    self.qty_to_win):
+                self.live[player][stones] = set()
+        self.hash = 0
+        # {cell: windows through it}
+        self._windows = dict()
+
+        if hasattr(state, "occupied_cells"):
+            stones = state.occupied_cells()
+        else:
+            stones = ((x, y, handle) for x, column in enumerate(state.field) \
+                    for y, handle in enumerate(column) if handle != None)
+        for pos_x, pos_y, handle in stones:
+            self.put(pos_x, pos_y, 0 if handle == attacker_handle else 1)
+
+    def _inside(self, pos_x, pos_y):
+        return self.width is None or \
+                (0 <= pos_x < self.width and 0 <= pos_y < self.height)
+
+    def windows_through(self, pos_x, pos_y):
+        qty_to_win = self.qty_to_win
+        for dir_x, dir_y in _DIRECTIONS:
+            for back in range(qty_to_win):
+                start_x = pos_x - dir_x * back
+                start_y = pos_y - dir_y * back
+                if self._inside(start_x, start_y) and self._inside( \
+                        start_x + dir_x * (qty_to_win - 1), \
+                        start_y + dir_y * (qty_to_win - 1)):
+                    yield (start_x, start_y, dir_x, dir_y)
+
+    def window_cells(self, window):
+        start_x, start_y, dir_x, dir_y = window
+        return [(start_x + dir_x * step, start_y + dir_y * step) \
+                for step in range(self.qty_to_win)]
+
+    def empty_cells(self, window):
+        cells = self.cells
+        return [cell for cell in self.window_cells(window) \
+                if cell not in cells]
+
+    def _cell_windows(self, pos_x, pos_y):
+        windows = self._windows.get((pos_x, pos_y))
+        if windows is None:
+            windows = self._windows[(pos_x, pos_y)] = \
+                    tuple(self.windows_through(pos_x, pos_y))
+        return windows
+
+    def _change(self, window, counts, player, delta):
+        other = 1 - player
+        stones = counts[player]
+        counts[player] = stones + delta
+        if counts[other] == 0:
+            levels = self.live[player]
+            if stones in levels:
+                levels[stones].discard(window)
+            if stones + delta in levels:
+                levels[stones + delta].add(window)
+        elif stones == 0 or stones + delta == 0:
+            # The first stone of the player kills the window of the other
+            # one, taking the last one back revives it.
+            levels = self.live[other]
+            if counts[other] in levels:
+                if delta > 0:
+                    levels[counts[other]].discard(window)
+                else:
+                    levels[counts[other]].add(window)
+
+    def put(self, pos_x, pos_y, player):
+        self.cells[(pos_x, pos_y)] = player
+        self.hash ^= hash((pos_x, pos_y, player))
+        all_counts = self._counts
+        for window in self._cell_windows(pos_x, pos_y):
+            counts = all_counts.get(window)
+            if counts is None:
+                counts = all_counts[window] = [0, 0]
+            self._change(window, counts, player, 1)
+
+    def take(self, pos_x, pos_y):
+        player = self.cells.pop((pos_x, pos_y))
+        self.hash ^= hash((pos_x, pos_y, player))
+        all_counts = self._counts
+        for window in self._cell_windows(pos_x, pos_y):
+            self._change(window, all_counts[window], player, -1)
+
+    def winning_cells(self, player):
+        """cells where the player makes `qty_to_win` in a row"""
+        cells = set()
+        for window in self.live[player][self.qty_to_win - 1]:
+            cells.update(self.empty_cells(window))
+        return cells
+
+    def _window_moves(self, player, stones):
+        """Returns dict {cell: number of windows} of empty cells of windows
+        with `stones` stones of the player."""
+        moves = dict()
+        for window in self.live[player].get(stones, ()):
+            for cell in self.empty_cells(window):
+                moves[cell] = moves.get(cell, 0) + 1
+        return moves
+
+    def four_moves(self, player):
+        """cells where the player makes a four (dict {cell: number of
+        fours})"""
+        return self._window_moves(player, self.qty_to_win - 2)
+
+    def double_fours(self, player):
+        """Returns dict {cell: set of cells} of cells where the player makes
+        two or more fours, with the winning cells of these fours."""
+        partners = dict()
+        for window in self.live[player].get(self.qty_to_win - 2, ()):
+            first, second = self.empty_cells(window)
+            partners.setdefault(first, set()).add(second)
+            partners.setdefault(second, set()).add(first)
+        return dict((cell, others) for cell, others in partners.items() \
+                if len(others) >= 2)
+
+    def three_moves(self, player):
+        """cells where the player makes windows with `qty_to_win - 2` stones
+        (possible threats of a double four), dict {cell: number of
+        windows}"""
+        return self._window_moves(player, self.qty_to_win - 3)
+
+class ThreatSearch:
+    """Threat-space search of forced wins (see the module docs).
+
+    Example usage:
+
+    search = ThreatSearch(max_depth=10, max_nodes=20000)
+    move = search.find_win(state, "host")
+    if move is not None:
+        ... # the host wins by forcing moves starting with `move`
+
+    Options:
+
+        max_depth -- the maximum number of attacker moves.
+        max_nodes -- the search gives up (returns None) after visiting this
+            many positions, so a search without a win stays cheap.
+        threes -- if True, the attacker plays threats of double fours too,
+            otherwise fours only (VCF, faster).
+
+    `nodes` is the number of positions visited by the last search, `line` is
+    the found sequence of moves (the attacker's and the defender's replies
+    by turn), or None.
+    """
+
+    def __init__(self, max_depth=10, max_nodes=20000, threes=True):
+        self._max_depth = max_depth
+        self._max_nodes = max_nodes
+        self._threes = threes
+        self.nodes = 0
+        self.line = None
+        self._board = None
+        self._failed = None
+
+    def find_win(self, state, player_handle):
+        """Returns (x, y) of the first move of a forced win of the player
+        to move `player_handle`, or None."""
+        self.nodes = 0
+        self.line = None
+        if state.last_move_result != "nothing":
+            return None
+
+        self._board = _Board(state, player_handle)
+        # {position hash: the largest depth at which the attack failed}
+        self._failed = dict()
+        try:
+            self.line = self._attack(self._max_depth)
+        except _OutOfNodes:
+            self.line = None
+        finally:
+            self._board = None
+            self._failed = None
+        return self.line[0] if self.line else None
+
+    def _visit(self):
+        self.nodes += 1
+        if self.nodes > self._max_nodes:
+            raise _OutOfNodes()
+
+    def _attack(self, depth):
+        """The attacker (0) moves. Returns the winning line or None."""
+        self._visit()
+        board = self._board
+        wins = board.winning_cells(0)
+        if wins:
+            return [min(wins)]
+        if depth == 0:
+            return None
+        if self._failed.get(board.hash, -1) >= depth:
+            return None
+
+        threats = board.winning_cells(1)
+        if len(threats) >= 2:
+            return None
+        if threats:
+            # The four of the defender must be blocked.
+            candidates = sorted(threats)
+        else:
+            # Moves which make more threats at once go first.
+            fours = board.four_moves(0)
+            candidates = _by_threats(fours)
+            if self._threes:
+                threes = board.three_moves(0)
+                candidates += _by_threats(dict((cell, count) \
+                        for cell, count in threes.items() if cell not in fours))
+
+        for pos_x, pos_y in candidates:
+            board.put(pos_x, pos_y, 0)
+            try:
+                line = self._defend(depth - 1)
+            finally:
+                board.take(pos_x, pos_y)
+            if line is not None:
+                return [(pos_x, pos_y)] + line
+
+        self._failed[board.hash] = depth
+        return None
+
+    def _defend(self, depth):
+        """The defender (1) moves after a move of the attacker. Returns the
+        winning line of the attacker against all replies, or None."""
+        self._visit()
+        board = self._board
+        if board.winning_cells(1):
+            return None
+
+        wins = sorted(board.winning_cells(0))
+        if len(wins) >= 2:
+            return wins[:2]
+        if wins:
+            replies = wins
+        elif self._threes and depth > 0:
+            double_fours = board.double_fours(0)
+            if not double_fours:
+                return None
+            defenses = set()
+            for cell, others in double_fours.items():
+                defenses.add(cell)
+                defenses.update(others)
+            replies = sorted(defenses.union(board.four_moves(1)))
+        else:
+            return None
+
+        line = None
+        for pos_x, pos_y in replies:
+            board.put(pos_x, pos_y, 1)
+            try:
+                reply_line = self._attack(depth)
+            finally:
+                board.take(pos_x, pos_y)
+            if reply_line is None:
+                return None
+            if line is None:
+                line = [(pos_x, pos_y)] + reply_line
+        return line
@@ -0,0 +1,50 @@
+"""
+This module implements Zobrist hashing (http://en.wikipedia.org/wiki/Zobrist_hashing)
+for tictactoe fields.
+
+Every (cell, player handle) pair gets a random 64-bit key. The hash of a field
+is XOR of the keys of all occupied cells (and of the key of the field
+geometry, so equal fields of different games don't collide). So the hash of
+the new state can be computed from the hash of the previous state with a
+single XOR:
+
+    new_hash = old_hash ^ cell_key(width, height, qty_to_win, handle, cell)
+
+The keys are generated from seeds which depend only on the geometry and the
+handle, so hashes are the same in all processes (they can be shared between
+workers, stored on disk etc).
+"""
+
+import random
+
+_keys_cache = dict()
+
+def _cell_keys(width, height, qty_to_win, player_handle):
+    cache_key = (width, height, qty_to_win, player_handle)
+    keys = _keys_cache.get(cache_key)
+    if keys is None:
+        rnd = random.Random("zobrist:%d:%d:%d:%s" % cache_key)
+        keys = tuple(rnd.getrandbits(64) for _ in range(width * height))
+        _keys_cache[cache_key] = keys
+    return keys
+
+def base_key(width, height, qty_to_win):
+    """returns the hash of the empty field of the specified geometry"""
+    return random.Random("zobrist:%d:%d:%d" % \
+            (width, height, qty_to_win)).getrandbits(64)
+
+def cell_key(width, height, qty_to_win, player_handle, cell):
+    """returns the key of the `cell` (number of the cell: x * height + y)
+    occupied by the `player_handle`"""
+    return _cell_keys(width, height, qty_to_win, player_handle)[cell]
+
+def field_hash(width, height, qty_to_win, field):
+    """computes the hash of the field (list of lists) from scratch"""
+    value = base_key(width, height, qty_to_win)
+    for x in range(width):
+        for y in range(height):
+            handle = field[x][y]
+            if handle != None:
+                value ^= cell_key(width, height, qty_to_win, handle, \
+                        x * height + y)
+    return value